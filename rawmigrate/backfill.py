@@ -0,0 +1,105 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from rawmigrate.chunks import ChunkedLoop
+from rawmigrate.entities.backfill import Backfill
+
+
+@dataclass(slots=True, kw_only=True)
+class BackfillProgress:
+    # the first key of the run, after the resumed chunks
+    start_key: int | None
+    # the first key not updated yet, None once there is nothing left
+    next_key: int | None
+    chunks: int = 0
+    rows: int = 0
+    resumed: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.next_key is None
+
+
+class BackfillRunner:
+    """
+    Runs backfills (and other chunked loops) chunk by chunk over a DB-API connection,
+        committing the progress along with every chunk.
+
+    Only plain SQL is used, so sqlite3 works as a stand-in for Postgres,
+        as long as the tables are declared without a schema.
+
+    Usage::
+
+        runner = BackfillRunner(connection)
+        progress = runner.run(backfill)
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            connection: A DB-API connection, outside of a transaction
+            sleep: Called with the backfill throttle between chunks
+        """
+        self.connection = connection
+        self.sleep = sleep
+
+    def _fetch_one(self, sql: str) -> tuple | None:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def run(
+        self, backfill: Backfill | ChunkedLoop, max_chunks: int | None = None
+    ) -> BackfillProgress:
+        """
+        Runs the backfill, resuming after the last committed chunk.
+
+        Args:
+            backfill: The backfill to run, or any other chunked loop,
+                e.g. the copy of an online table rewrite
+            max_chunks: Stop after this many chunks, the next run resumes from there
+        """
+        loop = backfill.loop if isinstance(backfill, Backfill) else backfill
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(loop.progress_table_sql())
+            self.connection.commit()
+
+            min_key, max_key = self._fetch_one(loop.bounds_sql) or (None, None)
+            resumed = self._fetch_one(loop.resume_sql())
+            next_key = resumed[0] if resumed else min_key
+            progress = BackfillProgress(
+                start_key=next_key, next_key=next_key, resumed=resumed is not None
+            )
+
+            while max_key is not None and next_key is not None and next_key <= max_key:
+                if max_chunks is not None and progress.chunks >= max_chunks:
+                    return progress
+                if progress.chunks:
+                    self.sleep(loop.throttle)
+                end_key = int(next_key) + loop.chunk_size
+                cursor.execute(loop.chunk_sql(str(int(next_key)), str(end_key)))
+                progress.rows += max(cursor.rowcount, 0)
+                cursor.execute(loop.progress_sql(str(end_key)))
+                self.connection.commit()
+                progress.chunks += 1
+                next_key = progress.next_key = end_key
+
+            cursor.execute(loop.finish_sql())
+            self.connection.commit()
+            progress.next_key = None
+            return progress
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
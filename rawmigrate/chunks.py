@@ -0,0 +1,86 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import ClassVar
+
+from rawmigrate.core import Syntax
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ChunkedLoop:
+    """
+    A statement run over key-range chunks of a table, committed one chunk at a time.
+
+    The progress is stored in `progress_table` along with each chunk,
+        so an interrupted loop resumes from the last finished chunk.
+    """
+
+    progress_table: ClassVar[str] = "rawmigrate_backfill"
+
+    # identifies the progress of the loop
+    name: str
+    # selects the lowest and the highest key
+    bounds_sql: str
+    # (SQL of the first key, SQL of the key right after the chunk) -> the chunk statement
+    chunk_sql: Callable[[str, str], str]
+    chunk_size: int
+    # seconds to sleep between chunks
+    throttle: float
+
+    def _name_literal(self) -> str:
+        return "'" + self.name.replace("'", "''") + "'"
+
+    def progress_table_sql(self) -> str:
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self.progress_table}"
+            " (name text PRIMARY KEY, next_key bigint NOT NULL)"
+        )
+
+    def resume_sql(self) -> str:
+        """
+        Selects the first key of the next chunk, if the loop was interrupted.
+        """
+        return (
+            f"SELECT next_key FROM {self.progress_table}"
+            f" WHERE name = {self._name_literal()}"
+        )
+
+    def progress_sql(self, next_key: str) -> str:
+        """
+        Records the first key of the next chunk, run in the transaction of the chunk.
+        """
+        return (
+            f"INSERT INTO {self.progress_table} (name, next_key)"
+            f" VALUES ({self._name_literal()}, {next_key})"
+            " ON CONFLICT (name) DO UPDATE SET next_key = excluded.next_key"
+        )
+
+    def finish_sql(self) -> str:
+        return f"DELETE FROM {self.progress_table} WHERE name = {self._name_literal()}"
+
+    def do_sql(self, syntax: Syntax) -> str:
+        """
+        Renders the loop as a Postgres DO block committing after every chunk,
+            which must run outside of a transaction block.
+        `rawmigrate.backfill.BackfillRunner` runs the same statements from Python.
+        """
+        # the variables mustn't clash with the progress table columns
+        body = f"""
+DECLARE
+    chunk_start bigint;
+    last_key bigint;
+BEGIN
+    {self.progress_table_sql()};
+    SELECT min_key, max_key INTO chunk_start, last_key
+        FROM ({self.bounds_sql}) AS bounds (min_key, max_key);
+    chunk_start := coalesce(({self.resume_sql()}), chunk_start);
+    WHILE chunk_start <= last_key LOOP
+        {self.chunk_sql("chunk_start", f"chunk_start + {self.chunk_size}")};
+        chunk_start := chunk_start + {self.chunk_size};
+        {self.progress_sql("chunk_start")};
+        COMMIT;
+        PERFORM pg_sleep({self.throttle});
+    END LOOP;
+    {self.finish_sql()};
+END;
+"""
+        return f"DO {syntax.format_dollar_quoted(body)}"
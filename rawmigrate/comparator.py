@@ -1,7 +1,13 @@
 from abc import ABC, abstractmethod
 from enum import StrEnum
+from typing import TYPE_CHECKING
+
+from rawmigrate.core import SqlText
 from rawmigrate.entity import DBEntity
 
+if TYPE_CHECKING:
+    from rawmigrate.renames import Renames
+
 
 class NodeMutationType(StrEnum):
     CREATE = "CREATE"
@@ -17,16 +23,19 @@ class Comparator[T: DBEntity](ABC):
     that need to be applied to the old entity to match the new one.
     """
 
-    def __init__(self, old: T | None, new: T):
+    def __init__(self, old: T | None, new: T, renames: "Renames | None" = None):
         """
         Initializes the comparator.
 
         Args:
             old: The old entity to compare.
             new: The new entity to compare.
+            renames: Entities renamed by the migration, the old texts mentioning them
+                are compared as if they used the new names.
         """
         self.old = old
         self.new = new
+        self.renames = renames
         self._mutation_type: NodeMutationType = self._compute_mutation_type()
 
     @abstractmethod
@@ -35,3 +44,51 @@ class Comparator[T: DBEntity](ABC):
     @property
     def mutation_type(self) -> NodeMutationType:
         return self._mutation_type
+
+    def binds(self, dependency_ref: str) -> bool:
+        """
+        Whether the new entity holds on to the dependency itself,
+            so dropping the dependency drops or breaks the entity.
+        Only then a DROP or RECREATE of the dependency forces a RECREATE of the entity.
+
+        Entities looking dependencies up by name when used
+            (e.g. function bodies) override it to keep the cascade small.
+        """
+        return True
+
+    def alter_sql(self) -> list[str]:
+        """
+        Returns the statements altering the old entity to match the new one.
+        Only called when the mutation type is ALTER.
+        """
+        return []
+
+    def _renamed(self, old: SqlText) -> SqlText:
+        """
+        Returns the old text as it reads after the renames.
+        """
+        if not self.renames or self.old is None:
+            return old
+        return self.renames.text(old, self.old.dependency_refs)
+
+    def _same(
+        self, old: SqlText | None, new: SqlText | None, follow_renames: bool = True
+    ) -> bool:
+        """
+        Whether the texts differ only cosmetically.
+
+        Args:
+            follow_renames: Whether renamed identifiers count as the same.
+                Disable for texts that bind objects by name, e.g. function bodies.
+        """
+        if old is None or new is None:
+            return old is new
+        if old.equivalent(new):
+            return True
+        if not follow_renames or not self.renames:
+            return False
+        # an old text without positions can't always follow the renames,
+        # the new one is swapped back instead
+        return self._renamed(old).equivalent(new) or self.renames.original(
+            new
+        ).equivalent(old)
@@ -1,13 +1,22 @@
+from .backfill import BackfillComparator
 from .function import FunctionComparator
 from .index import IndexComparator
+from .materialized_view import MaterializedViewComparator
+from .partition import PartitionedTableComparator, PartitionSetComparator
 from .schema import SchemaComparator
+from .sequence import SequenceComparator
 from .table import ColumnComparator, TableComparator
 from .trigger import TriggerComparator
 
 __all__ = [
+    "BackfillComparator",
     "FunctionComparator",
     "IndexComparator",
+    "MaterializedViewComparator",
+    "PartitionedTableComparator",
+    "PartitionSetComparator",
     "SchemaComparator",
+    "SequenceComparator",
     "TableComparator",
     "TriggerComparator",
     "ColumnComparator",
@@ -0,0 +1,12 @@
+from rawmigrate.comparator import Comparator, NodeMutationType
+from rawmigrate.entities.backfill import Backfill
+
+
+class BackfillComparator(Comparator[Backfill]):
+    def _compute_mutation_type(self) -> NodeMutationType:
+        if self.old is None:
+            return NodeMutationType.CREATE
+        # the chunking settings only affect how it runs, not what it updates
+        if self.old.definition_digest(self.renames) != self.new.definition_digest():
+            return NodeMutationType.RECREATE
+        return NodeMutationType.UNCHANGED
@@ -1,3 +1,5 @@
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
 from rawmigrate.entities.function import Function
 
@@ -6,12 +8,53 @@ class FunctionComparator(Comparator[Function]):
     def _compute_mutation_type(self) -> NodeMutationType:
         if self.old is None:
             return NodeMutationType.CREATE
-        if self.old.args != self.new.args:
-            return NodeMutationType.ALTER
-        if self.old.returns != self.new.returns:
-            return NodeMutationType.ALTER
-        if self.old.language != self.new.language:
-            return NodeMutationType.ALTER
-        if self.old.body != self.new.body:
+        if self._signature_changed():
+            # CREATE OR REPLACE can't change the argument names or the return type
+            return NodeMutationType.RECREATE
+        if (
+            self.old.name != self.new.name
+            or self._definition_changed()
+            or self.old._attributes() != self.new._attributes()
+        ):
             return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
+
+    def _signature_changed(self) -> bool:
+        old = cast(Function, self.old)
+        if list(old.args) != list(self.new.args) or not all(
+            self._same(old_arg, self.new.args[arg_name])
+            for arg_name, old_arg in old.args.items()
+        ):
+            return True
+        return not self._same(old.returns, self.new.returns)
+
+    def _definition_changed(self) -> bool:
+        old = cast(Function, self.old)
+        if old.language != self.new.language:
+            return True
+        # the body binds objects by name, so renames must be applied to it
+        return not self._same(old.body, self.new.body, follow_renames=False)
+
+    def binds(self, dependency_ref: str) -> bool:
+        signature_refs = self.new.returns.references.union(
+            *(arg.references for arg in self.new.args.values())
+        )
+        # the body is resolved by name when the function runs,
+        # unknown origin (e.g. an imported function) is assumed to be bound
+        return (
+            dependency_ref in signature_refs
+            or dependency_ref not in self.new.body.references
+        )
+
+    def alter_sql(self) -> list[str]:
+        old = cast(Function, self.old)
+        statements = []
+        if old.name != self.new.name:
+            statements.extend(self.new.rename_sql(old))
+        if self._definition_changed():
+            # replacing sets all the attributes too
+            statements.extend(self.new.create_sql(replace=True))
+        else:
+            # only the attributes changed
+            statements.extend(self.new.alter_attributes_sql(old))
+        return statements
@@ -1,4 +1,8 @@
+from collections.abc import Sequence
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
+from rawmigrate.core import SqlText
 from rawmigrate.entities.index import Index
 
 
@@ -6,10 +10,41 @@ class IndexComparator(Comparator[Index]):
     def _compute_mutation_type(self) -> NodeMutationType:
         if self.old is None:
             return NodeMutationType.CREATE
-        if self.old.on != self.new.on:
+        if not self._same(self.old.on, self.new.on):
+            return NodeMutationType.RECREATE
+        if not self._same(self.old.using, self.new.using):
+            return NodeMutationType.RECREATE
+        if self.old.unique != self.new.unique:
             return NodeMutationType.RECREATE
-        if self.old.using != self.new.using:
+        if not self._all_same(self.old.expressions, self.new.expressions):
             return NodeMutationType.RECREATE
-        if self.old.expressions != self.new.expressions:
+        if (
+            self.old.orderings != self.new.orderings
+            or self.old.nulls_not_distinct != self.new.nulls_not_distinct
+            or not self._all_same(self.old.opclasses, self.new.opclasses)
+            or not self._all_same(self.old.include, self.new.include)
+            or not self._same(self.old.where, self.new.where)
+        ):
             return NodeMutationType.RECREATE
+        if self.old.name != self.new.name or self.old.storage != self.new.storage:
+            return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
+
+    def _all_same(
+        self, old: Sequence[SqlText | None], new: Sequence[SqlText | None]
+    ) -> bool:
+        return len(old) == len(new) and all(
+            self._same(old_text, new_text) for old_text, new_text in zip(old, new)
+        )
+
+    def alter_sql(self) -> list[str]:
+        old = cast(Index, self.old)
+        statements = []
+        if old.name != self.new.name:
+            statements.extend(self.new.rename_sql(old))
+        # storage parameters apply to the pages written from then on, no rebuild
+        statements.extend(
+            f"ALTER INDEX {self.new.qualified_sql} {action}"
+            for action in self.new.storage.alter_actions(old.storage)
+        )
+        return statements
@@ -0,0 +1,18 @@
+from typing import cast
+
+from rawmigrate.comparator import Comparator, NodeMutationType
+from rawmigrate.entities.materialized_view import MaterializedView
+
+
+class MaterializedViewComparator(Comparator[MaterializedView]):
+    def _compute_mutation_type(self) -> NodeMutationType:
+        if self.old is None:
+            return NodeMutationType.CREATE
+        if not self._same(self.old.query, self.new.query):
+            return NodeMutationType.RECREATE
+        if self.old.name != self.new.name:
+            return NodeMutationType.ALTER
+        return NodeMutationType.UNCHANGED
+
+    def alter_sql(self) -> list[str]:
+        return self.new.rename_sql(cast(MaterializedView, self.old))
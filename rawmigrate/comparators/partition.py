@@ -0,0 +1,101 @@
+from typing import cast
+
+from rawmigrate.comparator import Comparator, NodeMutationType
+from rawmigrate.comparators.table import TableComparator
+from rawmigrate.entities.partition import PartitionedTable, PartitionSet
+from rawmigrate.tokenizer import canonicalize
+
+
+class PartitionedTableComparator(TableComparator):
+    def _compute_mutation_type(self) -> NodeMutationType:
+        if self.old is not None and not self._same(
+            cast(PartitionedTable, self.old).partition_by,
+            cast(PartitionedTable, self.new).partition_by,
+        ):
+            # the partitioning of a table can't be altered
+            return NodeMutationType.RECREATE
+        return super()._compute_mutation_type()
+
+
+class PartitionSetComparator(Comparator[PartitionSet]):
+    """
+    Diffs the partitions by their bounds, so a renamed table or suffix
+        renames the partition instead of detaching it.
+    """
+
+    def _compute_mutation_type(self) -> NodeMutationType:
+        if self.old is None:
+            return NodeMutationType.CREATE
+        old = self._suffixes(self.old)
+        new = self._suffixes(self.new)
+        if any(bound not in new and "modulus" in bound.split() for bound in old):
+            # the rows of a hash partition spread over all the others,
+            # a detached one would take them along
+            raise ValueError(
+                f"Can't detach hash partitions of {self.new.table.qualified_sql}, e.g. to change"
+                " the modulus: their rows would be left behind. Move the rows by hand,"
+                " or recreate the table with another partitioning."
+            )
+        if {bound: self.old.partition_sql(suffix) for bound, suffix in old.items()} != {
+            bound: self.new.partition_sql(suffix) for bound, suffix in new.items()
+        }:
+            return NodeMutationType.ALTER
+        return NodeMutationType.UNCHANGED
+
+    @staticmethod
+    def _suffixes(partition_set: PartitionSet) -> dict[str, str]:
+        """
+        Returns canonical bound -> partition suffix.
+        """
+        return {
+            canonicalize(bound): suffix
+            for suffix, bound in partition_set.bounds.items()
+        }
+
+    def alter_sql(self) -> list[str]:
+        old_set = cast(PartitionSet, self.old)
+        old = self._suffixes(old_set)
+        new = self._suffixes(self.new)
+        old_names = {old_set.partition_sql(suffix) for suffix in old.values()}
+        new_names = {self.new.partition_sql(suffix) for suffix in new.values()}
+        statements = []
+        for bound, suffix in old.items():
+            if bound in new:
+                continue
+            name = old_set.partition_sql(suffix)
+            statements.append(self.new.detach_partition_sql(name))
+            if name in new_names:
+                # the detached partition keeps its rows, out of the way of the new one
+                statements.append(
+                    f"ALTER TABLE {name}"
+                    f" RENAME TO {old_set.partition_name_sql(f'{suffix}__detached')}"
+                )
+
+        renames = [
+            (old_set.partition_sql(old[bound]), suffix)
+            for bound, suffix in new.items()
+            if bound in old
+            and old_set.partition_sql(old[bound]) != self.new.partition_sql(suffix)
+        ]
+        if any(self.new.partition_sql(suffix) in old_names for _, suffix in renames):
+            # a partition takes the name another one leaves, e.g. swapped bounds,
+            # so all of them move through temporary names first
+            temporary = []
+            for name, suffix in renames:
+                statements.append(
+                    f"ALTER TABLE {name}"
+                    f" RENAME TO {self.new.partition_name_sql(f'{suffix}__renaming')}"
+                )
+                temporary.append(
+                    (self.new.partition_sql(f"{suffix}__renaming"), suffix)
+                )
+            renames = temporary
+        for name, suffix in renames:
+            statements.append(
+                f"ALTER TABLE {name} RENAME TO {self.new.partition_name_sql(suffix)}"
+            )
+
+        for bound, suffix in new.items():
+            if bound not in old:
+                statements.extend(self.new.create_partition_sql(suffix))
+        return statements
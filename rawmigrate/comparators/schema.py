@@ -1,3 +1,5 @@
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
 from rawmigrate.entities.schema import Schema
 
@@ -9,3 +11,6 @@ class SchemaComparator(Comparator[Schema]):
         if self.old.name != self.new.name:
             return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
+
+    def alter_sql(self) -> list[str]:
+        return self.new.rename_sql(cast(Schema, self.old))
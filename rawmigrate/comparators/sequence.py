@@ -0,0 +1,22 @@
+from typing import cast
+
+from rawmigrate.comparator import Comparator, NodeMutationType
+from rawmigrate.entities.sequence import Sequence
+
+
+class SequenceComparator(Comparator[Sequence]):
+    def _compute_mutation_type(self) -> NodeMutationType:
+        if self.old is None:
+            return NodeMutationType.CREATE
+        # every option can be altered, a recreate would lose the current value
+        if self.old.name != self.new.name or self.old.options != self.new.options:
+            return NodeMutationType.ALTER
+        return NodeMutationType.UNCHANGED
+
+    def alter_sql(self) -> list[str]:
+        old = cast(Sequence, self.old)
+        statements = []
+        if old.name != self.new.name:
+            statements.extend(self.new.rename_sql(old))
+        statements.extend(self.new.alter_options_sql(old))
+        return statements
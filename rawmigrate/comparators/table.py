@@ -1,22 +1,281 @@
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
-from rawmigrate.entities.table import Column, Table
+from rawmigrate.entities.sequence import Identity
+from rawmigrate.entities.table import (
+    Column,
+    ColumnConstraint,
+    ColumnDefinition,
+    Table,
+    TableConstraint,
+)
+from rawmigrate.tokenizer import canonicalize
 
 
 class ColumnComparator(Comparator[Column]):
     def _compute_mutation_type(self) -> NodeMutationType:
         if self.old is None:
             return NodeMutationType.CREATE
-        if self.old.name != self.new.name:
+        if not self._same(self.old.definition, self.new.definition):
+            if any(
+                constraint.table_sql(self.new.sql) is None
+                for constraint in self._changed_constraints()[1]
+            ):
+                # e.g. a generated column, which can't be altered in place
+                return NodeMutationType.RECREATE
             return NodeMutationType.ALTER
-        if self.old.definition != self.new.definition:
+        if self.old.name != self.new.name:
             return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
 
+    @property
+    def rewrites_table(self) -> bool:
+        """
+        Whether the change rewrites the whole table, e.g. a type change.
+        """
+        mutation = self.mutation_type
+        if mutation == NodeMutationType.RECREATE:
+            return True
+        return mutation == NodeMutationType.ALTER and canonicalize(
+            self._old_definition().type
+        ) != canonicalize(self.new.parsed_definition.type)
+
+    def _old_definition(self) -> ColumnDefinition:
+        old = cast(Column, self.old)
+        renamed = self._renamed(old.definition)
+        if renamed is old.definition:
+            return old.parsed_definition
+        return ColumnDefinition.parse(renamed.sql)
+
+    def _changed_constraints(
+        self,
+    ) -> tuple[list[ColumnConstraint], list[ColumnConstraint]]:
+        """
+        Returns the dropped and the added constraints, apart from identities.
+        """
+        old = {
+            canonicalize(constraint.sql): constraint
+            for constraint in self._old_definition().constraints
+            if constraint.identity is None
+        }
+        new = {
+            canonicalize(constraint.sql): constraint
+            for constraint in self.new.parsed_definition.constraints
+            if constraint.identity is None
+        }
+        return (
+            [constraint for key, constraint in old.items() if key not in new],
+            [constraint for key, constraint in new.items() if key not in old],
+        )
+
+    @staticmethod
+    def _identity(definition: ColumnDefinition) -> Identity | None:
+        for constraint in definition.constraints:
+            if (identity := constraint.identity) is not None:
+                return identity
+        return None
+
+    @classmethod
+    def _implies_not_null(cls, definition: ColumnDefinition) -> bool:
+        return definition.not_null or cls._identity(definition) is not None
+
+    def alter_sql(self, tighten: bool = True, validate: bool = True) -> list[str]:
+        """
+        Args:
+            tighten: Whether SET NOT NULL and the added constraints are included,
+                otherwise they are left to `tighten_sql`, e.g. to backfill the column first
+            validate: Whether the added constraints check the existing rows right away,
+                otherwise the ones that can are added as NOT VALID
+                and left to `validate_sql`
+        """
+        old = cast(Column, self.old)
+        statements = []
+        if old.name != self.new.name:
+            statements.extend(self.new.rename_sql(old))
+        if self._same(old.definition, self.new.definition):
+            return statements
+
+        syntax = self.new.syntax
+        column_sql = self.new.sql
+        old_definition = self._old_definition()
+        new_definition = self.new.parsed_definition
+        actions = []
+        if canonicalize(old_definition.type) != canonicalize(new_definition.type):
+            actions.append(f"ALTER COLUMN {column_sql} TYPE {new_definition.type}")
+        if canonicalize(old_definition.default or "") != canonicalize(
+            new_definition.default or ""
+        ):
+            actions.append(
+                f"ALTER COLUMN {column_sql} SET DEFAULT {new_definition.default}"
+                if new_definition.default is not None
+                else f"ALTER COLUMN {column_sql} DROP DEFAULT"
+            )
+        old_identity = self._identity(old_definition)
+        new_identity = self._identity(new_definition)
+        if old_identity is not None and new_identity is None:
+            actions.append(f"ALTER COLUMN {column_sql} DROP IDENTITY")
+        elif old_identity is not None and new_identity is not None:
+            # the options are altered on the sequence behind the identity,
+            # which keeps counting from its current value
+            changes = [
+                f"SET {clause}"
+                for clause in new_identity.options.alter_clauses(old_identity.options)
+            ]
+            if old_identity.always != new_identity.always:
+                changes.insert(0, f"SET GENERATED {new_identity.generated_sql}")
+            if changes:
+                actions.append(f"ALTER COLUMN {column_sql} {' '.join(changes)}")
+        if (
+            self._implies_not_null(old_definition)
+            and not self._implies_not_null(new_definition)
+            # a primary key can't be nullable
+            and not any(
+                constraint.kind == "primary"
+                for constraint in new_definition.constraints
+            )
+        ):
+            actions.append(f"ALTER COLUMN {column_sql} DROP NOT NULL")
+
+        dropped, _ = self._changed_constraints()
+        for constraint in dropped:
+            name = constraint.name_sql(syntax, old.table._name, old.name)
+            actions.append(f"DROP CONSTRAINT {name}")
+
+        statements.extend(self.new.alter_table_sql(action) for action in actions)
+        if tighten:
+            statements.extend(self.tighten_sql(validate))
+        return statements
+
+    def tighten_sql(self, validate: bool = True) -> list[str]:
+        """
+        Returns the statements adding NOT NULL, the identity and the constraints
+            the new definition gains.
+
+        Args:
+            validate: See `alter_sql`
+        """
+        old = cast(Column, self.old)
+        if self._same(old.definition, self.new.definition):
+            return []
+        actions = []
+        old_definition = self._old_definition()
+        new_definition = self.new.parsed_definition
+        old_identity = self._identity(old_definition)
+        new_identity = self._identity(new_definition)
+        if not self._implies_not_null(old_definition) and self._implies_not_null(
+            new_definition
+        ):
+            actions.append(f"ALTER COLUMN {self.new.sql} SET NOT NULL")
+        if old_identity is None and new_identity is not None:
+            actions.append(f"ALTER COLUMN {self.new.sql} ADD {new_identity.sql}")
+        _, added = self._changed_constraints()
+        actions.extend(
+            self.new.add_constraint_sql(constraint, validate) for constraint in added
+        )
+        return [self.new.alter_table_sql(action) for action in actions]
+
+    def validate_sql(self) -> list[str]:
+        """
+        Returns the statements validating the constraints
+            `alter_sql(validate=False)` adds as NOT VALID.
+        """
+        if self.mutation_type != NodeMutationType.ALTER:
+            return []
+        _, added = self._changed_constraints()
+        return [
+            self.new.validate_constraint_sql(constraint)
+            for constraint in added
+            if constraint.validates_rows and constraint.table_sql(self.new.sql)
+        ]
+
 
 class TableComparator(Comparator[Table]):
     def _compute_mutation_type(self) -> NodeMutationType:
         if self.old is None:
             return NodeMutationType.CREATE
-        if self.old._name != self.new._name:
+        if (
+            self.old._name != self.new._name
+            or any(self._changed_constraints())
+            or self.old.storage != self.new.storage
+        ):
             return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
+
+    def _changed_constraints(
+        self,
+    ) -> tuple[list[TableConstraint], list[TableConstraint]]:
+        """
+        Returns the dropped and the added constraints among the additional expressions.
+        Dropped ones are only known by their name if Postgres named them after columns.
+        """
+        old = {
+            canonicalize(self._renamed(expression).sql): expression
+            for expression in cast(Table, self.old)._additional_expressions
+        }
+        new = {
+            canonicalize(expression.sql): expression
+            for expression in self.new._additional_expressions
+        }
+        return (
+            [
+                constraint
+                for key, expression in old.items()
+                if key not in new
+                and (constraint := TableConstraint.parse(expression.sql)) is not None
+            ],
+            [
+                constraint
+                for key, expression in new.items()
+                if key not in old
+                and (constraint := TableConstraint.parse(expression.sql)) is not None
+            ],
+        )
+
+    def alter_sql(self, validate: bool = True) -> list[str]:
+        """
+        Args:
+            validate: Whether the added constraints check the existing rows right away,
+                otherwise the ones that can be named are added as NOT VALID
+                and left to `validate_sql`
+        """
+        old = cast(Table, self.old)
+        statements = []
+        if old._name != self.new._name:
+            statements.extend(self.new.rename_sql(old))
+        syntax = self.new.syntax
+        dropped, added = self._changed_constraints()
+        for constraint in dropped:
+            if (name := constraint.name_sql(syntax, old._name)) is not None:
+                statements.append(
+                    f"ALTER TABLE {self.new.qualified_sql} DROP CONSTRAINT {name}"
+                )
+        for constraint in added:
+            name = constraint.name_sql(syntax, self.new._name)
+            if name is None:
+                action = f"ADD {constraint.sql}"
+            else:
+                not_valid = (
+                    " NOT VALID" if not validate and constraint.validates_rows else ""
+                )
+                action = f"ADD CONSTRAINT {name} {constraint.sql}{not_valid}"
+            statements.append(f"ALTER TABLE {self.new.qualified_sql} {action}")
+        statements.extend(
+            f"ALTER TABLE {self.new.qualified_sql} {action}"
+            for action in self.new.storage.alter_actions(old.storage)
+        )
+        return statements
+
+    def validate_sql(self) -> list[str]:
+        """
+        Returns the statements validating the constraints
+            `alter_sql(validate=False)` adds as NOT VALID.
+        """
+        if self.mutation_type != NodeMutationType.ALTER:
+            return []
+        syntax = self.new.syntax
+        return [
+            f"ALTER TABLE {self.new.qualified_sql} VALIDATE CONSTRAINT {name}"
+            for constraint in self._changed_constraints()[1]
+            if constraint.validates_rows
+            and (name := constraint.name_sql(syntax, self.new._name)) is not None
+        ]
@@ -1,3 +1,5 @@
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
 from rawmigrate.entities.trigger import Trigger
 
@@ -6,11 +8,11 @@ class TriggerComparator(Comparator[Trigger]):
     def _compute_mutation_type(self) -> NodeMutationType:
         if self.old is None:
             return NodeMutationType.CREATE
-        if self.old.on != self.new.on:
+        if not self._same(self.old.on, self.new.on):
             return NodeMutationType.RECREATE
-        if self.old.function != self.new.function:
+        if not self._same(self.old.function, self.new.function):
             return NodeMutationType.RECREATE
-        if self.old.procedure != self.new.procedure:
+        if not self._same(self.old.procedure, self.new.procedure):
             return NodeMutationType.RECREATE
         if self.old.before != self.new.before:
             return NodeMutationType.RECREATE
@@ -18,4 +20,9 @@ class TriggerComparator(Comparator[Trigger]):
             return NodeMutationType.RECREATE
         if self.old.instead_of != self.new.instead_of:
             return NodeMutationType.RECREATE
+        if self.old.name != self.new.name:
+            return NodeMutationType.ALTER
         return NodeMutationType.UNCHANGED
+
+    def alter_sql(self) -> list[str]:
+        return self.new.rename_sql(cast(Trigger, self.old))
@@ -1,24 +1,166 @@
+import itertools
+import re
 from abc import ABC
+from collections.abc import Mapping
+from dataclasses import dataclass
 from enum import StrEnum
-from typing import Iterable, Sequence
+from typing import Iterable, Sequence, cast
 
+from rawmigrate.tokenizer import canonical_digest
 from rawmigrate.utils import hash_str
 
 
+class RefTable:
+    """
+    Interns refs to short tokens, e.g. `#1.42`, used in meta tags instead of the refs,
+        so formatted texts stay small and are cheap to scan.
+
+    Tokens are only meaningful to the table that issued them,
+        each table has its own id baked into its tokens.
+    """
+
+    token_prefix = "#"
+    _next_id = itertools.count()
+
+    def __init__(self):
+        self._id = next(RefTable._next_id)
+        self._token_start = f"{self.token_prefix}{self._id}."
+        self._refs: list[str] = []
+        self._tokens: dict[str, str] = {}
+
+    def token(self, ref: str) -> str:
+        token = self._tokens.get(ref)
+        if token is None:
+            token = f"{self._token_start}{len(self._refs)}"
+            self._refs.append(ref)
+            self._tokens[ref] = token
+        return token
+
+    def ref(self, token: str) -> str:
+        if not token.startswith(self._token_start):
+            raise ValueError(f"Token {token} was issued by another ref table")
+        return self._refs[int(token[len(self._token_start) :])]
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+
 class Syntax:
-    def __init__(self, meta_open: str = "\ue000", meta_close: str = "\ue001"):
+    def __init__(
+        self,
+        meta_open: str = "\ue000",
+        meta_close: str = "\ue001",
+        intern_refs: bool = False,
+        ref_table: RefTable | None = None,
+        keep_templates: bool = False,
+        slot_open: str = "\ue002",
+    ):
+        """
+        Args:
+            meta_open: Opens a meta tag
+            meta_close: Closes a meta tag
+            intern_refs: Whether each registry should intern refs in meta tags
+                to short tokens (see `RefTable`)
+            ref_table: The table to intern refs with, set per registry
+                by `with_ref_table`
+            keep_templates: Whether texts remember where identifiers appear
+                (see `SqlTemplate`)
+            slot_open: Marks the start of an identifier in formatted texts,
+                the identifier ends with its meta tag
+        """
         self.meta_open = meta_open
         self.meta_close = meta_close
+        self.intern_refs = intern_refs
+        self.ref_table = ref_table
+        self.keep_templates = keep_templates
+        self.slot_open = slot_open
+        self._tag_pattern = re.compile(
+            f"{re.escape(slot_open)}([^{re.escape(meta_open)}]*)"
+            f"{re.escape(meta_open)}([^{re.escape(meta_close)}]*){re.escape(meta_close)}"
+            f"|{re.escape(meta_open)}([^{re.escape(meta_close)}]*){re.escape(meta_close)}"
+        )
+
+    def with_ref_table(self, ref_table: RefTable) -> "Syntax":
+        """
+        Returns the syntax interning refs with the given table,
+            or this syntax if interning is disabled.
+        """
+        if not self.intern_refs:
+            return self
+        return Syntax(
+            self.meta_open,
+            self.meta_close,
+            True,
+            ref_table,
+            self.keep_templates,
+            self.slot_open,
+        )
 
     def format_sql_identifier(self, parts: Sequence[str]) -> str:
         return f'"{'"."'.join(parts)}"'
 
+    def format_dollar_quoted(self, text: str) -> str:
+        """
+        Quotes the text with a dollar tag that doesn't occur in it.
+        """
+        tag = "$$"
+        counter = 0
+        while tag in text:
+            counter += 1
+            tag = f"$q{counter}$"
+        return f"{tag}{text}{tag}"
+
     def format_meta_value(self, value: str) -> str:
         return f"{self.meta_open}{value}{self.meta_close}"
 
     def format_meta_values(self, values: Iterable[str]) -> str:
+        if self.ref_table is not None:
+            values = map(self.ref_table.token, values)
         return "".join(self.format_meta_value(value) for value in values)
 
+    def format_slot(self, sql: str, ref: str) -> str:
+        """
+        Formats an identifier so that its position survives in the template.
+        """
+        return f"{self.slot_open}{sql}{self.format_meta_values([ref])}"
+
+    def _decode_ref(self, tag: str) -> str:
+        if self.ref_table is not None and tag.startswith(RefTable.token_prefix):
+            return self.ref_table.ref(tag)
+        return tag
+
+    def extract_template(self, text: str) -> tuple["SqlTemplate", set[str]]:
+        """
+        Splits the text into literal segments and identifier slots.
+
+        Returns:
+            The template, and the refs of all meta values (slots included).
+        """
+        if self.meta_open not in text and self.slot_open not in text:
+            # plain SQL, e.g. imported from an export
+            return SqlTemplate((text,), ()), set()
+        segments: list[str] = []
+        slots: list[tuple[str, str]] = []
+        tags: set[str] = set()
+        literal: list[str] = []
+        position = 0
+        for match in self._tag_pattern.finditer(text):
+            literal.append(text[position : match.start()])
+            position = match.end()
+            identifier, slot_tag, tag = match.groups()
+            if tag is not None:
+                tags.add(tag)
+                continue
+            segments.append("".join(literal))
+            literal = []
+            slots.append((self._decode_ref(slot_tag), identifier))
+        literal.append(text[position:])
+        segments.append("".join(literal).replace(self.slot_open, ""))
+
+        references = {self._decode_ref(tag) for tag in tags}
+        references.update(ref for ref, _ in slots)
+        return SqlTemplate(tuple(segments), tuple(slots)), references
+
     def extract_meta_tags(self, text: str) -> tuple[str, set[str]]:
         """
         Extracts meta values from the text.
@@ -26,6 +168,9 @@ class Syntax:
         Returns:
             The text without the meta values, and the list of meta values.
         """
+        if self.meta_open not in text and self.slot_open not in text:
+            # plain SQL, e.g. imported from an export
+            return text, set()
 
         # example 1: "{meta}sql{meta}" -> ["", "meta}sql", "meta}"]
         # example 2: "sql{meta}" -> ["sql", "meta}"]
@@ -39,8 +184,65 @@ class Syntax:
         result_text = "".join(part[-1] for part in all_parts)
         result_tags = {part[0] for part in all_parts if len(part) > 1}
 
+        # tags are deduplicated before decoding, so each token is looked up once;
+        # texts formatted without interning carry plain refs
+        if self.ref_table is not None:
+            result_tags = {self._decode_ref(tag) for tag in result_tags}
+        if self.slot_open in result_text:
+            result_text = result_text.replace(self.slot_open, "")
+
         return result_text, result_tags
 
+    def extract_tagged(
+        self, text: str
+    ) -> tuple[str, set[str], tuple[tuple[str, int], ...]]:
+        """
+        Same as `extract_meta_tags`, also returning where each meta value was.
+        Slower, only used when the positions are needed.
+
+        Returns:
+            The text without the meta values, the meta values,
+                and (meta value, offset in the text) of each occurrence,
+                in the text order. A meta value follows the identifier it tags.
+        """
+        # example: "sql{meta}sql{meta}" -> ["sql", "meta}sql", "meta}"]
+        first, *tagged = text.split(self.meta_open)
+        # -> [("meta", "}", "sql"), ("meta", "}", "")],
+        # a part without "}" follows a stray opening character and is SQL
+        parts = [part.partition(self.meta_close) for part in tagged]
+        pieces = [first, *[sql if closed else tag for tag, closed, sql in parts]]
+        if self.slot_open in text:
+            pieces = [piece.replace(self.slot_open, "") for piece in pieces]
+        # each tag is at the end of the SQL before it
+        tags = [
+            (tag, offset)
+            for (tag, closed, _), offset in zip(
+                parts, itertools.accumulate(map(len, pieces))
+            )
+            if closed
+        ]
+
+        # tags are deduplicated before decoding, so each token is looked up once;
+        # texts formatted without interning carry plain refs
+        if self.ref_table is not None:
+            decoded = {tag: self._decode_ref(tag) for tag, _ in tags}
+            tags = [(decoded[tag], offset) for tag, offset in tags]
+        return "".join(pieces), {ref for ref, _ in tags}, tuple(tags)
+
+    def format_tagged(self, sql: str, positions: Iterable[tuple[str, int]]) -> str:
+        """
+        Formats the SQL with meta values at the given offsets,
+            the reverse of `extract_tagged`.
+        """
+        parts = []
+        start = 0
+        for value, offset in positions:
+            parts.append(sql[start:offset])
+            parts.append(self.format_meta_values([value]))
+            start = offset
+        parts.append(sql[start:])
+        return "".join(parts)
+
 
 class DB:
     def __init__(
@@ -49,6 +251,70 @@ class DB:
     ):
         self.syntax = syntax or Syntax()
 
+    def with_ref_table(self, ref_table: RefTable) -> "DB":
+        """
+        Returns the DB whose syntax interns refs with the given table,
+            or this DB if interning is disabled.
+        """
+        syntax = self.syntax.with_ref_table(ref_table)
+        if syntax is self.syntax:
+            return self
+        return DB(syntax)
+
+
+@dataclass(slots=True, frozen=True)
+class SqlTemplate:
+    """
+    SQL split into literal segments interleaved with identifier slots,
+        so identifiers can be swapped without scanning the text again.
+    """
+
+    segments: tuple[str, ...]
+    # (ref, identifier SQL), one between every two segments
+    slots: tuple[tuple[str, str], ...]
+
+    @property
+    def slot_refs(self) -> set[str]:
+        return {ref for ref, _ in self.slots}
+
+    def render(self) -> str:
+        parts = [self.segments[0]]
+        for (_, identifier), segment in zip(self.slots, self.segments[1:]):
+            parts.append(identifier)
+            parts.append(segment)
+        return "".join(parts)
+
+    def format(self, syntax: Syntax) -> str:
+        """
+        Renders the template keeping the slots, to embed it in another template.
+        """
+        parts = [self.segments[0]]
+        for (ref, identifier), segment in zip(self.slots, self.segments[1:]):
+            parts.append(syntax.format_slot(identifier, ref))
+            parts.append(segment)
+        return "".join(parts)
+
+    def replace(
+        self,
+        identifiers: Mapping[str, str],
+        refs: Mapping[str, str] | None = None,
+    ) -> "SqlTemplate":
+        """
+        Returns the template with the identifiers of the given refs swapped.
+
+        Args:
+            identifiers: Ref -> new identifier SQL
+            refs: Ref -> new ref of the slot
+        """
+        refs = refs or {}
+        return SqlTemplate(
+            self.segments,
+            tuple(
+                (refs.get(ref, ref), identifiers.get(ref, identifier))
+                for ref, identifier in self.slots
+            ),
+        )
+
 
 class SqlFormatOption(StrEnum):
     """
@@ -65,12 +331,59 @@ class BaseSqlText(ABC):
     def __init__(self, syntax: Syntax):
         self._syntax: Syntax = syntax
         self._references: set[str] = set()
-        self._sql: str = ""
+        # None until rendered from the template
+        self._sql: str | None = ""
+        self._template: SqlTemplate | None = None
+        # the SQL formatted with its meta tags, kept when there is no template,
+        # so the positions of the tags can be recovered
+        self._tagged: str | None = None
+        self._canonical_digest: str | None = None
+
+    @property
+    def syntax(self) -> Syntax:
+        return self._syntax
 
     @property
     def sql(self) -> str:
+        if self._sql is None:
+            self._sql = cast(SqlTemplate, self._template).render()
         return self._sql
 
+    @property
+    def template(self) -> SqlTemplate | None:
+        """
+        Where the identifiers appear in the SQL, kept if the syntax `keep_templates`.
+        """
+        return self._template
+
+    @property
+    def tag_positions(self) -> tuple[tuple[str, int], ...]:
+        """
+        (ref, offset) of each identifier tagged in the SQL, in the text order,
+            the identifier ends at the offset. Empty for plain SQL.
+        """
+        if self._tagged is None:
+            return ()
+        return self._syntax.extract_tagged(self._tagged)[2]
+
+    @property
+    def canonical_digest(self) -> str:
+        """
+        Digest of the SQL ignoring whitespace, comments and keyword case.
+        Computed once per text.
+        """
+        if self._canonical_digest is None:
+            self._canonical_digest = canonical_digest(self.sql)
+        return self._canonical_digest
+
+    def equivalent(self, other: "BaseSqlText | None") -> bool:
+        """
+        Whether the other text differs only cosmetically.
+        """
+        if other is None:
+            return False
+        return self.canonical_digest == other.canonical_digest
+
     @property
     def references(self) -> set[str]:
         return self._references
@@ -80,6 +393,15 @@ class BaseSqlText(ABC):
             case SqlFormatOption.SQL_TEXT:
                 return self.sql
             case SqlFormatOption.SQL_META | "":
+                if self._template is not None and self._syntax.keep_templates:
+                    return self._template.format(
+                        self._syntax
+                    ) + self._syntax.format_meta_values(
+                        self.references - self._template.slot_refs
+                    )
+                if self._tagged is not None:
+                    # the tags stay next to their identifiers when nested
+                    return self._tagged
                 if self.references:
                     return (
                         f"{self.sql}{self._syntax.format_meta_values(self.references)}"
@@ -105,10 +427,62 @@ class SqlText(BaseSqlText):
     def __init__(self, syntax: Syntax, text: SqlTextLike):
         super().__init__(syntax)
         if isinstance(text, BaseSqlText):
-            self._sql = text.sql
+            self._sql = text._sql
+            self._template = text._template
             self._references = text.references
+            self._tagged = text._tagged
+            self._canonical_digest = text._canonical_digest
+        elif syntax.keep_templates:
+            # rendered on first use
+            self._sql = None
+            self._template, self._references = self._syntax.extract_template(text)
         else:
             self._sql, self._references = self._syntax.extract_meta_tags(text)
+            if self._references:
+                self._tagged = text
+
+    @classmethod
+    def from_parts(
+        cls,
+        syntax: Syntax,
+        sql: str,
+        references: Iterable[str] = (),
+        tag_positions: tuple[tuple[str, int], ...] = (),
+    ) -> "SqlText":
+        """
+        Builds a text from already extracted parts, skipping the meta tags scan.
+        """
+        text = cls.__new__(cls)
+        BaseSqlText.__init__(text, syntax)
+        text._sql = sql
+        text._references = set(references)
+        if tag_positions:
+            text._tagged = syntax.format_tagged(sql, tag_positions)
+        return text
+
+    def with_identifiers(
+        self,
+        identifiers: Mapping[str, str],
+        refs: Mapping[str, str] | None = None,
+    ) -> "SqlText":
+        """
+        Returns the text with the identifiers of the given refs swapped,
+            without scanning the SQL again. Requires the template.
+
+        Args:
+            identifiers: Ref -> new identifier SQL
+            refs: Ref -> new ref, for references that change along
+        """
+        text = type(self).__new__(type(self))
+        BaseSqlText.__init__(text, self._syntax)
+        text._sql = None
+        text._template = cast(SqlTemplate, self._template).replace(identifiers, refs)
+        text._references = (
+            {refs.get(ref, ref) for ref in self._references}
+            if refs
+            else self._references
+        )
+        return text
 
 
 class SqlIdentifier(BaseSqlText):
@@ -118,3 +492,13 @@ class SqlIdentifier(BaseSqlText):
         super().__init__(syntax)
         self._sql = self._syntax.format_sql_identifier(parts)
         self._references = set(references)
+
+    def __format__(self, format_spec: SqlFormatOption | str) -> str:
+        if (
+            format_spec in (SqlFormatOption.SQL_META, "")
+            and self._syntax.keep_templates
+            and len(self._references) == 1
+        ):
+            # the identifier becomes a slot of the template it is formatted into
+            return self._syntax.format_slot(self.sql, next(iter(self._references)))
+        return super().__format__(format_spec)
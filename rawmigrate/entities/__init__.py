@@ -1,7 +1,30 @@
+from .backfill import Backfill
 from .function import Function
-from .index import Index
+from .index import Index, IndexKey
+from .materialized_view import MaterializedView
+from .partition import PartitionedTable, PartitionSet
 from .schema import Schema
+from .sequence import Identity, Sequence, SequenceOptions, identity
+from .storage import IndexStorage, TableStorage
 from .table import Table, Column
 from .trigger import Trigger
 
-__all__ = ["Function", "Index", "Schema", "Table", "Trigger", "Column"]
+__all__ = [
+    "Backfill",
+    "Function",
+    "Index",
+    "IndexKey",
+    "IndexStorage",
+    "MaterializedView",
+    "PartitionedTable",
+    "PartitionSet",
+    "Schema",
+    "Sequence",
+    "SequenceOptions",
+    "Identity",
+    "identity",
+    "Table",
+    "TableStorage",
+    "Trigger",
+    "Column",
+]
@@ -0,0 +1,224 @@
+from typing import TYPE_CHECKING, cast, override
+
+from rawmigrate.chunks import ChunkedLoop
+from rawmigrate.core import SqlText, SqlTextLike
+from rawmigrate.entity import DBEntity, EntityBundle
+from rawmigrate.entities.table import Column, Table
+from rawmigrate.utils import fingerprint
+
+if TYPE_CHECKING:
+    from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
+
+
+class Backfill(DBEntity):
+    """
+    A data update run in key-range chunks, committed one chunk at a time.
+
+    Attached to a column, `set` is the value to fill it with, and the column is added
+        without NOT NULL and its constraints, which are added once the backfill is done.
+    Attached to a table, `set` is the whole SET clause.
+
+    The progress is stored along with each chunk (see `ChunkedLoop`),
+        so an interrupted backfill resumes from the last finished chunk.
+    """
+
+    def __init__(
+        self,
+        manager: "EntityManager",
+        entity_ref: str,
+        dependencies: set[str] | None,
+        name: str,
+        table_ref: str,
+        column_ref: str | None,
+        set: SqlText,
+        key: SqlText,
+        where: SqlText | None,
+        chunk_size: int,
+        throttle: float,
+    ):
+        self.name = name
+        self.table_ref = table_ref
+        self.column_ref = column_ref
+        self.set = set
+        self.key = key
+        self.where = where
+        self.chunk_size = chunk_size
+        self.throttle = throttle
+        DBEntity.__init__(self, manager, entity_ref, dependencies)
+
+    @classmethod
+    def create(
+        cls,
+        _manager: "EntityManager",
+        _name: str,
+        _entity_ref: str = "",
+        *,
+        on: Table | Column,
+        set: SqlTextLike,
+        key: SqlTextLike,
+        where: SqlTextLike | None = None,
+        chunk_size: int = 10_000,
+        throttle: float = 0.0,
+    ):
+        """
+        Args:
+            on: The column to fill, or the table to update
+            set: The value of the column, or the SET clause for a table
+            key: An integer key column of the table the chunks are ranges of
+            where: Restricts the updated rows
+            chunk_size: The width of the key range updated per chunk
+            throttle: Seconds to sleep between chunks
+        """
+        table_ref = on.table_ref if isinstance(on, Column) else on.ref
+        column_ref = on.ref if isinstance(on, Column) else None
+        return EntityBundle(
+            cls(
+                manager=_manager,
+                entity_ref=_entity_ref or f"{table_ref}|{cls.create_ref(_name)}",
+                dependencies=_manager.dependency_refs | {on.ref},
+                name=_name,
+                table_ref=table_ref,
+                column_ref=column_ref,
+                set=SqlText(_manager.db.syntax, set),
+                key=SqlText(_manager.db.syntax, key),
+                where=SqlText(_manager.db.syntax, where) if where else None,
+                chunk_size=chunk_size,
+                throttle=throttle,
+            )
+        )
+
+    def _infer_dependency_refs(self) -> set[str]:
+        return (
+            {self.table_ref}
+            | self.set.references
+            | self.key.references
+            | (self.where.references if self.where else set())
+        )
+
+    @override
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ref": self.ref,
+            "table_ref": self.table_ref,
+            "column_ref": self.column_ref,
+            "set": self.set.sql,
+            "key": self.key.sql,
+            "where": self.where.sql if self.where else None,
+            "chunk_size": self.chunk_size,
+            "throttle": self.throttle,
+            "dependencies": sorted(self.dependency_refs),
+        }
+
+    @override
+    @classmethod
+    def from_dict(cls, manager: "EntityManager", data: dict):
+        return EntityBundle(
+            cls(
+                manager=manager,
+                entity_ref=data["ref"],
+                dependencies=set(data["dependencies"]),
+                name=data["name"],
+                table_ref=data["table_ref"],
+                column_ref=data["column_ref"],
+                set=SqlText(manager.db.syntax, data["set"]),
+                key=SqlText(manager.db.syntax, data["key"]),
+                where=(
+                    SqlText(manager.db.syntax, data["where"]) if data["where"] else None
+                ),
+                chunk_size=data["chunk_size"],
+                throttle=data["throttle"],
+            )
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                table_ref=rebinder.ref(self.table_ref),
+                column_ref=(rebinder.ref(self.column_ref) if self.column_ref else None),
+                set=rebinder.text(self.set),
+                key=rebinder.text(self.key),
+                where=rebinder.text(self.where) if self.where else None,
+                chunk_size=self.chunk_size,
+                throttle=self.throttle,
+            )
+        )
+
+    @property
+    def table(self) -> Table:
+        return cast(Table, self.manager.registry.get_entity(self.table_ref))
+
+    @property
+    def column(self) -> Column | None:
+        if self.column_ref is None:
+            return None
+        return cast(Column, self.manager.registry.get_entity(self.column_ref))
+
+    @property
+    def progress_name(self) -> str:
+        """
+        Identifies the progress of this backfill, changes along with what it updates.
+        """
+        return f"{self.table_ref}|{self.name}.{self.definition_digest()[:12]}"
+
+    def chunk_sql(self, start: str, end: str) -> str:
+        """
+        Updates the rows with keys in [start, end).
+
+        Args:
+            start: SQL of the first key, e.g. a literal or a variable
+            end: SQL of the key right after the chunk
+        """
+        column = self.column
+        set_sql = f"{column.sql} = {self.set.sql}" if column else self.set.sql
+        where = f" AND ({self.where.sql})" if self.where else ""
+        return (
+            f"UPDATE {self.table.qualified_sql} SET {set_sql}"
+            f" WHERE {self.key.sql} >= {start} AND {self.key.sql} < {end}{where}"
+        )
+
+    @property
+    def loop(self) -> ChunkedLoop:
+        where = f" WHERE {self.where.sql}" if self.where else ""
+        return ChunkedLoop(
+            name=self.progress_name,
+            bounds_sql=(
+                f"SELECT min({self.key.sql}), max({self.key.sql})"
+                f" FROM {self.table.qualified_sql}{where}"
+            ),
+            chunk_sql=self.chunk_sql,
+            chunk_size=self.chunk_size,
+            throttle=self.throttle,
+        )
+
+    @override
+    def create_sql(self) -> list[str]:
+        return [self.loop.do_sql(self.manager.db.syntax)]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        # the updated data stays
+        return []
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return []
+
+    def definition_digest(self, renames: "Renames | None" = None) -> str:
+        """
+        Digest of what the backfill updates, the chunking settings aside.
+        """
+        return fingerprint(
+            self.table_ref,
+            self.column_ref or "",
+            self._text_digest(self.set, renames),
+            self._text_digest(self.key, renames),
+            self._text_digest(self.where, renames) if self.where else "",
+        )
@@ -1,12 +1,16 @@
-from typing import TYPE_CHECKING, OrderedDict, override
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Literal, OrderedDict, cast, override
 
 from rawmigrate.core import SqlText, SqlTextLike
 from rawmigrate.entity import EntityBundle, SchemaDependantEntity
 from rawmigrate.core import SqlIdentifier
+from rawmigrate.utils import fingerprint
 
 if TYPE_CHECKING:
     from rawmigrate.entity import DBEntity
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
 
 
 class Function(SqlIdentifier, SchemaDependantEntity):
@@ -21,12 +25,26 @@ class Function(SqlIdentifier, SchemaDependantEntity):
         returns: SqlText,
         language: str,
         body: SqlText,
+        volatility: str | None,
+        parallel: str | None,
+        cost: float | None,
+        rows: float | None,
+        leakproof: bool,
+        config: dict[str, str],
     ):
         self.name = name
         self.returns = returns
         self.language = language
         self.body = body
         self.args = args
+        # the attributes, None for the server defaults
+        self.volatility = volatility
+        self.parallel = parallel
+        self.cost = cost
+        self.rows = rows
+        self.leakproof = leakproof
+        # configuration parameter -> value SQL, set while the function runs
+        self.config = config
         SchemaDependantEntity.__init__(self, manager, entity_ref, schema, dependencies)
         SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
 
@@ -41,7 +59,27 @@ class Function(SqlIdentifier, SchemaDependantEntity):
         returns: SqlTextLike,
         language: str = "plpgsql",
         body: SqlTextLike,
+        volatility: Literal["immutable", "stable", "volatile"] | None = None,
+        parallel: Literal["safe", "restricted", "unsafe"] | None = None,
+        cost: float | None = None,
+        rows: float | None = None,
+        leakproof: bool = False,
+        config: Mapping[str, str] | None = None,
     ):
+        """
+        Args:
+            volatility: What the function may do and rely on,
+                which decides whether Postgres can inline it or use it in an index.
+                Postgres assumes volatile if not declared.
+            parallel: Whether it can run in parallel plans, unsafe if not declared
+            cost: Its estimated cost, in units of cpu_operator_cost
+            rows: The estimated number of rows of a set-returning function
+            leakproof: Whether it reveals nothing about its arguments
+                but its result, so it can be pushed into security barrier views
+            config: Configuration parameters set while it runs,
+                e.g. `{"search_path": "public, pg_temp"}`,
+                on top of the `function_config` of the manager
+        """
         cleaned_args = OrderedDict(
             {
                 arg_name: SqlText(_manager.db.syntax, arg_value)
@@ -64,6 +102,12 @@ class Function(SqlIdentifier, SchemaDependantEntity):
                 returns=SqlText(_manager.db.syntax, returns),
                 language=language,
                 body=SqlText(_manager.db.syntax, body),
+                volatility=volatility,
+                parallel=parallel,
+                cost=cost,
+                rows=rows,
+                leakproof=leakproof,
+                config={**_manager.function_config, **(config or {})},
             )
         )
 
@@ -79,10 +123,16 @@ class Function(SqlIdentifier, SchemaDependantEntity):
             "returns": self.returns.sql,
             "language": self.language,
             "body": self.body.sql,
+            "volatility": self.volatility,
+            "parallel": self.parallel,
+            "cost": self.cost,
+            "rows": self.rows,
+            "leakproof": self.leakproof,
+            "config": self.config,
             "args": {
                 arg_name: arg_value.sql for arg_name, arg_value in self.args.items()
             },
-            "dependencies": list(self.dependency_refs),
+            "dependencies": sorted(self.dependency_refs),
         }
 
     @override
@@ -106,5 +156,139 @@ class Function(SqlIdentifier, SchemaDependantEntity):
                 returns=SqlText(manager.db.syntax, data["returns"]),
                 language=data["language"],
                 body=SqlText(manager.db.syntax, data["body"]),
+                volatility=data.get("volatility"),
+                parallel=data.get("parallel"),
+                cost=data.get("cost"),
+                rows=data.get("rows"),
+                leakproof=data.get("leakproof", False),
+                config=data.get("config", {}),
             )
         )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                schema=self._rebind_schema(rebinder),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                args=OrderedDict(
+                    {
+                        arg_name: rebinder.text(arg_value)
+                        for arg_name, arg_value in self.args.items()
+                    }
+                ),
+                returns=rebinder.text(self.returns),
+                language=self.language,
+                body=rebinder.text(self.body),
+                volatility=self.volatility,
+                parallel=self.parallel,
+                cost=self.cost,
+                rows=self.rows,
+                leakproof=self.leakproof,
+                config={
+                    parameter: rebinder.sql(value)
+                    for parameter, value in self.config.items()
+                },
+            )
+        )
+
+    @property
+    def signature_sql(self) -> str:
+        args = ", ".join(
+            f"{self._syntax.format_sql_identifier([arg_name])} {arg_value.sql}"
+            for arg_name, arg_value in self.args.items()
+        )
+        return f"{self.qualified_sql}({args})"
+
+    def _attributes(self) -> dict[str, str]:
+        """
+        Returns the clause of each attribute declared, by attribute.
+        """
+        attributes = {}
+        if self.volatility:
+            attributes["volatility"] = self.volatility.upper()
+        if self.parallel:
+            attributes["parallel"] = f"PARALLEL {self.parallel.upper()}"
+        if self.leakproof:
+            attributes["leakproof"] = "LEAKPROOF"
+        if self.cost is not None:
+            attributes["cost"] = f"COST {self.cost:g}"
+        if self.rows is not None:
+            attributes["rows"] = f"ROWS {self.rows:g}"
+        for parameter, value in self.config.items():
+            attributes[f"config {parameter}"] = f"SET {parameter} = {value}"
+        return attributes
+
+    @override
+    def create_sql(self, replace: bool = False) -> list[str]:
+        """
+        Args:
+            replace: Whether it replaces the function of the same signature,
+                all its attributes included
+        """
+        attributes = "".join(f" {clause}" for clause in self._attributes().values())
+        return [
+            (
+                f"CREATE {'OR REPLACE ' if replace else ''}FUNCTION {self.signature_sql}"
+                f" RETURNS {self.returns.sql} LANGUAGE {self.language}{attributes}"
+                f" AS {self._syntax.format_dollar_quoted(self.body.sql)}"
+            )
+        ]
+
+    def alter_attributes_sql(self, old: "Function") -> list[str]:
+        """
+        Returns the ALTER FUNCTION changing the attributes of the old function
+            into these, in place, so nothing depending on it is recreated.
+        """
+        old_attributes = old._attributes()
+        new_attributes = self._attributes()
+        actions = [
+            clause
+            for attribute, clause in new_attributes.items()
+            if old_attributes.get(attribute) != clause
+        ]
+        # the ones no longer declared go back to the defaults
+        defaults = {
+            "volatility": "VOLATILE",
+            "parallel": "PARALLEL UNSAFE",
+            "leakproof": "NOT LEAKPROOF",
+            "cost": "COST 1" if self.language in ("c", "internal") else "COST 100",
+            "rows": "ROWS 1000",
+        }
+        for attribute in old_attributes:
+            if attribute in new_attributes:
+                continue
+            if attribute.startswith("config "):
+                actions.append(f"RESET {attribute.removeprefix('config ')}")
+            elif attribute != "rows" or self.returns.sql.lower().startswith("setof "):
+                actions.append(defaults[attribute])
+        if not actions:
+            return []
+        return [f"ALTER FUNCTION {self.signature_sql} {' '.join(actions)}"]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP FUNCTION {self.signature_sql}"]
+
+    @override
+    def rename_sql(self, old: "DBEntity") -> list[str]:
+        return [
+            f"ALTER FUNCTION {cast(Function, old).signature_sql} RENAME TO {self.sql}"
+        ]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return fingerprint(
+            *(
+                part
+                for arg_name, arg_value in self.args.items()
+                for part in (arg_name, self._text_digest(arg_value, renames))
+            ),
+            self._text_digest(self.returns, renames),
+            self.language,
+            *self._attributes().values(),
+            self._text_digest(self.body, renames),
+        )
@@ -1,11 +1,44 @@
-from typing import TYPE_CHECKING, override
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, cast, override
 
 from rawmigrate.core import SqlText, SqlTextLike
-from rawmigrate.entity import DBEntity, EntityBundle
+from rawmigrate.entities.storage import IndexStorage
+from rawmigrate.entity import DBEntity, EntityBundle, SchemaDependantEntity
+from rawmigrate.tokenizer import iter_tokens
+from rawmigrate.utils import fingerprint
 from rawmigrate.core import SqlIdentifier
 
 if TYPE_CHECKING:
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
+
+
+@dataclass(slots=True, frozen=True)
+class IndexKey:
+    """
+    A key of an index with its operator class or ordering.
+
+    Usage::
+
+        root.Index("users_email", on=users, using="btree", expressions=[
+            IndexKey(users.c.email, opclass="text_pattern_ops"),
+            IndexKey(users.c.created_at, descending=True, nulls="last"),
+        ])
+    """
+
+    expression: SqlTextLike
+    opclass: SqlTextLike | None = None
+    descending: bool = False
+    # where NULLs sort, by default last ascending and first descending
+    nulls: Literal["first", "last"] | None = None
+
+    @property
+    def ordering_sql(self) -> str:
+        parts = ["DESC"] if self.descending else []
+        if self.nulls is not None:
+            parts.append(f"NULLS {self.nulls.upper()}")
+        return " ".join(parts)
 
 
 class Index(SqlIdentifier, DBEntity):
@@ -18,11 +51,28 @@ class Index(SqlIdentifier, DBEntity):
         on: SqlText,
         using: SqlText,
         expressions: list[SqlText],
+        unique: bool,
+        storage: IndexStorage,
+        opclasses: list[SqlText | None],
+        orderings: list[str],
+        include: list[SqlText],
+        nulls_not_distinct: bool,
+        where: SqlText | None,
     ):
         self.name = name
         self.on = on
         self.using = using
         self.expressions = expressions
+        self.unique = unique
+        self.storage = storage
+        # the operator class and the ordering of each expression, empty for defaults
+        self.opclasses = opclasses
+        self.orderings = orderings
+        # columns stored in the index, to answer queries without reading the table
+        self.include = include
+        self.nulls_not_distinct = nulls_not_distinct
+        # the predicate of a partial index
+        self.where = where
         DBEntity.__init__(self, manager, entity_ref, dependencies)
         SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
 
@@ -35,20 +85,45 @@ class Index(SqlIdentifier, DBEntity):
         *,
         on: SqlTextLike,
         using: SqlTextLike,
-        expressions: list[SqlTextLike],
+        expressions: list[SqlTextLike | IndexKey],
+        unique: bool = False,
+        storage: IndexStorage | None = None,
+        include: list[SqlTextLike] | None = None,
+        nulls_not_distinct: bool = False,
+        where: SqlTextLike | None = None,
     ):
+        """
+        Args:
+            expressions: The keys, `IndexKey` for an operator class or an ordering
+            storage: Storage parameters, e.g. fillfactor
+            include: Columns stored along the keys, for index-only scans
+            nulls_not_distinct: Whether a unique index allows a single NULL
+            where: The predicate of a partial index
+        """
+        syntax = _manager.db.syntax
+        keys = [
+            expression if isinstance(expression, IndexKey) else IndexKey(expression)
+            for expression in expressions
+        ]
         return EntityBundle(
             cls(
                 manager=_manager,
                 entity_ref=_entity_ref or cls.create_ref(_name),
                 dependencies=_manager.dependency_refs,
                 name=_name,
-                on=SqlText(_manager.db.syntax, on),
-                using=SqlText(_manager.db.syntax, using),
-                expressions=[
-                    SqlText(_manager.db.syntax, expression)
-                    for expression in expressions
+                on=SqlText(syntax, on),
+                using=SqlText(syntax, using),
+                expressions=[SqlText(syntax, key.expression) for key in keys],
+                unique=unique,
+                storage=storage or IndexStorage(),
+                opclasses=[
+                    None if key.opclass is None else SqlText(syntax, key.opclass)
+                    for key in keys
                 ],
+                orderings=[key.ordering_sql for key in keys],
+                include=[SqlText(syntax, column) for column in include or []],
+                nulls_not_distinct=nulls_not_distinct,
+                where=None if where is None else SqlText(syntax, where),
             )
         )
 
@@ -57,6 +132,9 @@ class Index(SqlIdentifier, DBEntity):
             self.on.references,
             self.using.references,
             *(expression.references for expression in self.expressions),
+            *(opclass.references for opclass in self.opclasses if opclass),
+            *(column.references for column in self.include),
+            self.where.references if self.where else set(),
         )
 
     @override
@@ -67,12 +145,24 @@ class Index(SqlIdentifier, DBEntity):
             "on": self.on.sql,
             "using": self.using.sql,
             "expressions": [expression.sql for expression in self.expressions],
-            "dependencies": list(self.dependency_refs),
+            "unique": self.unique,
+            "storage": self.storage.to_dict(),
+            "opclasses": [
+                opclass.sql if opclass else None for opclass in self.opclasses
+            ],
+            "orderings": self.orderings,
+            "include": [column.sql for column in self.include],
+            "nulls_not_distinct": self.nulls_not_distinct,
+            "where": self.where.sql if self.where else None,
+            "dependencies": sorted(self.dependency_refs),
         }
 
     @override
     @classmethod
     def from_dict(cls, manager: "EntityManager", data: dict):
+        # exports from before the key options lack them
+        keys = len(data["expressions"])
+        where = data.get("where")
         return EntityBundle(
             cls(
                 manager=manager,
@@ -85,5 +175,143 @@ class Index(SqlIdentifier, DBEntity):
                     SqlText(manager.db.syntax, expression)
                     for expression in data["expressions"]
                 ],
+                unique=data.get("unique", False),
+                storage=IndexStorage.from_dict(data.get("storage", {})),
+                opclasses=[
+                    None if opclass is None else SqlText(manager.db.syntax, opclass)
+                    for opclass in data.get("opclasses", [None] * keys)
+                ],
+                orderings=data.get("orderings", [""] * keys),
+                include=[
+                    SqlText(manager.db.syntax, column)
+                    for column in data.get("include", [])
+                ],
+                nulls_not_distinct=data.get("nulls_not_distinct", False),
+                where=None if where is None else SqlText(manager.db.syntax, where),
+            )
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                on=rebinder.text(self.on),
+                using=rebinder.text(self.using),
+                expressions=[
+                    rebinder.text(expression) for expression in self.expressions
+                ],
+                unique=self.unique,
+                storage=self.storage,
+                opclasses=[
+                    rebinder.text(opclass) if opclass else None
+                    for opclass in self.opclasses
+                ],
+                orderings=self.orderings,
+                include=[rebinder.text(column) for column in self.include],
+                nulls_not_distinct=self.nulls_not_distinct,
+                where=rebinder.text(self.where) if self.where else None,
+            )
+        )
+
+    @property
+    def target(self) -> SchemaDependantEntity | None:
+        return self._resolve_target(self.on)
+
+    @property
+    def on_columns(self) -> bool:
+        """
+        Whether every key is a bare column, not an expression.
+        """
+        for expression in self.expressions:
+            tokens = list(iter_tokens(expression.sql))
+            if len(tokens) != 1 or not (
+                tokens[0].startswith('"')
+                or tokens[0][0].isalpha()
+                or tokens[0][0] == "_"
+            ):
+                return False
+        return True
+
+    @property
+    def qualified_sql(self) -> str:
+        target = self.target
+        return target.qualify(self.sql) if target else self.sql
+
+    @override
+    def create_sql(
+        self, name: str | None = None, on: str | None = None, concurrently: bool = False
+    ) -> list[str]:
+        """
+        Args:
+            name: SQL of another name to create the index under
+            on: Qualified SQL of another table to create the index on,
+                e.g. a shadow table
+            concurrently: Whether the index is built without blocking writes
+        """
+        target = self.target
+        on = on or (target.qualified_sql if target else self.on.sql)
+        keys = ", ".join(
+            " ".join(
+                part
+                for part in (
+                    expression.sql,
+                    opclass.sql if opclass else "",
+                    ordering,
+                )
+                if part
+            )
+            for expression, opclass, ordering in zip(
+                self.expressions, self.opclasses, self.orderings
             )
         )
+        include = ", ".join(column.sql for column in self.include)
+        return [
+            (
+                f"CREATE {'UNIQUE ' if self.unique else ''}INDEX"
+                f" {'CONCURRENTLY ' if concurrently else ''}"
+                f"{name or self.sql} ON {on}"
+                f" USING {self.using.sql} ({keys})"
+                f"{f' INCLUDE ({include})' if include else ''}"
+                f"{' NULLS NOT DISTINCT' if self.nulls_not_distinct else ''}"
+                f"{self.storage.with_sql()}"
+                f"{f' WHERE {self.where.sql}' if self.where else ''}"
+            )
+        ]
+
+    @override
+    def drop_sql(self, concurrently: bool = False) -> list[str]:
+        """
+        Args:
+            concurrently: Whether the index is dropped without blocking writes
+        """
+        return [
+            f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}{self.qualified_sql}"
+        ]
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return [f"ALTER INDEX {cast(Index, old).qualified_sql} RENAME TO {self.sql}"]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return fingerprint(
+            str(self.unique),
+            self._text_digest(self.on, renames),
+            self._text_digest(self.using, renames),
+            *(
+                self._text_digest(expression, renames)
+                for expression in self.expressions
+            ),
+            *(
+                self._text_digest(opclass, renames) if opclass else ""
+                for opclass in self.opclasses
+            ),
+            *self.orderings,
+            *(self._text_digest(column, renames) for column in self.include),
+            str(self.nulls_not_distinct),
+            self._text_digest(self.where, renames) if self.where else "",
+        )
@@ -0,0 +1,179 @@
+from typing import TYPE_CHECKING, cast, override
+
+from rawmigrate.core import SqlIdentifier, SqlText, SqlTextLike
+from rawmigrate.entity import EntityBundle, SchemaDependantEntity
+from rawmigrate.entities.index import Index
+from rawmigrate.utils import fingerprint
+
+if TYPE_CHECKING:
+    from rawmigrate.entity import DBEntity
+    from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
+
+
+class MaterializedView(SqlIdentifier, SchemaDependantEntity):
+    """
+    A materialized view, depending on what its query mentions.
+    Its indexes are `Index` entities on the view.
+    """
+
+    def __init__(
+        self,
+        manager: "EntityManager",
+        entity_ref: str,
+        schema: "DBEntity | None",
+        dependencies: set[str] | None,
+        name: str,
+        query: SqlText,
+    ):
+        self.name = name
+        self.query = query
+        SchemaDependantEntity.__init__(self, manager, entity_ref, schema, dependencies)
+        SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
+
+    @classmethod
+    def create(
+        cls,
+        _manager: "EntityManager",
+        _name: str,
+        _entity_ref: str = "",
+        *,
+        query: SqlTextLike,
+    ):
+        return EntityBundle(
+            cls(
+                manager=_manager,
+                entity_ref=_entity_ref or cls.create_ref(_name, schema=_manager.schema),
+                schema=_manager.schema,
+                dependencies=_manager.dependency_refs,
+                name=_name,
+                query=SqlText(_manager.db.syntax, query),
+            )
+        )
+
+    def _infer_dependency_refs(self) -> set[str]:
+        return self.query.references
+
+    @override
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "schema": self._schema.ref if self._schema else None,
+            "ref": self.ref,
+            "query": self.query.sql,
+            "dependencies": sorted(self.dependency_refs),
+        }
+
+    @override
+    @classmethod
+    def from_dict(cls, manager: "EntityManager", data: dict):
+        return EntityBundle(
+            cls(
+                manager=manager,
+                entity_ref=data["ref"],
+                schema=manager.registry.get_entity(data["schema"], allow_none=True),
+                dependencies=set(data["dependencies"]),
+                name=data["name"],
+                query=SqlText(manager.db.syntax, data["query"]),
+            )
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                schema=self._rebind_schema(rebinder),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                query=rebinder.text(self.query),
+            )
+        )
+
+    @property
+    def indexes(self) -> list[Index]:
+        return sorted(
+            (
+                cast(Index, node.entity)
+                for node in self.manager.registry.get_dependants(self.ref)
+                if isinstance(node.entity, Index) and node.entity.target == self
+            ),
+            key=lambda index: index.ref,
+        )
+
+    @override
+    def create_sql(self, name: str | None = None) -> list[str]:
+        """
+        Args:
+            name: Qualified SQL of another name to build the view under
+        """
+        return [
+            f"CREATE MATERIALIZED VIEW {name or self.qualified_sql} AS {self.query.sql}"
+        ]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP MATERIALIZED VIEW {self.qualified_sql}"]
+
+    @override
+    def rename_sql(self, old: "DBEntity") -> list[str]:
+        return [
+            (
+                f"ALTER MATERIALIZED VIEW {cast(MaterializedView, old).qualified_sql}"
+                f" RENAME TO {self.sql}"
+            )
+        ]
+
+    def refresh_sql(self) -> list[str]:
+        """
+        Refreshes the view, without blocking its readers
+            if it has a unique index the refresh can match the rows by,
+            which must cover all the rows, so not a partial one,
+            and key on columns of the view, not expressions.
+        """
+        concurrently = any(
+            index.unique and index.where is None and index.on_columns
+            for index in self.indexes
+        )
+        return [
+            (
+                f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}"
+                f"{self.qualified_sql}"
+            )
+        ]
+
+    def _temporary_name_sql(self, name: str) -> str:
+        return self.syntax.format_sql_identifier([f"{name}__new"])
+
+    def swap_sql(self, old: "MaterializedView") -> list[str]:
+        """
+        Rebuilds the view with its indexes under a temporary name
+            and swaps it in for the old one, so readers never see it missing or empty.
+        """
+        temporary = self.qualify(self._temporary_name_sql(self.name))
+        indexes = self.indexes
+        statements = self.create_sql(name=temporary)
+        for index in indexes:
+            statements.extend(
+                index.create_sql(
+                    name=self._temporary_name_sql(index.name), on=temporary
+                )
+            )
+        statements += [
+            "BEGIN",
+            *old.drop_sql(),
+            f"ALTER MATERIALIZED VIEW {temporary} RENAME TO {self.sql}",
+        ]
+        statements.extend(
+            f"ALTER INDEX {self.qualify(self._temporary_name_sql(index.name))}"
+            f" RENAME TO {index.sql}"
+            for index in indexes
+        )
+        statements.append("COMMIT")
+        return statements
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return fingerprint(self._text_digest(self.query, renames))
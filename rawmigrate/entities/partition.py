@@ -0,0 +1,383 @@
+from collections.abc import Iterable, Mapping
+from datetime import date
+from typing import TYPE_CHECKING, Literal, cast, override
+
+from rawmigrate.core import SqlText, SqlTextLike
+from rawmigrate.entity import DBEntity, EntityBundle
+from rawmigrate.entities.storage import TableStorage
+from rawmigrate.entities.table import Column, Table
+
+if TYPE_CHECKING:
+    from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
+
+
+class PartitionedTable(Table):
+    """
+    A table partitioned by `partition_by`, e.g. `RANGE (created_at)`.
+    Its partitions are declared by a `PartitionSet`.
+    """
+
+    def __init__(
+        self,
+        manager: "EntityManager",
+        entity_ref: str,
+        schema: "DBEntity | None",
+        dependencies: set[str] | None,
+        name: str,
+        columns: dict[str, str],
+        additional_expressions: list[SqlText],
+        pack_columns: bool,
+        storage: TableStorage,
+        partition_by: SqlText,
+    ):
+        self.partition_by = partition_by
+        Table.__init__(
+            self,
+            manager,
+            entity_ref,
+            schema,
+            dependencies,
+            name,
+            columns,
+            additional_expressions,
+            pack_columns,
+            storage,
+        )
+
+    @override
+    @classmethod
+    def create(
+        cls,
+        _manager: "EntityManager",
+        _name: str,
+        _entity_ref: str = "",
+        _table_expressions: list[SqlTextLike] | None = None,
+        *,
+        _partition_by: SqlTextLike | None = None,
+        _pack_columns: bool = False,
+        _storage: TableStorage | None = None,
+        **columns: SqlTextLike,
+    ):
+        """
+        Args:
+            _partition_by: The partitioning, e.g. `RANGE (created_at)`, required
+            _pack_columns: See `Table.create`
+            _storage: Not supported, Postgres takes storage parameters
+                on the partitions only
+        """
+        if _partition_by is None:
+            raise ValueError("_partition_by must be provided")
+        if _storage is not None and _storage.parameters:
+            raise ValueError("partitioned tables take no storage parameters")
+        entity_ref = _entity_ref or cls.create_ref(_name, schema=_manager.schema)
+        column_entities = {
+            name: Column.create(_manager, entity_ref, name, definition)
+            for name, definition in columns.items()
+        }
+        partition_by = SqlText(_manager.db.syntax, _partition_by)
+
+        table = cls(
+            manager=_manager,
+            entity_ref=entity_ref,
+            schema=_manager.schema,
+            dependencies=(
+                _manager.dependency_refs.union(
+                    partition_by.references,
+                    *(column.dependency_refs for column in column_entities.values()),
+                )
+                - {entity_ref}
+            ),
+            name=_name,
+            columns={name: column.ref for name, column in column_entities.items()},
+            additional_expressions=[
+                SqlText(_manager.db.syntax, expression)
+                for expression in _table_expressions or []
+            ],
+            pack_columns=_pack_columns,
+            storage=TableStorage(),
+            partition_by=partition_by,
+        )
+
+        return EntityBundle(table, column_entities.values())
+
+    @override
+    def to_dict(self) -> dict:
+        return Table.to_dict(self) | {"partition_by": self.partition_by.sql}
+
+    @override
+    @classmethod
+    def from_dict(cls, manager: "EntityManager", data: dict):
+        return EntityBundle(
+            cls(
+                manager=manager,
+                entity_ref=data["ref"],
+                schema=manager.registry.get_entity(data["schema"], allow_none=True),
+                dependencies=set(data["dependencies"]),
+                name=data["name"],
+                columns={
+                    col_name: col_data["ref"]
+                    for col_name, col_data in data["columns"].items()
+                },
+                additional_expressions=[
+                    SqlText(manager.db.syntax, expression)
+                    for expression in data["additional_expressions"]
+                ],
+                pack_columns=data.get("pack_columns", False),
+                storage=TableStorage.from_dict(data.get("storage", {})),
+                partition_by=SqlText(manager.db.syntax, data["partition_by"]),
+            ),
+            [
+                Column.from_dict(manager, column_data | {"table_ref": data["ref"]})
+                for column_data in data["columns"].values()
+            ],
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        columns = [column.rebind(manager, rebinder) for _, column in self.c]
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                schema=self._rebind_schema(rebinder),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self._name,
+                columns={column.name: column.ref for column in columns},
+                additional_expressions=[
+                    rebinder.text(expression)
+                    for expression in self._additional_expressions
+                ],
+                pack_columns=self.pack_columns,
+                storage=self.storage,
+                partition_by=rebinder.text(self.partition_by),
+            ),
+            columns,
+        )
+
+    @override
+    def create_sql(self, name: str | None = None) -> list[str]:
+        return [
+            f"{statement} PARTITION BY {self.partition_by.sql}"
+            for statement in Table.create_sql(self, name)
+        ]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return Table.content_fingerprint(self, renames) + self._text_digest(
+            self.partition_by, renames
+        )
+
+
+class PartitionSet(DBEntity):
+    """
+    The partitions of a `PartitionedTable`, declared as one entity.
+
+    Only the bounds are stored, as suffix -> the FOR VALUES clause,
+        the partition of each is named `<table>_<suffix>`.
+    """
+
+    def __init__(
+        self,
+        manager: "EntityManager",
+        entity_ref: str,
+        dependencies: set[str] | None,
+        name: str,
+        table_ref: str,
+        bounds: dict[str, str],
+    ):
+        self.name = name
+        self.table_ref = table_ref
+        self.bounds = bounds
+        DBEntity.__init__(self, manager, entity_ref, dependencies)
+
+    @classmethod
+    def create(
+        cls,
+        _manager: "EntityManager",
+        _name: str,
+        _entity_ref: str = "",
+        *,
+        on: PartitionedTable,
+        bounds: Mapping[str, str],
+    ):
+        """
+        Args:
+            on: The partitioned table
+            bounds: Partition suffix -> the FOR VALUES clause,
+                e.g. from `range_partitions`, `list_partitions` or `hash_partitions`
+        """
+        return EntityBundle(
+            cls(
+                manager=_manager,
+                entity_ref=_entity_ref or f"{on.ref}|{cls.create_ref(_name)}",
+                dependencies=_manager.dependency_refs | {on.ref},
+                name=_name,
+                table_ref=on.ref,
+                bounds=dict(bounds),
+            )
+        )
+
+    def _infer_dependency_refs(self) -> set[str]:
+        return {self.table_ref}
+
+    @override
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ref": self.ref,
+            "table_ref": self.table_ref,
+            "bounds": [[suffix, sql] for suffix, sql in self.bounds.items()],
+            "dependencies": sorted(self.dependency_refs),
+        }
+
+    @override
+    @classmethod
+    def from_dict(cls, manager: "EntityManager", data: dict):
+        return EntityBundle(
+            cls(
+                manager=manager,
+                entity_ref=data["ref"],
+                dependencies=set(data["dependencies"]),
+                name=data["name"],
+                table_ref=data["table_ref"],
+                bounds={suffix: sql for suffix, sql in data["bounds"]},
+            )
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                table_ref=rebinder.ref(self.table_ref),
+                bounds=self.bounds,
+            )
+        )
+
+    @property
+    def table(self) -> PartitionedTable:
+        return cast(PartitionedTable, self.manager.registry.get_entity(self.table_ref))
+
+    def partition_name_sql(self, suffix: str) -> str:
+        return self.manager.db.syntax.format_sql_identifier(
+            [f"{self.table._name}_{suffix}"]
+        )
+
+    def partition_sql(self, suffix: str) -> str:
+        """
+        Returns the qualified name of a partition.
+        """
+        return self.table.qualify(self.partition_name_sql(suffix))
+
+    def create_partition_sql(self, suffix: str, attach: bool = True) -> list[str]:
+        """
+        Args:
+            attach: Whether the partition is created apart and then attached,
+                which doesn't block the reads and writes of the partitioned table.
+                Not needed for a table created along with its partitions.
+        """
+        table = self.table.qualified_sql
+        partition = self.partition_sql(suffix)
+        bound = self.bounds[suffix]
+        if not attach:
+            return [f"CREATE TABLE {partition} PARTITION OF {table} FOR VALUES {bound}"]
+        return [
+            f"CREATE TABLE {partition} (LIKE {table} INCLUDING ALL)",
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES {bound}",
+        ]
+
+    def detach_partition_sql(self, partition_sql: str) -> str:
+        return (
+            f"ALTER TABLE {self.table.qualified_sql} DETACH PARTITION {partition_sql}"
+        )
+
+    @override
+    def create_sql(self, attach: bool = True) -> list[str]:
+        """
+        Args:
+            attach: See `create_partition_sql`
+        """
+        return [
+            statement
+            for suffix in self.bounds
+            for statement in self.create_partition_sql(suffix, attach)
+        ]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        # the partitions are kept with their data as standalone tables
+        return [
+            self.detach_partition_sql(self.partition_sql(suffix))
+            for suffix in self.bounds
+        ]
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return []
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def range_partitions(
+    start: date, end: date, every: Literal["day", "month", "year"] = "month"
+) -> dict[str, str]:
+    """
+    Returns the bounds of consecutive date ranges covering [start, end).
+
+    Args:
+        start: The first day, moved to the start of its month or year
+        end: The day right after the last range
+        every: The width of each range
+
+    Usage::
+
+        root.PartitionSet("events_by_month", on=events,
+                          bounds=range_partitions(date(2020, 1, 1), date(2030, 1, 1)))
+    """
+    match every:
+        case "day":
+            formats = "y%Ym%md%d"
+        case "month":
+            start = start.replace(day=1)
+            formats = "y%Ym%m"
+        case "year":
+            start = start.replace(month=1, day=1)
+            formats = "y%Y"
+
+    bounds = {}
+    while start < end:
+        match every:
+            case "day":
+                following = date.fromordinal(start.toordinal() + 1)
+            case "month":
+                following = _add_months(start, 1)
+            case "year":
+                following = start.replace(year=start.year + 1)
+        bounds[start.strftime(formats)] = (
+            f"FROM ('{start.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        start = following
+    return bounds
+
+
+def list_partitions(values: Mapping[str, Iterable[str]]) -> dict[str, str]:
+    """
+    Args:
+        values: Partition suffix -> SQL literals of the values it holds
+    """
+    return {suffix: f"IN ({', '.join(items)})" for suffix, items in values.items()}
+
+
+def hash_partitions(modulus: int) -> dict[str, str]:
+    return {
+        f"p{remainder}": f"WITH (MODULUS {modulus}, REMAINDER {remainder})"
+        for remainder in range(modulus)
+    }
@@ -1,9 +1,10 @@
 from typing import TYPE_CHECKING, override
-from rawmigrate.core import SqlIdentifier
+from rawmigrate.core import SqlFormatOption, SqlIdentifier
 from rawmigrate.entity import DBEntity, EntityBundle
 
 if TYPE_CHECKING:
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.template import SchemaRebinder
 
 
 class Schema(SqlIdentifier, DBEntity):
@@ -43,7 +44,7 @@ class Schema(SqlIdentifier, DBEntity):
         return {
             "name": self.name,
             "ref": self.ref,
-            "dependencies": list(self.dependency_refs),
+            "dependencies": sorted(self.dependency_refs),
         }
 
     @override
@@ -57,3 +58,28 @@ class Schema(SqlIdentifier, DBEntity):
                 name=data["name"],
             )
         )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+            )
+        )
+
+    @override
+    def create_sql(self) -> list[str]:
+        return [f"CREATE SCHEMA {self.sql}"]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP SCHEMA {self.sql}"]
+
+    @override
+    def rename_sql(self, old: "DBEntity") -> list[str]:
+        return [
+            f"ALTER SCHEMA {format(old, SqlFormatOption.SQL_TEXT)} RENAME TO {self.sql}"
+        ]
@@ -0,0 +1,314 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, cast, override
+
+from rawmigrate.core import SqlIdentifier
+from rawmigrate.entity import EntityBundle, SchemaDependantEntity
+from rawmigrate.tokenizer import iter_tokens
+from rawmigrate.utils import fingerprint
+
+if TYPE_CHECKING:
+    from rawmigrate.entity import DBEntity
+    from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class SequenceOptions:
+    """
+    Options of a sequence or an identity column.
+    None leaves an option at the default.
+    """
+
+    # the data type, e.g. integer, bigint by default
+    as_type: str | None = None
+    increment: int | None = None
+    minvalue: int | None = None
+    maxvalue: int | None = None
+    start: int | None = None
+    # values preallocated per session, so concurrent inserts don't contend
+    # on the sequence, at the cost of gaps when a session ends
+    cache: int | None = None
+    cycle: bool = False
+
+    def clauses(self) -> dict[str, str]:
+        """
+        Returns the clause of each option set, by option.
+        """
+        clauses = {}
+        if self.as_type is not None:
+            clauses["as_type"] = f"AS {self.as_type}"
+        if self.increment is not None:
+            clauses["increment"] = f"INCREMENT BY {self.increment}"
+        if self.minvalue is not None:
+            clauses["minvalue"] = f"MINVALUE {self.minvalue}"
+        if self.maxvalue is not None:
+            clauses["maxvalue"] = f"MAXVALUE {self.maxvalue}"
+        if self.start is not None:
+            clauses["start"] = f"START WITH {self.start}"
+        if self.cache is not None:
+            clauses["cache"] = f"CACHE {self.cache}"
+        if self.cycle:
+            clauses["cycle"] = "CYCLE"
+        return clauses
+
+    @property
+    def sql(self) -> str:
+        return " ".join(self.clauses().values())
+
+    def alter_clauses(self, old: "SequenceOptions") -> list[str]:
+        """
+        Returns the clauses changing the old options into these,
+            the options no longer set go back to the defaults.
+        The start is only used by a restart, so it's left as it was.
+        """
+        old_clauses = old.clauses()
+        new_clauses = self.clauses()
+        clauses = [
+            clause
+            for option, clause in new_clauses.items()
+            if old_clauses.get(option) != clause
+        ]
+        defaults = {
+            "as_type": "AS bigint",
+            "increment": "INCREMENT BY 1",
+            "minvalue": "NO MINVALUE",
+            "maxvalue": "NO MAXVALUE",
+            "cache": "CACHE 1",
+            "cycle": "NO CYCLE",
+        }
+        clauses.extend(
+            defaults[option]
+            for option in old_clauses
+            if option not in new_clauses and option in defaults
+        )
+        return clauses
+
+    @classmethod
+    def parse(cls, tokens: list[str]) -> "SequenceOptions":
+        """
+        Reads the options from the tokens of their clauses,
+            e.g. `['cache', '100', 'increment', 'by', '2']`.
+        """
+        options: dict = {}
+        position = 0
+
+        def number() -> int:
+            nonlocal position
+            sign = 1
+            if tokens[position] in ("-", "+"):
+                sign = -1 if tokens[position] == "-" else 1
+                position += 1
+            value = int(tokens[position]) * sign
+            position += 1
+            return value
+
+        while position < len(tokens):
+            token = tokens[position]
+            position += 1
+            match token:
+                case "as":
+                    options["as_type"] = tokens[position]
+                    position += 1
+                case "increment":
+                    if tokens[position] == "by":
+                        position += 1
+                    options["increment"] = number()
+                case "start":
+                    if tokens[position] == "with":
+                        position += 1
+                    options["start"] = number()
+                case "minvalue" | "maxvalue" | "cache":
+                    options[token] = number()
+                case "cycle":
+                    options["cycle"] = True
+                case "no":
+                    # NO MINVALUE, NO MAXVALUE and NO CYCLE are the defaults
+                    position += 1
+        return cls(**options)
+
+    def to_dict(self) -> dict:
+        return {
+            "as_type": self.as_type,
+            "increment": self.increment,
+            "minvalue": self.minvalue,
+            "maxvalue": self.maxvalue,
+            "start": self.start,
+            "cache": self.cache,
+            "cycle": self.cycle,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SequenceOptions":
+        return cls(
+            as_type=data["as_type"],
+            increment=data["increment"],
+            minvalue=data["minvalue"],
+            maxvalue=data["maxvalue"],
+            start=data["start"],
+            cache=data["cache"],
+            cycle=data["cycle"],
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class Identity:
+    """
+    The GENERATED ... AS IDENTITY clause of a column.
+    """
+
+    always: bool
+    options: SequenceOptions
+
+    @classmethod
+    def parse(cls, sql: str) -> "Identity | None":
+        """
+        Returns None if the clause isn't an identity, e.g. a generated column.
+        """
+        tokens = list(iter_tokens(sql))
+        if "identity" not in tokens or tokens[:2] not in (
+            ["generated", "always"],
+            ["generated", "by"],
+        ):
+            return None
+        options = tokens[tokens.index("identity") + 1 :]
+        if options and options[0] == "(":
+            options = options[1 : options.index(")")]
+        return cls(tokens[1] == "always", SequenceOptions.parse(options))
+
+    @property
+    def generated_sql(self) -> str:
+        return "ALWAYS" if self.always else "BY DEFAULT"
+
+    @property
+    def sql(self) -> str:
+        options = self.options.sql
+        return f"GENERATED {self.generated_sql} AS IDENTITY" + (
+            f" ({options})" if options else ""
+        )
+
+
+def identity(options: SequenceOptions | None = None, always: bool = False) -> str:
+    """
+    Returns the identity clause of a column definition.
+
+    Usage::
+
+        root.Table("events", id=f"bigint {identity(SequenceOptions(cache=100))} primary key")
+
+    Args:
+        always: Whether explicit values are rejected unless OVERRIDING SYSTEM VALUE
+    """
+    return Identity(always, options or SequenceOptions()).sql
+
+
+class Sequence(SqlIdentifier, SchemaDependantEntity):
+    """
+    A standalone sequence, e.g. shared by several tables.
+    Columns use it by mentioning it, e.g. `f"bigint default nextval('{sequence}')"`.
+    """
+
+    def __init__(
+        self,
+        manager: "EntityManager",
+        entity_ref: str,
+        schema: "DBEntity | None",
+        dependencies: set[str] | None,
+        name: str,
+        options: SequenceOptions,
+    ):
+        self.name = name
+        self.options = options
+        SchemaDependantEntity.__init__(self, manager, entity_ref, schema, dependencies)
+        SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
+
+    @classmethod
+    def create(
+        cls,
+        _manager: "EntityManager",
+        _name: str,
+        _entity_ref: str = "",
+        *,
+        options: SequenceOptions | None = None,
+    ):
+        return EntityBundle(
+            cls(
+                manager=_manager,
+                entity_ref=_entity_ref or cls.create_ref(_name, schema=_manager.schema),
+                schema=_manager.schema,
+                dependencies=_manager.dependency_refs,
+                name=_name,
+                options=options or SequenceOptions(),
+            )
+        )
+
+    def _infer_dependency_refs(self) -> set[str]:
+        return set()
+
+    @override
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "schema": self._schema.ref if self._schema else None,
+            "ref": self.ref,
+            "options": self.options.to_dict(),
+            "dependencies": sorted(self.dependency_refs),
+        }
+
+    @override
+    @classmethod
+    def from_dict(cls, manager: "EntityManager", data: dict):
+        return EntityBundle(
+            cls(
+                manager=manager,
+                entity_ref=data["ref"],
+                schema=manager.registry.get_entity(data["schema"], allow_none=True),
+                dependencies=set(data["dependencies"]),
+                name=data["name"],
+                options=SequenceOptions.from_dict(data["options"]),
+            )
+        )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                schema=self._rebind_schema(rebinder),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                options=self.options,
+            )
+        )
+
+    @override
+    def create_sql(self) -> list[str]:
+        options = self.options.sql
+        return [
+            f"CREATE SEQUENCE {self.qualified_sql}" + (f" {options}" if options else "")
+        ]
+
+    def alter_options_sql(self, old: "Sequence") -> list[str]:
+        """
+        Returns the ALTER SEQUENCE changing the old options into these,
+            which keeps the current value.
+        """
+        clauses = self.options.alter_clauses(old.options)
+        if not clauses:
+            return []
+        return [f"ALTER SEQUENCE {self.qualified_sql} {' '.join(clauses)}"]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP SEQUENCE {self.qualified_sql}"]
+
+    @override
+    def rename_sql(self, old: "DBEntity") -> list[str]:
+        return [
+            f"ALTER SEQUENCE {cast(Sequence, old).qualified_sql} RENAME TO {self.sql}"
+        ]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return fingerprint(self.options.sql)
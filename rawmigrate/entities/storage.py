@@ -0,0 +1,131 @@
+from dataclasses import dataclass, fields
+from typing import Self
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class StorageParameters:
+    """
+    Storage parameters of a relation, set by `WITH (...)`.
+    None leaves a parameter at the server default.
+    """
+
+    # percentage of each page filled by inserts, the rest is kept for updates
+    fillfactor: int | None = None
+
+    def __post_init__(self):
+        if self.fillfactor is not None and not 10 <= self.fillfactor <= 100:
+            raise ValueError("fillfactor must be between 10 and 100")
+
+    @property
+    def parameters(self) -> dict[str, bool | int | float | str]:
+        """
+        The parameters set, by name.
+        """
+        return {
+            parameter.name: value
+            for parameter in fields(self)
+            if (value := getattr(self, parameter.name)) is not None
+        }
+
+    @staticmethod
+    def _value_sql(value: bool | int | float | str) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    def with_sql(self) -> str:
+        """
+        Returns the WITH clause of CREATE, empty if nothing is set.
+        """
+        if not self.parameters:
+            return ""
+        return f" WITH ({self._set_list_sql(self.parameters)})"
+
+    def _set_list_sql(self, parameters: dict[str, bool | int | float | str]) -> str:
+        return ", ".join(
+            f"{name} = {self._value_sql(value)}" for name, value in parameters.items()
+        )
+
+    def alter_actions(self, old: "StorageParameters") -> list[str]:
+        """
+        Returns the SET and RESET actions of ALTER TABLE or ALTER INDEX
+            changing the old parameters into these.
+        """
+        new_parameters = self.parameters
+        old_parameters = old.parameters
+        changed = {
+            name: value
+            for name, value in new_parameters.items()
+            if old_parameters.get(name) != value
+        }
+        reset = [name for name in old_parameters if name not in new_parameters]
+        actions = []
+        if changed:
+            actions.append(f"SET ({self._set_list_sql(changed)})")
+        if reset:
+            actions.append(f"RESET ({', '.join(reset)})")
+        return actions
+
+    def to_dict(self) -> dict:
+        return self.parameters
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(**data)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class TableStorage(StorageParameters):
+    """
+    Usage::
+
+        root.Table("events", _storage=TableStorage(
+            fillfactor=80, autovacuum_vacuum_scale_factor=0.01
+        ), ...)
+    """
+
+    # bytes from which a row is compressed and moved to TOAST, 128 to 8160
+    toast_tuple_target: int | None = None
+    autovacuum_enabled: bool | None = None
+    # dead rows that trigger a vacuum: threshold + scale_factor * rows
+    autovacuum_vacuum_threshold: int | None = None
+    autovacuum_vacuum_scale_factor: float | None = None
+    # inserted rows that trigger a vacuum, to freeze append-only tables
+    autovacuum_vacuum_insert_threshold: int | None = None
+    autovacuum_vacuum_insert_scale_factor: float | None = None
+    # changed rows that trigger an analyze
+    autovacuum_analyze_threshold: int | None = None
+    autovacuum_analyze_scale_factor: float | None = None
+    # milliseconds
+    autovacuum_vacuum_cost_delay: float | None = None
+    autovacuum_vacuum_cost_limit: int | None = None
+    autovacuum_freeze_max_age: int | None = None
+
+    def __post_init__(self):
+        StorageParameters.__post_init__(self)
+        if self.toast_tuple_target is not None and not (
+            128 <= self.toast_tuple_target <= 8160
+        ):
+            raise ValueError("toast_tuple_target must be between 128 and 8160")
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class IndexStorage(StorageParameters):
+    """
+    The parameters apply to the pages written from then on,
+        REINDEX applies them to the existing ones.
+    Each access method takes its own ones.
+    """
+
+    # btree, whether duplicates are stored once
+    deduplicate_items: bool | None = None
+    # gin, whether new entries go to a pending list first
+    fastupdate: bool | None = None
+    # gin, kilobytes
+    gin_pending_list_limit: int | None = None
+    # gist: "on", "off" or "auto"
+    buffering: str | None = None
+    # brin, pages summarized by each range
+    pages_per_range: int | None = None
+    # brin, whether ranges are summarized as soon as they fill
+    autosummarize: bool | None = None
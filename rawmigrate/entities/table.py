@@ -1,18 +1,237 @@
+from dataclasses import dataclass
 from typing import Iterator, Self, override, cast
 
 from typing import TYPE_CHECKING
 
-from rawmigrate.core import SqlText, SqlTextLike
+from rawmigrate.core import SqlFormatOption, SqlText, SqlTextLike, Syntax
 from rawmigrate.entity import EntityBundle, SchemaDependantEntity
 from rawmigrate.entity import DBEntity
 from rawmigrate.core import SqlIdentifier
+from rawmigrate.entities.sequence import Identity
+from rawmigrate.entities.storage import TableStorage
+from rawmigrate.layout import ColumnLayout, column_layout
+from rawmigrate.tokenizer import iter_token_spans
+from rawmigrate.utils import fingerprint
 
 if TYPE_CHECKING:
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
 
 
 # TODO: IMPORTANT: This is a temporary implementation of column, IMPLEMENT THE FULL ONE
 
+CONSTRAINT_STARTS = frozenset(
+    {
+        "not",
+        "null",
+        "default",
+        "primary",
+        "unique",
+        "references",
+        "check",
+        "constraint",
+        "generated",
+    }
+)
+
+
+@dataclass(slots=True, frozen=True)
+class ColumnConstraint:
+    name: str | None
+    kind: str  # the first keyword: primary, unique, references, check, generated
+    sql: str  # the clause without the name
+
+    def name_sql(self, syntax: Syntax, table_name: str, column_name: str) -> str:
+        """
+        Returns the constraint name, defaulting to the one Postgres gives
+            to unnamed constraints.
+        """
+        if self.name:
+            return self.name
+        match self.kind:
+            case "primary":
+                name = f"{table_name}_pkey"
+            case "unique":
+                name = f"{table_name}_{column_name}_key"
+            case "references":
+                name = f"{table_name}_{column_name}_fkey"
+            case _:
+                name = f"{table_name}_{column_name}_{self.kind}"
+        return syntax.format_sql_identifier([name])
+
+    @property
+    def validates_rows(self) -> bool:
+        """
+        Whether adding the constraint checks the existing rows,
+            which can be deferred by adding it as NOT VALID.
+        """
+        return self.kind in ("references", "check")
+
+    @property
+    def identity(self) -> Identity | None:
+        return Identity.parse(self.sql) if self.kind == "generated" else None
+
+    def table_sql(self, column_sql: str) -> str | None:
+        """
+        Returns the clause in the form of a table constraint,
+            None if it can't be added separately from the column.
+        """
+        match self.kind:
+            case "primary":
+                return f"PRIMARY KEY ({column_sql})"
+            case "unique":
+                return f"UNIQUE ({column_sql})"
+            case "references":
+                return f"FOREIGN KEY ({column_sql}) {self.sql}"
+            case "check":
+                return self.sql
+            case _:
+                return None
+
+
+@dataclass(slots=True, frozen=True)
+class TableConstraint:
+    """
+    A constraint among the additional expressions of a table.
+    """
+
+    name: str | None
+    kind: str  # the first keyword: primary, unique, foreign, check, exclude
+    sql: str  # the clause without the name
+    # the columns of PRIMARY KEY, UNIQUE and FOREIGN KEY
+    columns: tuple[str, ...]
+
+    @classmethod
+    def parse(cls, sql: str) -> "TableConstraint | None":
+        """
+        Returns None if the expression isn't a constraint, e.g. LIKE.
+        """
+        spans = list(iter_token_spans(sql))
+        name = None
+        if len(spans) > 2 and spans[0][2] == "constraint":
+            name = spans[1][2]
+            spans = spans[2:]
+        if not spans or spans[0][2] not in (
+            "primary",
+            "unique",
+            "foreign",
+            "check",
+            "exclude",
+        ):
+            return None
+
+        columns = []
+        tokens = [token for _, _, token in spans]
+        if tokens[0] in ("primary", "unique", "foreign") and "(" in tokens:
+            for token in tokens[tokens.index("(") + 1 :]:
+                if token == ")":
+                    break
+                if token != ",":
+                    columns.append(
+                        token[1:-1].replace('""', '"') if token[0] == '"' else token
+                    )
+        return cls(name, spans[0][2], sql[spans[0][0] :], tuple(columns))
+
+    @property
+    def validates_rows(self) -> bool:
+        return self.kind in ("foreign", "check")
+
+    def name_sql(self, syntax: Syntax, table_name: str) -> str | None:
+        """
+        Returns the constraint name, defaulting to the one Postgres gives
+            to unnamed constraints. None if it depends on the expression (CHECK, EXCLUDE).
+        """
+        if self.name:
+            return self.name
+        match self.kind:
+            case "primary":
+                name = f"{table_name}_pkey"
+            case "unique":
+                name = f"{table_name}_{'_'.join(self.columns)}_key"
+            case "foreign":
+                name = f"{table_name}_{'_'.join(self.columns)}_fkey"
+            case _:
+                return None
+        return syntax.format_sql_identifier([name])
+
+
+@dataclass(slots=True, frozen=True)
+class ColumnDefinition:
+    """
+    A column definition split into its type and clauses.
+    """
+
+    type: str
+    not_null: bool
+    default: str | None
+    constraints: tuple[ColumnConstraint, ...]
+
+    @classmethod
+    def parse(cls, sql: str) -> "ColumnDefinition":
+        spans = list(iter_token_spans(sql))
+        starts = [0]
+        depth = 0
+        for index, (_, _, token) in enumerate(spans):
+            if token in ("(", "["):
+                depth += 1
+            elif token in (")", "]"):
+                depth -= 1
+            elif depth or not index or token not in CONSTRAINT_STARTS:
+                continue
+            elif token == "not" and (
+                index + 1 == len(spans) or spans[index + 1][2] != "null"
+            ):
+                continue
+            elif token == "null" and spans[index - 1][2] in (
+                "not",
+                "set",
+                "default",
+                "is",
+            ):
+                continue
+            elif token == "default" and spans[index - 1][2] == "by":
+                # GENERATED BY DEFAULT AS IDENTITY
+                continue
+            elif index - starts[-1] == 2 and spans[starts[-1]][2] == "constraint":
+                # the name prefixes the clause it names
+                continue
+            else:
+                starts.append(index)
+
+        type_sql = ""
+        not_null = False
+        default = None
+        constraints = []
+        for clause_index, start in enumerate(starts):
+            end = (
+                starts[clause_index + 1]
+                if clause_index + 1 < len(starts)
+                else len(spans)
+            )
+            if start == end:
+                continue
+            if clause_index == 0 and spans[start][2] not in CONSTRAINT_STARTS:
+                type_sql = sql[spans[start][0] : spans[end - 1][1]]
+                continue
+
+            name = None
+            if spans[start][2] == "constraint" and end - start > 2:
+                name = spans[start + 1][2]
+                start += 2
+            clause = sql[spans[start][0] : spans[end - 1][1]]
+            match spans[start][2]:
+                case "not":
+                    not_null = True
+                case "null":
+                    not_null = False
+                case "default":
+                    default = sql[spans[start + 1][0] : spans[end - 1][1]]
+                case kind:
+                    constraints.append(ColumnConstraint(name, kind, clause))
+
+        return cls(type_sql, not_null, default, tuple(constraints))
+
 
 class Column(SqlIdentifier, DBEntity):
     manage_export = False
@@ -29,6 +248,7 @@ class Column(SqlIdentifier, DBEntity):
         self.table_ref = table_ref
         self.name = name
         self.definition = definition
+        self._parsed_definition: ColumnDefinition | None = None
         DBEntity.__init__(self, manager, entity_ref, dependencies)
         SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
 
@@ -56,7 +276,7 @@ class Column(SqlIdentifier, DBEntity):
             "name": self.name,
             "ref": self.ref,
             "definition": self.definition.sql,
-            "dependencies": list(self.dependency_refs - {self.table_ref}),
+            "dependencies": sorted(self.dependency_refs - {self.table_ref}),
         }
 
     @override
@@ -66,11 +286,155 @@ class Column(SqlIdentifier, DBEntity):
             manager=manager,
             entity_ref=data["ref"],
             table_ref=data["table_ref"],
-            dependencies=set(data["dependencies"]),
+            # the table dependency is implied by the nesting in the export
+            dependencies=set(data["dependencies"]) | {data["table_ref"]},
             name=data["name"],
             definition=SqlText(manager.db.syntax, data["definition"]),
         )
 
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return type(self)(
+            manager=manager,
+            entity_ref=rebinder.ref(self.ref),
+            table_ref=rebinder.ref(self.table_ref),
+            dependencies=rebinder.refs(self._explicit_dependencies),
+            name=self.name,
+            definition=rebinder.text(self.definition),
+        )
+
+    @property
+    def table(self) -> "Table":
+        return cast(Table, self.manager.registry.get_entity(self.table_ref))
+
+    @property
+    def parsed_definition(self) -> ColumnDefinition:
+        if self._parsed_definition is None:
+            self._parsed_definition = ColumnDefinition.parse(self.definition.sql)
+        return self._parsed_definition
+
+    @property
+    def definition_sql(self) -> str:
+        """
+        The column as it appears in CREATE TABLE or ADD COLUMN.
+        """
+        return f"{self.sql} {self.definition.sql}"
+
+    def alter_table_sql(self, action: str) -> str:
+        return f"ALTER TABLE {self.table.qualified_sql} {action}"
+
+    def add_constraint_sql(
+        self, constraint: ColumnConstraint, validate: bool = True
+    ) -> str:
+        """
+        Returns the ADD CONSTRAINT action of a constraint that can be a table constraint.
+
+        Args:
+            validate: Whether the existing rows are checked right away,
+                otherwise a constraint that checks them is added as NOT VALID
+        """
+        name = constraint.name_sql(self.syntax, self.table._name, self.name)
+        not_valid = "" if validate or not constraint.validates_rows else " NOT VALID"
+        return f"ADD CONSTRAINT {name} {constraint.table_sql(self.sql)}{not_valid}"
+
+    def validate_constraint_sql(self, constraint: ColumnConstraint) -> str:
+        name = constraint.name_sql(self.syntax, self.table._name, self.name)
+        return self.alter_table_sql(f"VALIDATE CONSTRAINT {name}")
+
+    @property
+    def deferrable_constraints(self) -> list[ColumnConstraint]:
+        """
+        The constraints that can be added as NOT VALID and validated later.
+        """
+        return [
+            constraint
+            for constraint in self.parsed_definition.constraints
+            if constraint.validates_rows and constraint.table_sql(self.sql) is not None
+        ]
+
+    @override
+    def create_sql(self, tighten: bool = True, validate: bool = True) -> list[str]:
+        """
+        Args:
+            tighten: Whether NOT NULL and the constraints are added along with the column,
+                otherwise they are left to `tighten_sql`, e.g. to backfill the column first
+            validate: Whether the constraints check the existing rows right away,
+                otherwise the ones that can are added as NOT VALID
+                and left to `validate_sql`
+        """
+        deferred = [] if validate else self.deferrable_constraints
+        if tighten and not deferred:
+            return [self.alter_table_sql(f"ADD COLUMN {self.definition_sql}")]
+
+        definition = self.parsed_definition
+        parts = [self.sql, definition.type]
+        if tighten and definition.not_null:
+            parts.append("NOT NULL")
+        if definition.default is not None:
+            parts.append(f"DEFAULT {definition.default}")
+        parts.extend(
+            f"CONSTRAINT {constraint.name} {constraint.sql}"
+            if constraint.name
+            else constraint.sql
+            for constraint in definition.constraints
+            if constraint.table_sql(self.sql) is None
+            or (tighten and constraint not in deferred)
+        )
+        statements = [self.alter_table_sql(f"ADD COLUMN {' '.join(parts)}")]
+        if tighten:
+            statements.extend(
+                self.alter_table_sql(self.add_constraint_sql(constraint, validate))
+                for constraint in deferred
+            )
+        return statements
+
+    def tighten_sql(self, validate: bool = True) -> list[str]:
+        """
+        Returns the statements adding what `create_sql(tighten=False)` leaves out.
+
+        Args:
+            validate: See `create_sql`
+        """
+        definition = self.parsed_definition
+        actions = []
+        if definition.not_null:
+            actions.append(f"ALTER COLUMN {self.sql} SET NOT NULL")
+        actions.extend(
+            self.add_constraint_sql(constraint, validate)
+            for constraint in definition.constraints
+            if constraint.table_sql(self.sql) is not None
+        )
+        return [self.alter_table_sql(action) for action in actions]
+
+    def validate_sql(self) -> list[str]:
+        """
+        Returns the statements validating the constraints
+            `create_sql(validate=False)` adds as NOT VALID.
+        """
+        return [
+            self.validate_constraint_sql(constraint)
+            for constraint in self.deferrable_constraints
+        ]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [self.alter_table_sql(f"DROP COLUMN {self.sql}")]
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return [
+            self.alter_table_sql(
+                f"RENAME COLUMN {format(old, SqlFormatOption.SQL_TEXT)} TO {self.sql}"
+            )
+        ]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        table_ref = self.table_ref
+        if renames is not None:
+            table_ref = renames.new_ref(table_ref) or table_ref
+        return fingerprint(table_ref, self._text_digest(self.definition, renames))
+
 
 class TableColumnsAccessor:
     def __init__(self, table: "Table"):
@@ -109,10 +473,15 @@ class Table(SqlIdentifier, SchemaDependantEntity):
         name: str,
         columns: dict[str, str],
         additional_expressions: list[SqlText],
+        pack_columns: bool,
+        storage: TableStorage,
     ):
         self._name = name
         self._columns = columns
         self._additional_expressions = additional_expressions
+        # whether CREATE TABLE orders the columns by `column_layout`
+        self.pack_columns = pack_columns
+        self.storage = storage
         self.c = TableColumnsAccessor(self)
         SchemaDependantEntity.__init__(self, manager, entity_ref, schema, dependencies)
         SqlIdentifier.__init__(self, manager.db.syntax, [name], [entity_ref])
@@ -124,8 +493,18 @@ class Table(SqlIdentifier, SchemaDependantEntity):
         _name: str,
         _entity_ref: str = "",
         _table_expressions: list[SqlTextLike] | None = None,
+        *,
+        _pack_columns: bool = False,
+        _storage: TableStorage | None = None,
         **columns: SqlTextLike,
     ):
+        """
+        Args:
+            _pack_columns: Whether the table is created with its columns ordered
+                to minimize the alignment padding of its rows, see `column_layout`.
+                The columns added later come last either way.
+            _storage: Storage parameters, e.g. fillfactor and autovacuum settings
+        """
         entity_ref = _entity_ref or cls.create_ref(_name, schema=_manager.schema)
         column_entities = {
             name: Column.create(_manager, entity_ref, name, definition)
@@ -148,6 +527,8 @@ class Table(SqlIdentifier, SchemaDependantEntity):
                 SqlText(_manager.db.syntax, expression)
                 for expression in _table_expressions or []
             ],
+            pack_columns=_pack_columns,
+            storage=_storage or TableStorage(),
         )
 
         return EntityBundle(table, column_entities.values())
@@ -179,7 +560,9 @@ class Table(SqlIdentifier, SchemaDependantEntity):
             "additional_expressions": [
                 expression.sql for expression in self._additional_expressions
             ],
-            "dependencies": list(self.dependency_refs),
+            "pack_columns": self.pack_columns,
+            "storage": self.storage.to_dict(),
+            "dependencies": sorted(self.dependency_refs),
         }
 
     @override
@@ -200,9 +583,84 @@ class Table(SqlIdentifier, SchemaDependantEntity):
                     SqlText(manager.db.syntax, expression)
                     for expression in data["additional_expressions"]
                 ],
+                pack_columns=data.get("pack_columns", False),
+                storage=TableStorage.from_dict(data.get("storage", {})),
             ),
             [
                 Column.from_dict(manager, column_data | {"table_ref": data["ref"]})
                 for column_data in data["columns"].values()
             ],
         )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        columns = [column.rebind(manager, rebinder) for _, column in self.c]
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                schema=self._rebind_schema(rebinder),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self._name,
+                columns={column.name: column.ref for column in columns},
+                additional_expressions=[
+                    rebinder.text(expression)
+                    for expression in self._additional_expressions
+                ],
+                pack_columns=self.pack_columns,
+                storage=self.storage,
+            ),
+            columns,
+        )
+
+    @property
+    def column_layout(self) -> ColumnLayout:
+        """
+        The column order minimizing the padding of the rows,
+            and the bytes per row it saves over the declared one.
+        """
+        return column_layout(
+            {name: column.parsed_definition.type for name, column in self.c}
+        )
+
+    @override
+    def create_sql(self, name: str | None = None) -> list[str]:
+        """
+        Args:
+            name: Qualified SQL of another name to create the table under,
+                e.g. a shadow table
+        """
+        order = self.column_layout.order if self.pack_columns else list(self._columns)
+        definitions = [self.c[column_name].definition_sql for column_name in order]
+        definitions.extend(
+            expression.sql for expression in self._additional_expressions
+        )
+        body = ",\n".join(f"    {definition}" for definition in definitions)
+        return [
+            (
+                f"CREATE TABLE {name or self.qualified_sql} (\n{body}\n)"
+                f"{self.storage.with_sql()}"
+            )
+        ]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP TABLE {self.qualified_sql}"]
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return [f"ALTER TABLE {cast(Table, old).qualified_sql} RENAME TO {self.sql}"]
+
+    @override
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str:
+        return fingerprint(
+            *(
+                part
+                for name, column in self.c
+                for part in (name, column._text_digest(column.definition, renames))
+            ),
+            *(
+                self._text_digest(expression, renames)
+                for expression in self._additional_expressions
+            ),
+        )
@@ -1,11 +1,12 @@
-from typing import TYPE_CHECKING, override
+from typing import TYPE_CHECKING, cast, override
 
-from rawmigrate.core import SqlText, SqlTextLike
-from rawmigrate.entity import DBEntity, EntityBundle
+from rawmigrate.core import SqlFormatOption, SqlText, SqlTextLike
+from rawmigrate.entity import DBEntity, EntityBundle, SchemaDependantEntity
 from rawmigrate.core import SqlIdentifier
 
 if TYPE_CHECKING:
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.template import SchemaRebinder
 
 
 class Trigger(SqlIdentifier, DBEntity):
@@ -88,7 +89,7 @@ class Trigger(SqlIdentifier, DBEntity):
             "on": self.on.sql,
             "function": self.function.sql if self.function else "",
             "procedure": self.procedure.sql if self.procedure else "",
-            "dependencies": list(self.dependency_refs),
+            "dependencies": sorted(self.dependency_refs),
         }
 
     @override
@@ -116,3 +117,82 @@ class Trigger(SqlIdentifier, DBEntity):
                 ),
             )
         )
+
+    @override
+    def rebind(self, manager: "EntityManager", rebinder: "SchemaRebinder"):
+        return EntityBundle(
+            type(self)(
+                manager=manager,
+                entity_ref=rebinder.ref(self.ref),
+                dependencies=rebinder.refs(self._explicit_dependencies),
+                name=self.name,
+                before=self.before,
+                after=self.after,
+                instead_of=self.instead_of,
+                on=rebinder.text(self.on),
+                function=rebinder.text(self.function) if self.function else None,
+                procedure=rebinder.text(self.procedure) if self.procedure else None,
+            )
+        )
+
+    @property
+    def target(self) -> SchemaDependantEntity | None:
+        return self._resolve_target(self.on)
+
+    @property
+    def on_sql(self) -> str:
+        target = self.target
+        return target.qualified_sql if target else self.on.sql
+
+    def _call_sql(self, call: SqlText) -> str:
+        """
+        Returns the call with the function schema-qualified,
+            so it doesn't resolve through the search path when the trigger fires.
+        """
+        target = self._resolve_target(call)
+        if target is not None:
+            name = format(target, SqlFormatOption.SQL_TEXT)
+            if call.sql.startswith(name):
+                return f"{target.qualified_sql}{call.sql[len(name) :]}"
+        return call.sql
+
+    @override
+    def create_sql(self, on: str | None = None) -> list[str]:
+        """
+        Args:
+            on: Qualified SQL of another table to create the trigger on,
+                e.g. a shadow table
+        """
+        events = " ".join(
+            f"{timing} {events}"
+            for timing, events in (
+                ("BEFORE", self.before),
+                ("AFTER", self.after),
+                ("INSTEAD OF", self.instead_of),
+            )
+            if events
+        )
+        execute = (
+            f"FUNCTION {self._call_sql(self.function)}"
+            if self.function
+            else f"PROCEDURE {self._call_sql(cast(SqlText, self.procedure))}"
+        )
+        return [
+            (
+                f"CREATE TRIGGER {self.sql} {events} ON {on or self.on_sql}"
+                f" FOR EACH ROW EXECUTE {execute}"
+            )
+        ]
+
+    @override
+    def drop_sql(self) -> list[str]:
+        return [f"DROP TRIGGER {self.sql} ON {self.on_sql}"]
+
+    @override
+    def rename_sql(self, old: DBEntity) -> list[str]:
+        return [
+            (
+                f"ALTER TRIGGER {format(old, SqlFormatOption.SQL_TEXT)}"
+                f" ON {cast(Trigger, old).on_sql} RENAME TO {self.sql}"
+            )
+        ]
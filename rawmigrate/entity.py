@@ -2,11 +2,14 @@ from abc import ABC, abstractmethod
 
 from typing import TYPE_CHECKING, ClassVar, Iterable, override
 
+from rawmigrate.core import BaseSqlText, SqlFormatOption, SqlText
 from rawmigrate.utils import hash_str
 
 
 if TYPE_CHECKING:
     from rawmigrate.entity_manager import EntityManager
+    from rawmigrate.renames import Renames
+    from rawmigrate.template import SchemaRebinder
 
 
 class EntityBundle[T: DBEntity]:
@@ -75,6 +78,78 @@ class DBEntity(ABC):
         cls: type[R], manager: "EntityManager", data: dict
     ) -> EntityBundle[R]: ...
 
+    @abstractmethod
+    def rebind[R: DBEntity](
+        self: R, manager: "EntityManager", rebinder: "SchemaRebinder"
+    ) -> EntityBundle[R]:
+        """
+        Copies the entity onto another schema, sharing the parsed SQL texts.
+        """
+        ...
+
+    @abstractmethod
+    def create_sql(self) -> list[str]:
+        """
+        Returns the statements creating the entity.
+        """
+        ...
+
+    @abstractmethod
+    def drop_sql(self) -> list[str]:
+        """
+        Returns the statements dropping the entity.
+        """
+        ...
+
+    @abstractmethod
+    def rename_sql(self, old: "DBEntity") -> list[str]:
+        """
+        Returns the statements renaming the old version of the entity to this one.
+        """
+        ...
+
+    def _resolve_target(self, text: "BaseSqlText") -> "SchemaDependantEntity | None":
+        """
+        Returns the schema entity the text refers to, e.g. the table an index is on.
+        None if there isn't exactly one.
+
+        Imported texts carry no references, the dependencies are used instead.
+        """
+        targets = [
+            entity
+            for ref in text.references or self.dependency_refs
+            if isinstance(
+                entity := self._manager.registry.get_entity(ref, allow_none=True),
+                SchemaDependantEntity,
+            )
+        ]
+        if len(targets) > 1 and not text.references:
+            # e.g. an imported trigger depending on its table and its function
+            targets = [
+                target
+                for target in targets
+                if text.sql
+                in (target.qualified_sql, format(target, SqlFormatOption.SQL_TEXT))
+            ]
+        return targets[0] if len(targets) == 1 else None
+
+    def content_fingerprint(self, renames: "Renames | None" = None) -> str | None:
+        """
+        Returns a digest of the entity content, apart from its name.
+        Used to pair a dropped entity with a created one as a rename.
+
+        Args:
+            renames: Renames already matched, applied to the texts of old entities
+
+        None means the entity is never matched as a rename.
+        """
+        return None
+
+    def _text_digest(self, text: "BaseSqlText", renames: "Renames | None") -> str:
+        if renames is not None and isinstance(text, SqlText):
+            text = renames.text(text, self.dependency_refs)
+        return text.canonical_digest
+
     def __hash__(self) -> int:
         return hash_str(self.ref)
 
@@ -95,6 +170,29 @@ class SchemaDependantEntity(DBEntity):
         super().__init__(manager, entity_ref, dependencies)
         self._schema = schema
 
+    @property
+    def schema(self) -> "DBEntity | None":
+        return self._schema
+
+    def qualify(self, sql: str) -> str:
+        """
+        Prefixes the given identifier SQL with the schema of this entity.
+        """
+        if self._schema is None:
+            return sql
+        return f"{format(self._schema, SqlFormatOption.SQL_TEXT)}.{sql}"
+
+    @property
+    def qualified_sql(self) -> str:
+        return self.qualify(format(self, SqlFormatOption.SQL_TEXT))
+
+    def _rebind_schema(self, rebinder: "SchemaRebinder") -> "DBEntity | None":
+        if self._schema is None:
+            return None
+        if self._schema.ref == rebinder.template_schema.ref:
+            return rebinder.schema
+        return self._schema
+
     @classmethod
     def create_ref(
         cls: type["SchemaDependantEntity"],
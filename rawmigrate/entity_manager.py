@@ -1,26 +1,51 @@
-from dataclasses import dataclass
+import collections.abc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import functools
+import gc
+import hashlib
+import itertools
+import json
+import os
+import textwrap
 from typing import (
-    TYPE_CHECKING,
     Callable,
     Concatenate,
     Iterable,
+    Iterator,
     Literal,
     Self,
+    TextIO,
     overload,
 )
-from rawmigrate.core import DB
+from rawmigrate.core import DB, RefTable
 import graphlib
 
+from rawmigrate.entities.backfill import Backfill
+from rawmigrate.entities.materialized_view import MaterializedView
+from rawmigrate.entities.partition import PartitionedTable, PartitionSet
 from rawmigrate.entities.table import Table
 from rawmigrate.entities.index import Index
 from rawmigrate.entities.function import Function
 from rawmigrate.entities.trigger import Trigger
 from rawmigrate.entities.schema import Schema
-from rawmigrate.entity import EntityBundle
+from rawmigrate.entities.sequence import Sequence
+from rawmigrate.entity import DBEntity, EntityBundle
 
-if TYPE_CHECKING:
-    from rawmigrate.entity import DBEntity
+
+@contextmanager
+def _paused_gc():
+    """
+    Pauses the cyclic garbage collector, which would otherwise rescan
+        the ever growing registry over and over during a bulk import.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 @dataclass(slots=True, kw_only=True)
@@ -28,32 +53,62 @@ class EntityNode:
     entity: DBEntity
     dependencies: set["EntityNode"]
     dependants: set["EntityNode"]
+    # computed once, nodes are hashed on every edge added
+    _hash: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._hash = DBEntity.__hash__(self.entity)
 
+    # Entities that are also SQL texts hash by their SQL, not by their ref,
+    # so same-named entities of different schemas would collide here.
     def __hash__(self) -> int:
-        return self.entity.__hash__()
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, EntityNode):
             return False
-        return self.entity.__eq__(other.entity)
+        return DBEntity.__eq__(self.entity, other.entity)
 
 
 class EntityRegistry:
     def __init__(self):
         self._registry: dict[str, EntityNode] = dict()
+        # used by syntaxes interning refs in meta tags
+        self.ref_table = RefTable()
+        # registered with link=False, waiting for `link`
+        self._unlinked: list[EntityNode] = []
 
-    def register(self, entity: DBEntity):
+    def register(self, entity: DBEntity, link: bool = True):
         """
         Register an entity in the registry and update the tree of dependencies.
+
+        Args:
+            link: Whether to link the dependencies now,
+                otherwise they are linked by `link`, once all entities are registered,
+                so the entities can be registered in any order
         """
-        dependencies = {
-            self._registry[dependency_ref] for dependency_ref in entity.dependency_refs
+        node = EntityNode(entity=entity, dependencies=set(), dependants=set())
+        self._registry[entity.ref] = node
+        if link:
+            self._link(node)
+        else:
+            self._unlinked.append(node)
+
+    def _link(self, node: EntityNode):
+        registry = self._registry
+        node.dependencies = {
+            registry[dependency_ref] for dependency_ref in node.entity.dependency_refs
         }
-        node = EntityNode(entity=entity, dependencies=dependencies, dependants=set())
-        for dependency in dependencies:
+        for dependency in node.dependencies:
             dependency.dependants.add(node)
 
-        self._registry[entity.ref] = node
+    def link(self):
+        """
+        Link the dependencies of the entities registered with link=False, in one pass.
+        """
+        unlinked, self._unlinked = self._unlinked, []
+        for node in unlinked:
+            self._link(node)
 
     def update_node(self, entity: DBEntity):
         """
@@ -70,24 +125,60 @@ class EntityRegistry:
         # No need to recompute dependants,
         # since changing a node can't make its dependants not-depend on it
 
-    def iter_topological(self) -> Iterable[EntityNode]:
+    def iter_topological(
+        self, refs: Iterable[str] | None = None, deterministic: bool = False
+    ) -> Iterable[EntityNode]:
         """
         Return topologically sorted nodes from the registry.
-        """
-        return graphlib.TopologicalSorter(
-            {node: node.dependencies for node in self._registry.values()}
-        ).static_order()
 
-    def iter_branches(self, head: str) -> Iterable[tuple[EntityNode, EntityNode]]:
+        Args:
+            refs: Only sort the nodes of these refs, the ones missing from the registry are skipped.
+                default = all nodes
+            deterministic: Order the nodes ready at the same time by ref,
+                so the order doesn't depend on the set iteration order of the process
+        """
+        if refs is None:
+            sorter = graphlib.TopologicalSorter(
+                {node: node.dependencies for node in self._registry.values()}
+            )
+        else:
+            nodes = {self._registry[ref] for ref in refs if ref in self._registry}
+            sorter = graphlib.TopologicalSorter(
+                {node: node.dependencies & nodes for node in nodes}
+            )
+        if not deterministic:
+            return sorter.static_order()
+        return self._iter_sorted_batches(sorter)
+
+    @staticmethod
+    def _iter_sorted_batches(
+        sorter: graphlib.TopologicalSorter[EntityNode],
+    ) -> Iterator[EntityNode]:
+        sorter.prepare()
+        while sorter.is_active():
+            ready = sorted(sorter.get_ready(), key=lambda node: node.entity.ref)
+            yield from ready
+            sorter.done(*ready)
+
+    def iter_branches(
+        self, head: str, within: set[str] | None = None
+    ) -> Iterable[tuple[EntityNode, EntityNode]]:
         """
         Iterate over the branches of the tree, moving towards the given head.
 
+        Args:
+            head: The ref of the node to start from
+            within: Don't descend into the nodes outside of these refs
+                default = no restriction
+
         Returns:
             An iterable of tuples, where the first element is the parent node and the second element is the child node.
         """
 
         def _iter(visited: set[EntityNode], node: EntityNode):
             for dependant in node.dependants:
+                if within is not None and dependant.entity.ref not in within:
+                    continue
                 if dependant not in visited:
                     visited.add(dependant)
                     yield from _iter(visited, dependant)
@@ -103,6 +194,15 @@ class EntityRegistry:
                 raise ValueError(f"Node for Entity {ref} not found")
             return None
 
+    def get_dependants(self, ref: str) -> set[EntityNode]:
+        return self._registry[ref].dependants
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the refs of all registered entities.
+        """
+        return iter(self._registry)
+
     @overload
     def get_entity(self, ref: str, allow_none: Literal[True]) -> DBEntity | None: ...
 
@@ -117,6 +217,24 @@ class EntityRegistry:
                 raise ValueError(f"Entity {ref} not found")
             return None
 
+    def content_hash(self) -> str:
+        """
+        Returns a digest of the registry content, independent of the registration order.
+        Entities exported by their parents (e.g. columns) are covered by the parent's dict.
+        """
+        digest = hashlib.sha256()
+        for ref in sorted(self._registry):
+            entity = self._registry[ref].entity
+            if not entity.manage_export:
+                continue
+            digest.update(
+                json.dumps(
+                    entity.to_dict() | {"__type__": entity.__class__.__name__},
+                    sort_keys=True,
+                ).encode()
+            )
+        return digest.hexdigest()
+
     def __contains__(self, ref: str) -> bool:
         return ref in self._registry
 
@@ -129,6 +247,7 @@ class EntityManager:
         schema: Schema | None = None,
         registry: EntityRegistry | None = None,
         dependencies: set[str] | None = None,
+        function_config: collections.abc.Mapping[str, str] | None = None,
     ):
         """
         Args:
@@ -141,12 +260,16 @@ class EntityManager:
                 default = parent registry, if no parent provided - error
             dependencies: Default dependencies to use in entities created by this manager
                 default = parent dependencies or empty set
+            function_config: Default configuration parameters of the functions
+                created by this manager, e.g. the search path of a schema template
+                default = parent function config or none
         """
         self._parent = parent
         self._root: EntityManager
         self._db: DB
         self._schema: Schema | None
         self._dependencies: set[str]
+        self._function_config: collections.abc.Mapping[str, str]
         self._registry: EntityRegistry
         if parent:
             self._root = parent._root or parent
@@ -155,23 +278,34 @@ class EntityManager:
             self._dependencies = (
                 dependencies if dependencies is not None else (parent._dependencies)
             )
+            self._function_config = (
+                function_config
+                if function_config is not None
+                else parent._function_config
+            )
             self._registry = registry or parent._registry
         else:
             if not db:
                 raise ValueError("db is required")
             if not registry:
                 raise ValueError("registry is required")
-            self._db = db
+            self._db = db.with_ref_table(registry.ref_table)
             self._root = self
             self._schema = schema
             self._registry = registry
             self._dependencies = dependencies or set()
+            self._function_config = function_config or {}
 
         self.Table = self._wrap_entity_factory(Table.create)
         self.Index = self._wrap_entity_factory(Index.create)
         self.Function = self._wrap_entity_factory(Function.create)
         self.Trigger = self._wrap_entity_factory(Trigger.create)
         self.Schema = self._wrap_entity_factory(Schema.create)
+        self.Backfill = self._wrap_entity_factory(Backfill.create)
+        self.MaterializedView = self._wrap_entity_factory(MaterializedView.create)
+        self.PartitionedTable = self._wrap_entity_factory(PartitionedTable.create)
+        self.PartitionSet = self._wrap_entity_factory(PartitionSet.create)
+        self.Sequence = self._wrap_entity_factory(Sequence.create)
 
         self._entity_classes: dict[str, type[DBEntity]] = {
             "Table": Table,
@@ -179,6 +313,11 @@ class EntityManager:
             "Function": Function,
             "Trigger": Trigger,
             "Schema": Schema,
+            "Backfill": Backfill,
+            "MaterializedView": MaterializedView,
+            "PartitionedTable": PartitionedTable,
+            "PartitionSet": PartitionSet,
+            "Sequence": Sequence,
         }
 
     def _wrap_entity_factory[**P, E: DBEntity](
@@ -187,16 +326,24 @@ class EntityManager:
     ) -> Callable[P, E]:
         @functools.wraps(entity_factory)
         def factory(*args, **kwargs) -> E:
-            bundle = entity_factory(self, *args, **kwargs)
-            for entity in bundle.all:
-                if entity.ref in self._registry:
-                    raise ValueError(f"Entity {entity.ref} already registered")
-            for entity in bundle.all:
-                self._registry.register(entity)
-            return bundle.main
+            return self.register(entity_factory(self, *args, **kwargs))
 
         return factory
 
+    def register[E: DBEntity](self, bundle: EntityBundle[E]) -> E:
+        """
+        Register all entities of the bundle, refusing to overwrite existing ones.
+
+        Returns:
+            The main entity of the bundle
+        """
+        for entity in bundle.all:
+            if entity.ref in self._registry:
+                raise ValueError(f"Entity {entity.ref} already registered")
+        for entity in bundle.all:
+            self._registry.register(entity)
+        return bundle.main
+
     def update_refs(self, entity: DBEntity):
         self._registry.update_node(entity)
 
@@ -212,6 +359,10 @@ class EntityManager:
     def schema(self) -> Schema | None:
         return self._schema
 
+    @property
+    def function_config(self) -> collections.abc.Mapping[str, str]:
+        return self._function_config
+
     @property
     def root(self) -> "EntityManager":
         return self._root
@@ -261,19 +412,116 @@ class EntityManager:
         """
         return EntityManager(parent=self, schema=schema)
 
+    def iter_export_dicts(self) -> Iterator[dict]:
+        """
+        Yield the dicts of the exported entities one at a time,
+            in a topological order that is stable between runs.
+        """
+        for node in self.registry.iter_topological(deterministic=True):
+            if node.entity.manage_export:
+                yield node.entity.to_dict() | {
+                    "__type__": node.entity.__class__.__name__,
+                }
+
     def export_dicts(self) -> list[dict]:
-        return [
-            node.entity.to_dict()
-            | {
-                "__type__": node.entity.__class__.__name__,
-            }
-            for node in self.registry.iter_topological()
-            if node.entity.manage_export
-        ]
-
-    def import_dicts(self, data: list[dict]):
-        for entity_data in data:
-            entity_class = self._entity_classes[entity_data["__type__"]]
-            bundle = entity_class.from_dict(self, entity_data)
-            for entity in bundle.all:
-                self._registry.register(entity)
+        return list(self.iter_export_dicts())
+
+    def write_export(self, file: TextIO, jsonl: bool = False):
+        """
+        Stream the export into a file or pipe, one entity at a time,
+            so the memory used doesn't grow with the registry.
+
+        Args:
+            file: The text stream to write to
+            jsonl: Write compact JSON lines, one entity per line,
+                instead of an indented JSON list
+
+        Usage::
+
+            with open("export.jsonl", "w") as f:
+                manager.write_export(f, jsonl=True)
+
+            with open("export.jsonl") as f:
+                new_manager.import_dicts(json.loads(line) for line in f)
+        """
+        if jsonl:
+            for data in self.iter_export_dicts():
+                file.write(json.dumps(data, separators=(",", ":")))
+                file.write("\n")
+            return
+
+        file.write("[")
+        separator = "\n"
+        for data in self.iter_export_dicts():
+            file.write(separator)
+            file.write(textwrap.indent(json.dumps(data, indent=4), " " * 4))
+            separator = ",\n"
+        file.write("\n]\n")
+
+    def import_dicts(self, data: Iterable[dict]):
+        """
+        Register the exported entities, in any order as long as the schemas come first,
+            the dependencies are linked once all entities are registered.
+        """
+        with _paused_gc():
+            for entity_data in data:
+                entity_class = self._entity_classes[entity_data["__type__"]]
+                bundle = entity_class.from_dict(self, entity_data)
+                for entity in bundle.all:
+                    self._registry.register(entity, link=False)
+            self._registry.link()
+
+    @staticmethod
+    def load_export(path: str | os.PathLike) -> list[dict]:
+        """
+        Reads the exported entities from a file,
+            a JSON list or JSON lines (e.g. from `write_export`).
+        """
+        with open(path) as file:
+            text = file.read()
+        if text.lstrip().startswith("["):
+            return json.loads(text)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def write_export_shards(self, files: collections.abc.Sequence[TextIO]):
+        """
+        Stream the export into several files as JSON lines, dealing the entities
+            out in turn, to be imported by `import_shards`.
+        """
+        for data, file in zip(self.iter_export_dicts(), itertools.cycle(files)):
+            file.write(json.dumps(data, separators=(",", ":")))
+            file.write("\n")
+
+    def import_shards(self, paths: collections.abc.Sequence[str | os.PathLike]):
+        """
+        Import an export split across files.
+
+        The shards hold entities in any order (e.g. from `write_export_shards`),
+            they are merged into the registry, and linked in one final pass.
+
+        Args:
+            paths: The shard files, JSON lists or JSON lines
+
+        Usage::
+
+            manager.import_shards(sorted(glob.glob("export/*.jsonl")))
+        """
+        with _paused_gc():
+            shards = [self.load_export(path) for path in paths]
+        # the schemas are looked up while the other entities are built
+        self.import_dicts(
+            itertools.chain(
+                (
+                    entity
+                    for shard in shards
+                    for entity in shard
+                    if entity["__type__"] == "Schema"
+                ),
+                (
+                    entity
+                    for shard in shards
+                    for entity in shard
+                    if entity["__type__"] != "Schema"
+                ),
+            )
+        )
@@ -0,0 +1,377 @@
+import random
+import re
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from rawmigrate.comparator import NodeMutationType
+
+if TYPE_CHECKING:
+    from rawmigrate.migrator import MigrationOperation
+
+# SQLSTATE of a lock that couldn't be acquired within lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")*"|[^\s."(]+)'
+# captures the index name and the schema of the table, where the index is created
+_CREATE_INDEX_CONCURRENTLY = re.compile(
+    rf"CREATE (?:UNIQUE )?INDEX CONCURRENTLY (?:IF NOT EXISTS )?({_IDENTIFIER})"
+    rf" ON (?:ONLY )?(?:({_IDENTIFIER})\.)?{_IDENTIFIER}"
+)
+
+
+def is_lock_timeout(error: BaseException) -> bool:
+    """
+    Whether the error is a lock timeout, for psycopg and psycopg2 errors.
+    """
+    code = getattr(error, "sqlstate", None) or getattr(error, "pgcode", None)
+    return code == LOCK_NOT_AVAILABLE
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ExecutionPolicy:
+    # seconds to wait for a lock before giving up on the attempt, None = no limit
+    lock_timeout: float | None = 2.0
+    # seconds a statement may run, None = no limit
+    statement_timeout: float | None = None
+    # attempts after the first one, when a lock couldn't be acquired
+    retries: int = 5
+    # seconds to wait before the first retry, doubled for each next one
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, retry: int, jitter: float) -> float:
+        """
+        Returns the seconds to wait before a retry, randomized over [half, full]
+            of the exponential backoff, so competing runs don't retry in lockstep.
+
+        Args:
+            retry: The number of the retry, from 0
+            jitter: A random number in [0, 1)
+        """
+        full = min(self.max_backoff, self.backoff * 2**retry)
+        return full / 2 + full / 2 * jitter
+
+
+DEFAULT_POLICY = ExecutionPolicy()
+
+
+@dataclass(slots=True, kw_only=True)
+class ExecutionStep:
+    """
+    Statements of an operation that are applied, retried or given up on together.
+    """
+
+    mutation: NodeMutationType
+    entity_type: str
+    entity_ref: str
+    statements: list[str]
+    # whether the statements run in one transaction,
+    # otherwise each commits on its own, e.g. a DO block committing per chunk
+    transactional: bool = True
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Whether a failed attempt leaves nothing behind, can resume or be cleaned up.
+        Chunked loops (DO blocks) resume from their last committed chunk.
+        """
+        return self.transactional or all(
+            statement.startswith("DO ") or _CREATE_INDEX_CONCURRENTLY.match(statement)
+            for statement in self.statements
+        )
+
+    @property
+    def cleanup(self) -> list[str]:
+        """
+        Statements dropping what a failed attempt may have left behind,
+            the invalid index of a CREATE INDEX CONCURRENTLY.
+        """
+        statements = []
+        for statement in self.statements:
+            if match := _CREATE_INDEX_CONCURRENTLY.match(statement):
+                name, schema = match.groups()
+                statements.append(
+                    "DROP INDEX CONCURRENTLY IF EXISTS"
+                    f" {f'{schema}.' if schema else ''}{name}"
+                )
+        return statements
+
+    @property
+    def policy_keys(self) -> list[str]:
+        """
+        Keys a policy is looked up by, the most specific first.
+        """
+        return [f"{self.mutation} {self.entity_type}", self.entity_type, self.mutation]
+
+
+def _runs_outside_transaction(statement: str) -> bool:
+    return statement.startswith("DO ") or " CONCURRENTLY " in statement
+
+
+def _new_step(operation: "MigrationOperation", transactional: bool) -> ExecutionStep:
+    return ExecutionStep(
+        mutation=operation.mutation,
+        entity_type=type(operation.entity).__name__,
+        entity_ref=operation.entity.ref,
+        statements=[],
+        transactional=transactional,
+    )
+
+
+def split_steps(operations: Iterable["MigrationOperation"]) -> list[ExecutionStep]:
+    """
+    Splits the operations of a plan into steps.
+
+    The statements of an operation form one transactional step,
+        apart from the ones that can't run in a transaction block,
+        which are steps of their own, and explicit BEGIN ... COMMIT blocks,
+        which are transactional steps of their own.
+    """
+    steps: list[ExecutionStep] = []
+    for operation in operations:
+        current: ExecutionStep | None = None
+        in_block = False
+        for statement in operation.statements:
+            if statement == "BEGIN":
+                current = _new_step(operation, True)
+                steps.append(current)
+                in_block = True
+            elif statement == "COMMIT":
+                current = None
+                in_block = False
+            elif not in_block and _runs_outside_transaction(statement):
+                steps.append(_new_step(operation, False))
+                steps[-1].statements.append(statement)
+                current = None
+            else:
+                if current is None:
+                    current = _new_step(operation, True)
+                    steps.append(current)
+                current.statements.append(statement)
+    return steps
+
+
+@dataclass(slots=True, kw_only=True)
+class StepReport:
+    mutation: NodeMutationType
+    entity_type: str
+    entity_ref: str
+    attempts: int = 0
+    # attempts that failed to acquire a lock in time
+    lock_waits: int = 0
+    # seconds spent in those attempts
+    lock_wait_time: float = 0.0
+    # seconds from the first attempt to the end, backoff included
+    total_time: float = 0.0
+    done: bool = False
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "mutation": self.mutation,
+            "entity_type": self.entity_type,
+            "entity_ref": self.entity_ref,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "lock_waits": self.lock_waits,
+            "lock_wait_time": round(self.lock_wait_time, 6),
+            "total_time": round(self.total_time, 6),
+            "done": self.done,
+        }
+
+
+@dataclass(slots=True, kw_only=True)
+class ExecutionReport:
+    steps: list[StepReport] = field(default_factory=list)
+    # the index of the step the run started from
+    start: int = 0
+    # the index of the step given up on, where a rerun resumes
+    stopped_at: int | None = None
+
+    @property
+    def completed(self) -> bool:
+        return self.stopped_at is None
+
+    def to_dict(self) -> dict:
+        return {
+            "completed": self.completed,
+            "start": self.start,
+            "stopped_at": self.stopped_at,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+    def to_table(self) -> str:
+        rows = [("STEP", "OPERATION", "RETRIES", "LOCK WAITS", "TIME")] + [
+            (
+                str(index),
+                f"{step.mutation} {step.entity_ref}",
+                str(step.retries),
+                f"{step.lock_waits} ({step.lock_wait_time:.3f}s)",
+                f"{step.total_time:.3f}s" + ("" if step.done else " GAVE UP"),
+            )
+            for index, step in enumerate(self.steps, self.start)
+        ]
+        widths = [max(len(row[column]) for row in rows) for column in range(5)]
+        return "\n".join(
+            "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+            for row in rows
+        )
+
+
+class PlanExecutor:
+    """
+    Applies the operations of a plan step by step over a DB-API connection,
+        with lock and statement timeouts set per operation type.
+
+    A step failing to acquire a lock in time is rolled back and retried
+        after a jittered backoff, so it doesn't block the queries queued behind it.
+    Once the retries run out, the execution stops before the step,
+        and a rerun with `start=report.stopped_at` resumes there.
+
+    The connection must be in autocommit mode,
+        the transactions are managed with explicit BEGIN and COMMIT.
+
+    Usage::
+
+        executor = PlanExecutor(connection, policies={
+            "ALTER Table": ExecutionPolicy(lock_timeout=1, retries=10),
+            "Backfill": ExecutionPolicy(lock_timeout=5, statement_timeout=None),
+        })
+        report = executor.run(migrator.plan())
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        policies: Mapping[str, ExecutionPolicy] | None = None,
+        default: ExecutionPolicy = DEFAULT_POLICY,
+        is_retryable: Callable[[BaseException], bool] = is_lock_timeout,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        jitter: Callable[[], float] = random.random,
+    ):
+        """
+        Args:
+            connection: A DB-API connection in autocommit mode
+            policies: Policies by "<MUTATION> <entity type>" (e.g. "ALTER Table"),
+                entity type (e.g. "Index") or mutation (e.g. "DROP"),
+                the most specific one applies
+            default: The policy of the steps no other policy matches
+            is_retryable: Whether an error is worth another attempt,
+                lock timeouts by default
+            sleep: Called with the backoff between attempts
+            clock: Measures the time reported
+            jitter: Returns a random number in [0, 1)
+        """
+        self.connection = connection
+        self.policies = dict(policies or {})
+        self.default = default
+        self.is_retryable = is_retryable
+        self.sleep = sleep
+        self.clock = clock
+        self.jitter = jitter
+
+    def policy(self, step: ExecutionStep) -> ExecutionPolicy:
+        for key in step.policy_keys:
+            if key in self.policies:
+                return self.policies[key]
+        return self.default
+
+    @staticmethod
+    def _milliseconds(seconds: float | None) -> int:
+        # 0 disables the timeout
+        return 0 if seconds is None else max(int(seconds * 1000), 1)
+
+    def _attempt(self, step: ExecutionStep, policy: ExecutionPolicy, cleanup: bool):
+        cursor = self.connection.cursor()
+        scope = "LOCAL " if step.transactional else ""
+        try:
+            if step.transactional:
+                cursor.execute("BEGIN")
+            cursor.execute(
+                f"SET {scope}lock_timeout = {self._milliseconds(policy.lock_timeout)}"
+            )
+            cursor.execute(
+                f"SET {scope}statement_timeout"
+                f" = {self._milliseconds(policy.statement_timeout)}"
+            )
+            for statement in [*(step.cleanup if cleanup else []), *step.statements]:
+                cursor.execute(statement)
+            if step.transactional:
+                cursor.execute("COMMIT")
+        except BaseException:
+            if step.transactional:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            if not step.transactional:
+                cursor.execute("RESET lock_timeout")
+                cursor.execute("RESET statement_timeout")
+            cursor.close()
+
+    def run_step(self, step: ExecutionStep, resume: bool = False) -> StepReport:
+        """
+        Applies one step, retrying it while the locks can't be acquired.
+        `done` is False on the report if it was given up on.
+
+        Args:
+            step: The step to apply
+            resume: Whether a previous run gave up on the step,
+                so what its attempts left behind is cleaned up first
+
+        Raises:
+            Errors that aren't retryable, after rolling the step back.
+        """
+        policy = self.policy(step)
+        report = StepReport(
+            mutation=step.mutation,
+            entity_type=step.entity_type,
+            entity_ref=step.entity_ref,
+        )
+        started = self.clock()
+        while True:
+            report.attempts += 1
+            attempt_started = self.clock()
+            try:
+                self._attempt(step, policy, resume or report.attempts > 1)
+            except Exception as error:
+                if not self.is_retryable(error):
+                    report.total_time = self.clock() - started
+                    raise
+                report.lock_waits += 1
+                report.lock_wait_time += self.clock() - attempt_started
+                if not step.retryable or report.retries >= policy.retries:
+                    break
+                self.sleep(policy.delay(report.retries, self.jitter()))
+            else:
+                report.done = True
+                break
+        report.total_time = self.clock() - started
+        return report
+
+    def run(
+        self, operations: Iterable["MigrationOperation"], start: int = 0
+    ) -> ExecutionReport:
+        """
+        Applies the plan, stopping before the first step given up on.
+
+        Args:
+            operations: The operations of the plan, see `Migrator.plan`
+            start: The index of the step to start from,
+                e.g. `stopped_at` of a previous run
+        """
+        report = ExecutionReport(start=start)
+        for index, step in enumerate(split_steps(operations)):
+            if index < start:
+                continue
+            step_report = self.run_step(step, resume=index == start and start > 0)
+            report.steps.append(step_report)
+            if not step_report.done:
+                report.stopped_at = index
+                break
+        return report
@@ -0,0 +1,317 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+from rawmigrate.comparator import NodeMutationType
+from rawmigrate.core import DB
+from rawmigrate.entities.index import Index
+from rawmigrate.entities.schema import Schema
+from rawmigrate.entity_manager import EntityManager, EntityRegistry
+from rawmigrate.migrator import MigrationOperation
+
+# Exports the snapshot read by `load_index_stats`, e.g. with psql's \copy ... TO CSV
+STATS_QUERY = """\
+SELECT i.schemaname, i.relname, i.indexrelname, i.idx_scan, i.idx_tup_read,
+       t.n_tup_ins + t.n_tup_upd + t.n_tup_del AS writes,
+       pg_relation_size(i.indexrelid) AS index_size
+FROM pg_stat_user_indexes i
+JOIN pg_stat_user_tables t USING (relid)"""
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class IndexStats:
+    """
+    Usage of an index in production, a row of `STATS_QUERY`.
+    The counters are cumulative since the statistics were last reset.
+    """
+
+    schema: str
+    name: str
+    table: str = ""
+    scans: int = 0
+    tuples_read: int = 0
+    # rows inserted, updated or deleted in the table, each maintaining the index
+    writes: int = 0
+    # bytes
+    size: int = 0
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.schema, self.name
+
+    def since(self, baseline: "IndexStats") -> "IndexStats":
+        """
+        Returns the usage between an earlier snapshot and this one.
+
+        A counter lower than in the baseline means the statistics were reset
+            (or the index recreated) in between, so the counters since then are
+            the usage counted, rather than negative deltas.
+        """
+        if (
+            self.scans < baseline.scans
+            or self.tuples_read < baseline.tuples_read
+            or self.writes < baseline.writes
+        ):
+            return self
+        return IndexStats(
+            schema=self.schema,
+            name=self.name,
+            table=self.table,
+            scans=self.scans - baseline.scans,
+            tuples_read=self.tuples_read - baseline.tuples_read,
+            writes=self.writes - baseline.writes,
+            size=self.size,
+        )
+
+
+def _count(row: Mapping[str, object], key: str) -> int:
+    value = row.get(key)
+    return int(str(value)) if value not in (None, "") else 0
+
+
+def load_index_stats(path: str | os.PathLike) -> list[IndexStats]:
+    """
+    Reads a snapshot exported with `STATS_QUERY`,
+        as CSV with a header, a JSON list of rows or JSON lines.
+    Only schemaname, indexrelname and idx_scan are required.
+    """
+    with open(path, newline="") as file:
+        text = file.read()
+    stripped = text.lstrip()
+    rows: Iterable[Mapping[str, object]]
+    if stripped.startswith("["):
+        rows = json.loads(text)
+    elif stripped.startswith("{"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = csv.DictReader(text.splitlines())
+    return [
+        IndexStats(
+            schema=str(row["schemaname"]),
+            name=str(row["indexrelname"]),
+            table=str(row.get("relname") or ""),
+            scans=_count(row, "idx_scan"),
+            tuples_read=_count(row, "idx_tup_read"),
+            writes=_count(row, "writes"),
+            size=_count(row, "index_size"),
+        )
+        for row in rows
+    ]
+
+
+class IndexUsageRule(StrEnum):
+    UNUSED = "unused"
+    WRITE_HEAVY = "write-heavy"
+    MISSING = "missing"
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class IndexUsageFinding:
+    rule: IndexUsageRule
+    index: Index
+    message: str
+    # bytes the index takes in production
+    size: int = 0
+
+
+@dataclass(slots=True, kw_only=True)
+class IndexUsageReport:
+    findings: list[IndexUsageFinding] = field(default_factory=list)
+    # production indexes no declared one matches, e.g. the ones behind constraints
+    undeclared: list[IndexStats] = field(default_factory=list)
+
+    @property
+    def unused(self) -> list[Index]:
+        return [
+            finding.index
+            for finding in self.findings
+            if finding.rule == IndexUsageRule.UNUSED
+        ]
+
+    @property
+    def exit_code(self) -> int:
+        """
+        Nonzero if anything was found, to fail a CI step.
+        """
+        return 1 if self.findings else 0
+
+    def drop_plan(self, concurrently: bool = True) -> list[MigrationOperation]:
+        """
+        Returns a plan dropping the unused indexes, for `PlanExecutor`.
+        Keep their declarations in sync by removing them from the schema.
+
+        Args:
+            concurrently: Whether the indexes are dropped without blocking writes
+        """
+        return [
+            MigrationOperation(
+                mutation=NodeMutationType.DROP,
+                entity=index,
+                statements=index.drop_sql(concurrently=concurrently),
+            )
+            for index in self.unused
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "findings": [
+                {
+                    "rule": finding.rule,
+                    "ref": finding.index.ref,
+                    "message": finding.message,
+                    "size": finding.size,
+                }
+                for finding in self.findings
+            ],
+            "undeclared": [
+                {"schema": stats.schema, "name": stats.name, "size": stats.size}
+                for stats in self.undeclared
+            ],
+        }
+
+    def to_table(self) -> str:
+        if not self.findings:
+            return "no findings"
+        rows = [("RULE", "INDEX", "SIZE", "PROBLEM")] + [
+            (finding.rule, finding.index.ref, str(finding.size), finding.message)
+            for finding in self.findings
+        ]
+        widths = [max(len(row[column]) for row in rows) for column in range(3)]
+        return "\n".join(
+            "  ".join(value.ljust(width) for value, width in zip(row, widths))
+            + f"  {row[3]}"
+            for row in rows
+        )
+
+
+def _production_key(index: Index) -> tuple[str, str]:
+    target = index.target
+    schema = target.schema if target is not None else None
+    return schema.name if isinstance(schema, Schema) else "public", index.name
+
+
+def check_index_usage(
+    registry: EntityRegistry,
+    stats: Iterable[IndexStats],
+    baseline: Iterable[IndexStats] = (),
+    writes_per_scan: int = 1000,
+) -> IndexUsageReport:
+    """
+    Cross-references the declared indexes with their usage in production:
+
+    - indexes never scanned, which cost every write for nothing.
+        Unique indexes are left out, they enforce a constraint.
+    - indexes maintained by far more writes than they serve scans
+    - declared indexes missing in production
+
+    Args:
+        registry: The registry with the declared indexes
+        stats: A snapshot from `load_index_stats`
+        baseline: An earlier snapshot, to count the usage since then only,
+            e.g. since the last deploy
+        writes_per_scan: Writes per scan from which an index is write-heavy
+    """
+    earlier = {entry.key: entry for entry in baseline}
+    production = {
+        entry.key: entry.since(earlier[entry.key]) if entry.key in earlier else entry
+        for entry in stats
+    }
+    report = IndexUsageReport()
+    declared = set()
+    for ref in sorted(registry):
+        index = registry.get_entity(ref)
+        if not isinstance(index, Index):
+            continue
+        key = _production_key(index)
+        declared.add(key)
+        usage = production.get(key)
+        if usage is None:
+            report.findings.append(
+                IndexUsageFinding(
+                    rule=IndexUsageRule.MISSING,
+                    index=index,
+                    message=f"no index {key[0]}.{key[1]} in production",
+                )
+            )
+        elif usage.scans == 0:
+            if not index.unique:
+                report.findings.append(
+                    IndexUsageFinding(
+                        rule=IndexUsageRule.UNUSED,
+                        index=index,
+                        message=f"never scanned, maintained by {usage.writes} writes",
+                        size=usage.size,
+                    )
+                )
+        elif usage.writes >= writes_per_scan * usage.scans:
+            report.findings.append(
+                IndexUsageFinding(
+                    rule=IndexUsageRule.WRITE_HEAVY,
+                    index=index,
+                    message=(
+                        f"{usage.writes // usage.scans} writes per scan"
+                        f" ({usage.scans} scans)"
+                    ),
+                    size=usage.size,
+                )
+            )
+    report.undeclared = sorted(
+        (entry for key, entry in production.items() if key not in declared),
+        key=lambda entry: entry.key,
+    )
+    return report
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Checks the indexes of an export against a statistics snapshot,
+        e.g. `python -m rawmigrate.index_usage export.json stats.csv`.
+
+    Returns:
+        The exit code, nonzero if anything was found
+    """
+    parser = argparse.ArgumentParser(prog="python -m rawmigrate.index_usage")
+    parser.add_argument("export", help="an export, a JSON list or JSON lines")
+    parser.add_argument("stats", help="a snapshot of STATS_QUERY, CSV or JSON")
+    parser.add_argument("--baseline", help="an earlier snapshot to count from")
+    parser.add_argument(
+        "--writes-per-scan",
+        type=int,
+        default=1000,
+        help="writes per scan from which an index is write-heavy",
+    )
+    parser.add_argument(
+        "--drop", action="store_true", help="print the statements dropping unused ones"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print the findings as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    manager = EntityManager.create_root(DB())
+    manager.import_dicts(EntityManager.load_export(args.export))
+
+    report = check_index_usage(
+        manager.registry,
+        load_index_stats(args.stats),
+        load_index_stats(args.baseline) if args.baseline else (),
+        args.writes_per_scan,
+    )
+    if args.drop:
+        for operation in report.drop_plan():
+            for statement in operation.statements:
+                print(f"{statement};")
+    else:
+        print(
+            json.dumps(report.to_dict(), indent=4) if args.json else report.to_table()
+        )
+    return report.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
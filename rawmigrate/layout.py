@@ -0,0 +1,122 @@
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+# Postgres aligns the data of a row, and each fixed-width value in it,
+# to this many bytes
+MAXALIGN = 8
+
+# type -> (length, alignment) of the fixed-width built-in types,
+# as typlen and typalign in pg_type
+_FIXED_WIDTH_TYPES: dict[str, tuple[int, int]] = {
+    "boolean": (1, 1),
+    "bool": (1, 1),
+    '"char"': (1, 1),
+    "smallint": (2, 2),
+    "int2": (2, 2),
+    "smallserial": (2, 2),
+    "serial2": (2, 2),
+    "integer": (4, 4),
+    "int": (4, 4),
+    "int4": (4, 4),
+    "serial": (4, 4),
+    "serial4": (4, 4),
+    "real": (4, 4),
+    "float4": (4, 4),
+    "date": (4, 4),
+    "oid": (4, 4),
+    "macaddr": (6, 4),
+    "macaddr8": (8, 4),
+    "bigint": (8, 8),
+    "int8": (8, 8),
+    "bigserial": (8, 8),
+    "serial8": (8, 8),
+    "double precision": (8, 8),
+    "float": (8, 8),
+    "float8": (8, 8),
+    "money": (8, 8),
+    "timestamp": (8, 8),
+    "timestamp without time zone": (8, 8),
+    "timestamptz": (8, 8),
+    "timestamp with time zone": (8, 8),
+    "time": (8, 8),
+    "time without time zone": (8, 8),
+    "timetz": (12, 8),
+    "time with time zone": (12, 8),
+    "interval": (16, 8),
+    "point": (16, 8),
+    "uuid": (16, 1),
+}
+
+_TYPE_MODIFIER = re.compile(r"\([^)]*\)")
+
+
+def fixed_width(type_sql: str) -> tuple[int, int] | None:
+    """
+    Returns the (length, alignment) of a fixed-width type,
+        None for variable-length and unknown types, e.g. text, numeric, arrays, enums.
+    """
+    name = " ".join(_TYPE_MODIFIER.sub(" ", type_sql.lower()).split())
+    name = name.removeprefix("pg_catalog.")
+    return _FIXED_WIDTH_TYPES.get(name)
+
+
+def _align(offset: int, alignment: int) -> int:
+    return -(-offset // alignment) * alignment
+
+
+def row_width(types: list[str]) -> int:
+    """
+    Returns the bytes the fixed-width values of a row take, with their padding,
+        for columns of the given types in that order.
+    Variable-length values are left out, their padding depends on their contents.
+    """
+    offset = 0
+    for type_sql in types:
+        width = fixed_width(type_sql)
+        if width is not None:
+            offset = _align(offset, width[1]) + width[0]
+    return _align(offset, MAXALIGN)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ColumnLayout:
+    # the column names in the order that minimizes the padding
+    order: list[str]
+    # bytes per row, see `row_width`
+    declared_width: int
+    packed_width: int
+
+    @property
+    def saved(self) -> int:
+        """
+        Bytes saved per row by the packed order.
+        """
+        return self.declared_width - self.packed_width
+
+
+def column_layout(types: Mapping[str, str]) -> ColumnLayout:
+    """
+    Orders columns to minimize the alignment padding of a row:
+        fixed-width ones from the largest alignment to the smallest,
+        the ones whose length is a multiple of it first,
+        then the variable-length and unknown ones.
+    Ties keep the declaration order.
+
+    Args:
+        types: Column name -> type SQL, in the declaration order
+    """
+
+    def key(name: str) -> tuple[int, bool]:
+        width = fixed_width(types[name])
+        if width is None:
+            return 0, False
+        length, alignment = width
+        return -alignment, length % alignment != 0
+
+    order = sorted(types, key=key)
+    return ColumnLayout(
+        order=order,
+        declared_width=row_width(list(types.values())),
+        packed_width=row_width([types[name] for name in order]),
+    )
@@ -0,0 +1,296 @@
+import argparse
+import json
+import sys
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from enum import StrEnum
+
+from rawmigrate.core import DB
+from rawmigrate.entities.function import Function
+from rawmigrate.entities.index import Index
+from rawmigrate.entities.table import Column, Table, TableConstraint
+from rawmigrate.entities.trigger import Trigger
+from rawmigrate.entity_manager import EntityManager, EntityRegistry
+from rawmigrate.tokenizer import iter_tokens
+
+
+class LintRule(StrEnum):
+    UNINDEXED_FOREIGN_KEY = "unindexed-foreign-key"
+    DUPLICATE_INDEX = "duplicate-index"
+    PREFIX_INDEX = "prefix-index"
+    ROW_TRIGGER_ON_HOT_TABLE = "row-trigger-on-hot-table"
+    UNDECLARED_VOLATILITY = "undeclared-volatility"
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class LintFinding:
+    rule: LintRule
+    ref: str
+    message: str
+
+
+@dataclass(slots=True, kw_only=True)
+class LintReport:
+    findings: list[LintFinding] = field(default_factory=list)
+
+    @property
+    def exit_code(self) -> int:
+        """
+        Nonzero if anything was found, to fail a CI step.
+        """
+        return 1 if self.findings else 0
+
+    def to_dict(self) -> dict:
+        return {
+            "findings": [
+                {"rule": finding.rule, "ref": finding.ref, "message": finding.message}
+                for finding in self.findings
+            ]
+        }
+
+    def to_table(self) -> str:
+        if not self.findings:
+            return "no findings"
+        rows = [("RULE", "ENTITY", "PROBLEM")] + [
+            (finding.rule, finding.ref, finding.message) for finding in self.findings
+        ]
+        widths = [max(len(row[column]) for row in rows) for column in range(2)]
+        return "\n".join(
+            f"{row[0].ljust(widths[0])}  {row[1].ljust(widths[1])}  {row[2]}"
+            for row in rows
+        )
+
+
+def _key_part(sql: str) -> str:
+    """
+    Returns the column name of a plain column expression,
+        the canonical SQL of any other expression.
+    """
+    tokens = list(iter_tokens(sql))
+    if len(tokens) == 1 and tokens[0].startswith('"'):
+        return tokens[0][1:-1].replace('""', '"')
+    return " ".join(tokens)
+
+
+def _ordering(sql: str) -> str:
+    """
+    Returns the ordering of an index key, empty for the default ASC NULLS LAST.
+    """
+    tokens = sql.upper().split()
+    descending = "DESC" in tokens
+    # NULLs sort last ascending and first descending by default
+    nulls_first = "FIRST" in tokens if "NULLS" in tokens else descending
+    parts = ["DESC"] if descending else []
+    if nulls_first != descending:
+        parts.append("NULLS FIRST" if nulls_first else "NULLS LAST")
+    return " ".join(parts)
+
+
+def _index_key(index: Index) -> tuple[str, ...]:
+    """
+    Returns the key of an index, each part with its operator class and ordering,
+        so that only keys serving the same scans are equal.
+    """
+    return tuple(
+        " ".join(
+            part
+            for part in (
+                _key_part(expression.sql),
+                _key_part(opclass.sql) if opclass is not None else "",
+                _ordering(ordering),
+            )
+            if part
+        )
+        for expression, opclass, ordering in zip(
+            index.expressions, index.opclasses, index.orderings
+        )
+    )
+
+
+@dataclass(slots=True, kw_only=True)
+class _TableKeys:
+    # the declared btree indexes with their keys (see `_index_key`)
+    indexes: list[tuple[Index, tuple[str, ...]]] = field(default_factory=list)
+    # the columns of the declared btree indexes, any ordering or operator class
+    # looks up the rows of a foreign key
+    lookups: list[tuple[str, ...]] = field(default_factory=list)
+    # the keys of the indexes behind PRIMARY KEY and UNIQUE constraints
+    implicit: list[tuple[str, ...]] = field(default_factory=list)
+    # (ref of the column or the table, foreign key columns)
+    foreign_keys: list[tuple[str, tuple[str, ...]]] = field(default_factory=list)
+
+
+def lint(registry: EntityRegistry, hot_tables: Iterable[str] = ()) -> LintReport:
+    """
+    Checks the declared schema for performance problems:
+
+    - foreign keys without an index starting with their columns,
+        which makes every delete or key update of the referenced table scan this one
+    - btree indexes duplicating another one, or covered by a longer one,
+        which slow down writes for nothing
+    - triggers firing for every row of the hot tables
+    - functions without a declared volatility, which Postgres assumes volatile,
+        so it can't inline them or use them in an index
+
+    Runs in time linear in the number of entities.
+
+    Args:
+        registry: The registry to check
+        hot_tables: Refs of the tables with heavy write traffic
+    """
+    hot = set(hot_tables)
+    report = LintReport()
+    tables: dict[str, _TableKeys] = defaultdict(_TableKeys)
+    for ref in registry:
+        entity = registry.get_entity(ref)
+        if isinstance(entity, Table):
+            keys = tables[entity.ref]
+            for expression in entity._additional_expressions:
+                constraint = TableConstraint.parse(expression.sql)
+                if constraint is None:
+                    continue
+                if constraint.kind in ("primary", "unique"):
+                    keys.implicit.append(constraint.columns)
+                elif constraint.kind == "foreign":
+                    keys.foreign_keys.append((entity.ref, constraint.columns))
+        elif isinstance(entity, Column):
+            keys = tables[entity.table_ref]
+            for column_constraint in entity.parsed_definition.constraints:
+                if column_constraint.kind in ("primary", "unique"):
+                    keys.implicit.append((entity.name,))
+                elif column_constraint.kind == "references":
+                    keys.foreign_keys.append((entity.ref, (entity.name,)))
+        elif isinstance(entity, Index):
+            target = entity.target
+            # partial indexes serve their predicate only
+            if (
+                target is not None
+                and entity.where is None
+                and _key_part(entity.using.sql) == "btree"
+            ):
+                keys = tables[target.ref]
+                keys.indexes.append((entity, _index_key(entity)))
+                keys.lookups.append(
+                    tuple(
+                        _key_part(expression.sql) for expression in entity.expressions
+                    )
+                )
+        elif isinstance(entity, Trigger):
+            target = entity.target
+            if target is not None and target.ref in hot:
+                report.findings.append(
+                    LintFinding(
+                        rule=LintRule.ROW_TRIGGER_ON_HOT_TABLE,
+                        ref=entity.ref,
+                        message=(
+                            f"fires for every row of the hot table {target.ref},"
+                            " consider a statement trigger with transition tables"
+                        ),
+                    )
+                )
+        elif isinstance(entity, Function):
+            if entity.volatility is None and _key_part(entity.returns.sql) != "trigger":
+                report.findings.append(
+                    LintFinding(
+                        rule=LintRule.UNDECLARED_VOLATILITY,
+                        ref=entity.ref,
+                        message="no volatility declared, Postgres assumes VOLATILE",
+                    )
+                )
+
+    for table_ref in sorted(tables):
+        report.findings.extend(_lint_table_keys(table_ref, tables[table_ref]))
+    return report
+
+
+def _lint_table_keys(table_ref: str, keys: _TableKeys) -> list[LintFinding]:
+    findings = []
+    # the column sets each index can look up by, in any order
+    leading = {
+        frozenset(key[:length])
+        for key in (*keys.implicit, *keys.lookups)
+        for length in range(1, len(key) + 1)
+    }
+    for ref, columns in keys.foreign_keys:
+        if frozenset(columns) not in leading:
+            findings.append(
+                LintFinding(
+                    rule=LintRule.UNINDEXED_FOREIGN_KEY,
+                    ref=ref,
+                    message=(
+                        f"no index starts with the foreign key ({', '.join(columns)})"
+                    ),
+                )
+            )
+
+    all_keys = [*keys.implicit, *(key for _, key in keys.indexes)]
+    covering = {key[:length] for key in all_keys for length in range(1, len(key))}
+    # key -> (what indexes it, whether that is unique)
+    seen: dict[tuple[str, ...], tuple[str, bool]] = {
+        key: ("the primary key or a unique constraint", True) for key in keys.implicit
+    }
+    # an index with INCLUDE columns serves every scan of a narrower index
+    # on the same key, so it's the narrower one that is reported
+    for index, key in sorted(keys.indexes, key=lambda item: item[0].ref):
+        if index.include:
+            seen.setdefault(key, (f"the covering index {index.ref}", index.unique))
+    # unique indexes first, a plain index duplicating one is the redundant one
+    for index, key in sorted(
+        keys.indexes, key=lambda item: (not item[0].unique, item[0].ref)
+    ):
+        if index.include:
+            continue
+        if key in seen and (seen[key][1] or not index.unique):
+            findings.append(
+                LintFinding(
+                    rule=LintRule.DUPLICATE_INDEX,
+                    ref=index.ref,
+                    message=f"duplicates {seen[key][0]} on {table_ref}",
+                )
+            )
+        elif key in covering and not index.unique:
+            findings.append(
+                LintFinding(
+                    rule=LintRule.PREFIX_INDEX,
+                    ref=index.ref,
+                    message=(
+                        f"its columns ({', '.join(key)}) start a longer index"
+                        f" on {table_ref}"
+                    ),
+                )
+            )
+        seen.setdefault(key, (index.ref, index.unique))
+    return findings
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Lints an export, e.g. `python -m rawmigrate.lint export.json`.
+
+    Returns:
+        The exit code, nonzero if anything was found
+    """
+    parser = argparse.ArgumentParser(prog="python -m rawmigrate.lint")
+    parser.add_argument("export", help="an export, a JSON list or JSON lines")
+    parser.add_argument(
+        "--hot-table",
+        action="append",
+        default=[],
+        help="ref of a table with heavy write traffic, can be repeated",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print the findings as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    manager = EntityManager.create_root(DB())
+    manager.import_dicts(EntityManager.load_export(args.export))
+
+    report = lint(manager.registry, args.hot_table)
+    print(json.dumps(report.to_dict(), indent=4) if args.json else report.to_table())
+    return report.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
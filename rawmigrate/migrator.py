@@ -1,20 +1,181 @@
+from collections import deque
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import cast
+
 from rawmigrate.comparator import Comparator, NodeMutationType
 from rawmigrate.entity_manager import EntityNode, EntityRegistry
 from rawmigrate.comparators import (
+    BackfillComparator,
     FunctionComparator,
     IndexComparator,
+    MaterializedViewComparator,
+    PartitionedTableComparator,
+    PartitionSetComparator,
     SchemaComparator,
+    SequenceComparator,
     TableComparator,
     TriggerComparator,
     ColumnComparator,
 )
-from rawmigrate.entities import Column, Function, Index, Schema, Table, Trigger
+from rawmigrate.entities import (
+    Backfill,
+    Column,
+    Function,
+    Index,
+    MaterializedView,
+    PartitionedTable,
+    PartitionSet,
+    Schema,
+    Sequence,
+    Table,
+    Trigger,
+)
+from rawmigrate.entities.table import ColumnConstraint
+from rawmigrate.entity import DBEntity
+from rawmigrate.online import OnlineRewrite, generates_values, is_integer_key
+from rawmigrate.renames import Renames, match_renames
+from rawmigrate.plan_cache import PlanCache, PlanCacheMismatchError, PlanCacheMode
+from rawmigrate.plan_report import PlanReport
+from rawmigrate.template import SchemaRebinder
+
+# Bump whenever the rendered output changes, to invalidate cached plans
+PLAN_FORMAT_VERSION = 6
+
+
+@dataclass(slots=True, frozen=True)
+class RecreateReason:
+    # the dependency whose DROP or RECREATE forced the entity to be recreated,
+    # None when the entity itself changed in a way that can't be altered
+    forced_by: str | None = None
+
+    def __str__(self) -> str:
+        if self.forced_by is None:
+            return "changed in a way that can't be altered"
+        return f"forced by {self.forced_by}"
+
+
+@dataclass(slots=True, kw_only=True)
+class MigrationOperation:
+    mutation: NodeMutationType
+    entity: DBEntity
+    # empty when the operation is covered by another one,
+    # e.g. columns created along with their table
+    statements: list[str] = field(default_factory=list)
+    # set on both halves of a RECREATE
+    reason: RecreateReason | None = None
+
+
+# ALTER TABLE actions that can't be combined with others
+_STANDALONE_ACTIONS = ("RENAME ", "ATTACH ", "DETACH ", "SET SCHEMA ")
+
+
+def _split_alter_table(statement: str) -> tuple[str, str] | None:
+    """
+    Splits an ALTER TABLE statement into the part naming the table and the action.
+    """
+    if not statement.startswith("ALTER TABLE "):
+        return None
+    quoted = False
+    for position in range(len("ALTER TABLE "), len(statement)):
+        match statement[position]:
+            case '"':
+                quoted = not quoted
+            case " " if not quoted:
+                return statement[:position], statement[position + 1 :]
+    return None
+
+
+def _alter_table_actions(
+    statements: list[str],
+) -> tuple[str, bool, list[str]] | None:
+    """
+    Returns the ALTER TABLE prefix, whether they validate constraints,
+        and the actions of statements that can be merged with others.
+    None unless all of them alter the same table with actions that can be combined.
+    """
+    prefix = None
+    validates = None
+    actions = []
+    for statement in statements:
+        split = _split_alter_table(statement)
+        if split is None or split[1].startswith(_STANDALONE_ACTIONS):
+            return None
+        statement_validates = split[1].startswith("VALIDATE ")
+        if prefix is None:
+            prefix, validates = split[0], statement_validates
+        elif prefix != split[0] or validates != statement_validates:
+            return None
+        actions.append(split[1])
+    if prefix is None or validates is None:
+        return None
+    return prefix, validates, actions
+
+
+@dataclass(slots=True, kw_only=True)
+class _AlterGroup:
+    # the operation holding the merged statement
+    operation: MigrationOperation
+    prefix: str
+    position: int
+    validates: bool
+    actions: list[str]
+    # indexes of the operations merged into it
+    members: list[int] = field(default_factory=list)
 
 
 class Migrator:
-    def __init__(self, old: EntityRegistry, new: EntityRegistry):
+    def __init__(
+        self,
+        old: EntityRegistry,
+        new: EntityRegistry,
+        targets: Iterable[str] | None = None,
+        renames: Mapping[str, str | None] | None = None,
+        detect_renames: bool = True,
+        online_rewrite: Iterable[str] | None = None,
+        online_chunk_size: int = 10_000,
+        defer_validation: bool = True,
+        merge_alters: bool = True,
+        refresh_views: bool = False,
+    ):
+        """
+        Args:
+            old: The registry describing the current state
+            new: The registry describing the desired state
+            targets: Refs to plan for. Only the subgraph the targets force into the plan
+                is visited: new dependencies they need created, and dependants
+                that must be dropped or recreated along with them.
+                default = plan for the whole registry
+            renames: Old ref -> new ref to confirm a rename,
+                or old ref -> None to never treat the old entity as renamed
+            detect_renames: Whether to pair dropped and created entities
+                with the same content as renames
+            online_rewrite: Refs of tables rewritten through a shadow table
+                when a change rewrites them (see `OnlineRewrite`),
+                instead of locking them for the whole rewrite
+            online_chunk_size: The width of the key range copied per chunk
+                of an online rewrite
+            defer_validation: Whether foreign keys and checks added to existing tables
+                are added as NOT VALID and validated at the end of the plan,
+                so the rows are checked without blocking writes
+            merge_alters: Whether the ALTER TABLE statements of a table
+                are merged into one where nothing has to run between them,
+                so the table is locked once and rewritten at most once
+            refresh_views: Whether the materialized views that are kept
+                are refreshed at the end of the plan when it changes the rows
+                of a table they read, i.e. alters, rewrites or backfills it
+        """
         self.old = old
         self.new = new
+        self.targets = set(targets) if targets is not None else None
+        self.rename_overrides = dict(renames or {})
+        self.detect_renames = detect_renames
+        self.renames = Renames()
+        self.online_rewrite = set(online_rewrite or ())
+        self.online_chunk_size = online_chunk_size
+        self.defer_validation = defer_validation
+        self.merge_alters = merge_alters
+        self.refresh_views = refresh_views
         self.comparator_types = {
             Function: FunctionComparator,
             Index: IndexComparator,
@@ -22,51 +183,873 @@ class Migrator:
             Schema: SchemaComparator,
             Table: TableComparator,
             Column: ColumnComparator,
+            Backfill: BackfillComparator,
+            MaterializedView: MaterializedViewComparator,
+            PartitionedTable: PartitionedTableComparator,
+            PartitionSet: PartitionSetComparator,
+            Sequence: SequenceComparator,
         }
         self.new_comparators: dict[str, Comparator] = {}
+        self.mutations: dict[str, NodeMutationType] = {}
+        self.recreate_reasons: dict[str, RecreateReason] = {}
+        # filled in by `plan`
+        self.report = PlanReport()
+        self.online_rewrites: dict[str, OnlineRewrite] = {}
+        # new ref -> the old materialized view it's swapped in for
+        self.view_swaps: dict[str, MaterializedView] = {}
 
-    def _init_comparators(self):
-        for node in self.new.iter_topological():
-            old = self.old.get_entity(node.entity.ref, allow_none=True)
-            new = node.entity
-            self.new_comparators[node.entity.ref] = self.comparator_types[
-                type(node.entity)
-            ](old, new)
+    def _comparator(self, ref: str) -> Comparator:
+        comparator = self.new_comparators.get(ref)
+        if comparator is None:
+            new = self.new.get_entity(ref)
+            comparator = self.comparator_types[type(new)](
+                self.old.get_entity(self._source_ref(ref), allow_none=True),
+                new,
+                self.renames,
+            )
+            self.new_comparators[ref] = comparator
+        return comparator
 
-    def test(self):
-        migration = ""
-        self._init_comparators()
-        for new in reversed(list(self.new.iter_topological())):
-            if self.new_comparators[new.entity.ref].mutation_type in (
+    def _source_ref(self, ref: str) -> str:
+        """
+        Returns the old ref of a new entity, which differs for the renamed ones.
+        """
+        return self.renames.old_ref(ref) or ref
+
+    def _survives(self, old_ref: str) -> bool:
+        return old_ref in self.new or self.renames.new_ref(old_ref) is not None
+
+    def _match_renames(self):
+        if self.targets is None:
+            dropped = [ref for ref in self.old if ref not in self.new]
+            created = [ref for ref in self.new if ref not in self.old]
+        else:
+            dropped = [
+                ref for ref in self.targets if ref in self.old and ref not in self.new
+            ]
+            created = [
+                ref for ref in self.targets if ref in self.new and ref not in self.old
+            ]
+        self.renames = match_renames(
+            self.old,
+            self.new,
+            dropped,
+            created,
+            self.rename_overrides,
+            self.detect_renames,
+        )
+
+    def _init_comparators(self, scope: set[str] | None = None):
+        """
+        Computes the final mutation of every new node in scope.
+        If any dependency the node is bound to (see `Comparator.binds`)
+            is DROP or RECREATE, the node is forced to RECREATE.
+        """
+        for node in self.new.iter_topological(scope):
+            ref = node.entity.ref
+            comparator = self._comparator(ref)
+            mutation = comparator.mutation_type
+            if mutation == NodeMutationType.RECREATE:
+                self.recreate_reasons[ref] = RecreateReason()
+            elif mutation in (NodeMutationType.UNCHANGED, NodeMutationType.ALTER):
+                forced_by = min(
+                    (
+                        dependency.entity.ref
+                        for dependency in node.dependencies
+                        if self.mutations.get(dependency.entity.ref)
+                        in (NodeMutationType.DROP, NodeMutationType.RECREATE)
+                        and comparator.binds(dependency.entity.ref)
+                    ),
+                    default=None,
+                )
+                if forced_by is not None:
+                    mutation = NodeMutationType.RECREATE
+                    self.recreate_reasons[ref] = RecreateReason(forced_by)
+            self.mutations[ref] = mutation
+
+    def _targeted_scope(self, targets: set[str]) -> set[str]:
+        """
+        Collects the refs the targets force into the plan,
+            visiting only their part of both registries.
+        """
+        scope: set[str] = set()
+        dropping: set[str] = set()
+        forced: set[str] = set()
+        queue = deque(targets)
+        while queue:
+            ref = queue.popleft()
+            ref = self.renames.new_ref(ref) or ref
+            new = self.new.get_node(ref, allow_none=True)
+            old = self.old.get_node(self._source_ref(ref), allow_none=True)
+            if ref not in scope:
+                scope.add(ref)
+                if new is not None:
+                    # dependencies missing in the old registry must be created first
+                    queue.extend(
+                        dependency.entity.ref
+                        for dependency in new.dependencies
+                        if self._source_ref(dependency.entity.ref) not in self.old
+                    )
+
+            if old is None or ref in dropping:
+                continue
+            if (
+                new is not None
+                and ref not in forced
+                and self._comparator(ref).mutation_type
+                not in (NodeMutationType.DROP, NodeMutationType.RECREATE)
+            ):
+                continue
+
+            # the node is dropped, so are its dependants
+            dropping.add(ref)
+            if new is not None:
+                for dependant in new.dependants:
+                    if self._comparator(dependant.entity.ref).binds(ref):
+                        forced.add(dependant.entity.ref)
+                        queue.append(dependant.entity.ref)
+            queue.extend(
+                dependant.entity.ref
+                for dependant in old.dependants
+                if not self._survives(dependant.entity.ref)
+            )
+        return scope
+
+    def plan(self) -> list[MigrationOperation]:
+        """
+        Computes the operations needed to migrate the old registry to the new one.
+        """
+        self._match_renames()
+        scope = self._targeted_scope(self.targets) if self.targets is not None else None
+        operations: list[MigrationOperation] = []
+        self._init_comparators(scope)
+        new_nodes = list(self.new.iter_topological(scope))
+        for new in reversed(new_nodes):
+            if self.mutations[new.entity.ref] in (
                 NodeMutationType.DROP,
                 NodeMutationType.RECREATE,
             ):
-                migration += f"DROP {new.entity.ref};\n"
+                # the database still holds the old entity, e.g. under its old name
+                operations.append(
+                    MigrationOperation(
+                        mutation=NodeMutationType.DROP,
+                        entity=self.old.get_entity(self._source_ref(new.entity.ref)),
+                        reason=self.recreate_reasons.get(new.entity.ref),
+                    )
+                )
 
         old_dropped: set[EntityNode] = set()
-        for new in self.new.iter_topological():
-            old = self.old.get_node(new.entity.ref, allow_none=True)
+        for new in new_nodes:
+            old = self.old.get_node(self._source_ref(new.entity.ref), allow_none=True)
             if old is not None:
-                for _, child in self.old.iter_branches(old.entity.ref):
+                for _, child in self.old.iter_branches(old.entity.ref, scope):
                     if (
                         old_dropped.issuperset(child.dependants)
                         and child not in old_dropped
-                        and child.entity.ref not in self.new
+                        and not self._survives(child.entity.ref)
                     ):
                         old_dropped.add(child)
-                        migration += f"DROP {child.entity.ref};\n"
+                        operations.append(
+                            MigrationOperation(
+                                mutation=NodeMutationType.DROP, entity=child.entity
+                            )
+                        )
 
-            mutation = self.new_comparators[new.entity.ref].mutation_type
+            mutation = self.mutations[new.entity.ref]
             if mutation in (NodeMutationType.CREATE, NodeMutationType.ALTER):
-                migration += f"{mutation} {new.entity.ref};\n"
+                operations.append(
+                    MigrationOperation(mutation=mutation, entity=new.entity)
+                )
             elif mutation == NodeMutationType.RECREATE:
-                migration += f"CREATE {new.entity.ref};\n"
+                operations.append(
+                    MigrationOperation(
+                        mutation=NodeMutationType.CREATE,
+                        entity=new.entity,
+                        reason=self.recreate_reasons[new.entity.ref],
+                    )
+                )
+
+        for old in reversed(list(self.old.iter_topological(scope))):
+            if not self._survives(old.entity.ref) and old not in old_dropped:
+                operations.append(
+                    MigrationOperation(
+                        mutation=NodeMutationType.DROP, entity=old.entity
+                    )
+                )
+
+        for table_ref in sorted(self.online_rewrite):
+            operations = self._plan_online_rewrite(table_ref, operations)
+        for new in new_nodes:
+            if (
+                isinstance(new.entity, MaterializedView)
+                and self.recreate_reasons.get(new.entity.ref) == RecreateReason()
+            ):
+                operations = self._plan_view_swap(new.entity, operations)
+        self._fill_statements(operations)
+        return operations
+
+    def _plan_online_rewrite(
+        self, table_ref: str, operations: list[MigrationOperation]
+    ) -> list[MigrationOperation]:
+        """
+        Replaces the operations of a table that's rewritten by a change
+            with one online rewrite, if the table supports it.
+
+        The operations of the table, its columns, indexes and triggers,
+            and of the functions mentioning it are absorbed by the rewrite.
+        """
+        rewrite = self._online_rewrite(table_ref)
+        if rewrite is None:
+            return operations
+        absorbed = {table_ref}
+        absorbed.update(column.ref for _, column in rewrite.new.c)
+        absorbed.update(index.ref for index in rewrite.indexes)
+        absorbed.update(trigger.ref for trigger in rewrite.triggers)
+        absorbed.update(function.ref for function, _ in rewrite.functions)
+        old_absorbed = {rewrite.old.ref}
+        old_absorbed.update(column.ref for _, column in rewrite.old.c)
+        old_absorbed.update(
+            node.entity.ref
+            for node in self.old.get_dependants(rewrite.old.ref)
+            if isinstance(node.entity, (Index, Trigger))
+            and cast(Index | Trigger, node.entity).target == rewrite.old
+        )
+        absorbed_operations = self._absorb_operations(
+            operations,
+            absorbed,
+            old_absorbed,
+            MigrationOperation(mutation=NodeMutationType.ALTER, entity=rewrite.new),
+        )
+        if absorbed_operations is not None:
+            self.online_rewrites[table_ref] = rewrite
+            return absorbed_operations
+        return operations
+
+    def _plan_view_swap(
+        self, view: MaterializedView, operations: list[MigrationOperation]
+    ) -> list[MigrationOperation]:
+        """
+        Replaces the RECREATE of a materialized view whose query changed,
+            and of its indexes, with a rebuild under a temporary name swapped in.
+        """
+        old = cast(MaterializedView, self.old.get_entity(self._source_ref(view.ref)))
+        old_absorbed = {old.ref}
+        old_absorbed.update(
+            node.entity.ref
+            for node in self.old.get_dependants(old.ref)
+            if isinstance(node.entity, Index)
+        )
+        absorbed_operations = self._absorb_operations(
+            operations,
+            {view.ref, *(index.ref for index in view.indexes)},
+            old_absorbed,
+            MigrationOperation(
+                mutation=NodeMutationType.CREATE,
+                entity=view,
+                reason=self.recreate_reasons[view.ref],
+            ),
+        )
+        if absorbed_operations is not None:
+            self.view_swaps[view.ref] = old
+            return absorbed_operations
+        return operations
+
+    def _absorb_operations(
+        self,
+        operations: list[MigrationOperation],
+        absorbed: set[str],
+        old_absorbed: set[str],
+        replacement: MigrationOperation,
+    ) -> list[MigrationOperation] | None:
+        """
+        Replaces the operations of the absorbed entities with one operation,
+            None if it can't be done.
+        The replacement follows the other operations and precedes the ones
+            depending on what it absorbed.
+
+        Args:
+            absorbed: Refs of the new entities
+            old_absorbed: Refs of the old entities, whose drops are absorbed
+            replacement: The operation doing the work of the absorbed ones
+        """
+        dropped = {
+            operation.entity.ref
+            for operation in operations
+            if operation.mutation == NodeMutationType.DROP
+        }
+        for ref in old_absorbed:
+            if any(
+                node.entity.ref not in old_absorbed and node.entity.ref in dropped
+                for node in cast(EntityNode, self.old.get_node(ref)).dependencies
+            ):
+                # e.g. the function of a dropped trigger is dropped before the swap
+                return None
+
+        following: set[str] = set()
+        queue = deque(absorbed)
+        while queue:
+            for node in self.new.get_dependants(queue.popleft()):
+                ref = node.entity.ref
+                if ref not in absorbed and ref not in following:
+                    following.add(ref)
+                    queue.append(ref)
+
+        kept: list[MigrationOperation] = []
+        moved: list[MigrationOperation] = []
+        for operation in operations:
+            ref = operation.entity.ref
+            if operation.mutation == NodeMutationType.DROP:
+                if ref not in old_absorbed:
+                    kept.append(operation)
+            elif ref in following:
+                moved.append(operation)
+            elif ref not in absorbed:
+                kept.append(operation)
+        return [*kept, replacement, *moved]
 
-        for old in reversed(list(self.old.iter_topological())):
-            if old.entity.ref not in self.new_comparators and old not in old_dropped:
-                migration += f"DROP {old.entity.ref};\n"
+    def _online_rewrite(self, table_ref: str) -> OnlineRewrite | None:
+        """
+        Collects what the online rewrite of a table needs,
+            None if the table isn't rewritten or the rewrite isn't supported,
+            in which case the regular plan is kept.
+        """
+        new = self.new.get_entity(table_ref, allow_none=True)
+        if (
+            not isinstance(new, Table)
+            # the shadow would need the partitions as well
+            or isinstance(new, PartitionedTable)
+            or self.mutations.get(table_ref)
+            not in (NodeMutationType.UNCHANGED, NodeMutationType.ALTER)
+        ):
+            return None
+        old = cast(Table, self.old.get_entity(self._source_ref(table_ref)))
+        columns = [column for _, column in new.c]
+        if any(column.ref not in self.mutations for column in columns) or not any(
+            cast(ColumnComparator, self.new_comparators[column.ref]).rewrites_table
+            for column in columns
+        ):
+            return None
 
-        print(migration)
+        own = {table_ref, *(column.ref for column in columns)}
+        old_own = {old.ref, *(column.ref for _, column in old.c)}
+        keys = [
+            column
+            for column in columns
+            if any(
+                constraint.kind == "primary"
+                for constraint in column.parsed_definition.constraints
+            )
+        ]
+        if (
+            # constraints of the table itself can't be renamed after the swap
+            new._additional_expressions
+            or old._additional_expressions
+            or len(keys) != 1
+            or not is_integer_key(keys[0])
+            or any(generates_values(column) for column in columns)
+            or any(generates_values(column) for _, column in old.c)
+            or any(
+                constraint.name
+                for column in columns
+                for constraint in column.parsed_definition.constraints
+            )
+            # the shadow would reference the old table
+            or any(
+                own & column.definition.references
+                or own & (column.dependency_refs - {table_ref})
+                for column in columns
+            )
+        ):
+            return None
+        old_key = self.old.get_entity(self._source_ref(keys[0].ref), allow_none=True)
+        if not isinstance(old_key, Column) or not is_integer_key(old_key):
+            return None
+
+        indexes: list[Index] = []
+        triggers: list[Trigger] = []
+        functions: list[tuple[Function, Function]] = []
+        for ref in sorted(own):
+            for node in sorted(
+                self.new.get_dependants(ref), key=lambda node: node.entity.ref
+            ):
+                entity = node.entity
+                if entity.ref in own or entity in indexes or entity in triggers:
+                    continue
+                if entity.ref not in self.mutations:
+                    return None
+                mutation = self.mutations[entity.ref]
+                if isinstance(entity, Backfill):
+                    return None
+                if isinstance(entity, (Index, Trigger)) and entity.target == new:
+                    if isinstance(entity, Index):
+                        indexes.append(entity)
+                    else:
+                        triggers.append(entity)
+                elif isinstance(entity, Function):
+                    if self._comparator(entity.ref).binds(ref):
+                        return None
+                    if mutation in (
+                        NodeMutationType.UNCHANGED,
+                        NodeMutationType.ALTER,
+                    ) and entity not in (function for function, _ in functions):
+                        functions.append(
+                            (
+                                entity,
+                                cast(
+                                    Function,
+                                    self.old.get_entity(self._source_ref(entity.ref)),
+                                ),
+                            )
+                        )
+
+        references: list[tuple[Column, ColumnConstraint]] = []
+        for ref in sorted(old_own):
+            for node in sorted(
+                self.old.get_dependants(ref), key=lambda node: node.entity.ref
+            ):
+                entity = node.entity
+                if entity.ref in old_own:
+                    continue
+                if isinstance(entity, Table) and (
+                    entity._infer_dependency_refs() & old_own
+                ):
+                    # its own constraints reference the table
+                    return None
+                if not isinstance(entity, Column) or not self._survives(entity.ref):
+                    continue
+                referencing = self.renames.new_ref(entity.ref) or entity.ref
+                if self.mutations.get(referencing) != NodeMutationType.UNCHANGED:
+                    return None
+                column = cast(Column, self.new.get_entity(referencing))
+                references.extend(
+                    (column, constraint)
+                    for constraint in column.parsed_definition.constraints
+                    if constraint.kind == "references"
+                    and (column, constraint) not in references
+                )
+
+        return OnlineRewrite(
+            old=old,
+            new=new,
+            key=keys[0],
+            old_key=old_key,
+            copied=[
+                (column, old_column)
+                for column in columns
+                if isinstance(
+                    old_column := self.old.get_entity(
+                        self._source_ref(column.ref), allow_none=True
+                    ),
+                    Column,
+                )
+            ],
+            indexes=indexes,
+            triggers=triggers,
+            functions=functions,
+            references=references,
+            chunk_size=self.online_chunk_size,
+        )
+
+    def _fill_statements(self, operations: list[MigrationOperation]):
+        """
+        Renders the statements of the operations and collects the plan report.
+
+        Columns filled by a new backfill are added without NOT NULL
+            and their constraints, which follow the backfill as a separate ALTER.
+        An online rewrite renders as the ALTER of its table.
+        Foreign keys and checks added to existing tables are added as NOT VALID
+            and validated at the end of the plan, unless `defer_validation` is off.
+        The ALTER TABLE statements are merged per table, unless `merge_alters` is off.
+        The stale materialized views are refreshed last, if `refresh_views` is on.
+        """
+        self.report = PlanReport()
+        created = {
+            operation.entity.ref
+            for operation in operations
+            if operation.mutation == NodeMutationType.CREATE
+        }
+        dropped = {
+            operation.entity.ref
+            for operation in operations
+            if operation.mutation == NodeMutationType.DROP
+        }
+        backfilled = {
+            operation.entity.column_ref
+            for operation in operations
+            if operation.mutation == NodeMutationType.CREATE
+            and isinstance(operation.entity, Backfill)
+        }
+        # column ref -> statements left for after the backfill
+        tightening: dict[str, list[str]] = {}
+        # ref -> statements validating the constraints added as NOT VALID
+        validating: dict[str, list[str]] = {}
+        validate = not self.defer_validation
+        filled: list[MigrationOperation] = []
+        # ref of another created entity an operation must follow, by operation index
+        after: dict[int, str] = {}
+        for operation in operations:
+            entity = operation.entity
+            match operation.mutation:
+                case NodeMutationType.CREATE:
+                    # columns are part of CREATE TABLE
+                    if isinstance(entity, Column) and entity.table_ref in created:
+                        pass
+                    elif isinstance(entity, Column):
+                        if entity.ref in backfilled:
+                            operation.statements = entity.create_sql(tighten=False)
+                            tightening[entity.ref] = entity.tighten_sql(validate)
+                        else:
+                            operation.statements = entity.create_sql(validate=validate)
+                        if not validate:
+                            validating[entity.ref] = entity.validate_sql()
+                    elif entity.ref in self.view_swaps:
+                        operation.statements = cast(MaterializedView, entity).swap_sql(
+                            self.view_swaps[entity.ref]
+                        )
+                    elif isinstance(entity, PartitionSet):
+                        operation.statements = entity.create_sql(
+                            attach=entity.table_ref not in created
+                        )
+                    else:
+                        operation.statements = entity.create_sql()
+                case NodeMutationType.DROP:
+                    # partitions are dropped along with their table
+                    if not (
+                        isinstance(entity, (Column, PartitionSet))
+                        and entity.table_ref in dropped
+                    ):
+                        operation.statements = entity.drop_sql()
+                case NodeMutationType.ALTER if entity.ref in self.online_rewrites:
+                    operation.statements = self.online_rewrites[entity.ref].sql()
+                case NodeMutationType.ALTER:
+                    comparator = self.new_comparators[entity.ref]
+                    if isinstance(comparator, ColumnComparator):
+                        if entity.ref in backfilled:
+                            operation.statements = comparator.alter_sql(tighten=False)
+                            tightening[entity.ref] = comparator.tighten_sql(validate)
+                        else:
+                            operation.statements = comparator.alter_sql(
+                                validate=validate
+                            )
+                    elif isinstance(comparator, TableComparator):
+                        operation.statements = comparator.alter_sql(validate)
+                    else:
+                        operation.statements = comparator.alter_sql()
+                    if not validate and isinstance(
+                        comparator, (ColumnComparator, TableComparator)
+                    ):
+                        validating[entity.ref] = comparator.validate_sql()
+            filled.append(operation)
+
+            if (
+                isinstance(entity, Backfill)
+                and operation.mutation == NodeMutationType.CREATE
+                and entity.column_ref in tightening
+            ):
+                after[len(filled)] = entity.ref
+                filled.append(
+                    MigrationOperation(
+                        mutation=NodeMutationType.ALTER,
+                        entity=self.new.get_entity(entity.column_ref),
+                        statements=tightening.pop(entity.column_ref),
+                    )
+                )
+
+        # the validations only take a lock that doesn't block writes,
+        # so they follow everything else as separate steps
+        for ref, statements in validating.items():
+            if not statements:
+                continue
+            after[len(filled)] = ref
+            filled.append(
+                MigrationOperation(
+                    mutation=NodeMutationType.ALTER,
+                    entity=self.new.get_entity(ref),
+                    statements=statements,
+                )
+            )
+        if self.refresh_views:
+            filled.extend(self._view_refreshes(filled))
+        merged = self._merge_alters(filled) if self.merge_alters else {}
+        merged_indexes = {index for indexes in merged.values() for index in indexes}
+
+        # the step of the dependency chain each operation finishes at,
+        # keyed by (is a drop, ref)
+        levels: dict[tuple[bool, str], int] = {}
+        for index, operation in enumerate(filled):
+            if index in merged_indexes:
+                continue
+            self._add_to_report(
+                operation,
+                levels,
+                after=after.get(index),
+                merged=[
+                    (filled[member], after.get(member))
+                    for member in merged.get(index, ())
+                ],
+            )
+        operations[:] = filled
+
+    def _view_refreshes(
+        self, operations: list[MigrationOperation]
+    ) -> list[MigrationOperation]:
+        """
+        Returns the refreshes of the kept materialized views reading a table
+            whose rows the operations change, or another such view.
+        """
+        stale: set[str] = set()
+        for operation in operations:
+            entity = operation.entity
+            if isinstance(entity, Backfill):
+                if operation.mutation == NodeMutationType.CREATE:
+                    stale.add(entity.table_ref)
+                    if entity.column_ref is not None:
+                        stale.add(entity.column_ref)
+            elif operation.mutation != NodeMutationType.ALTER:
+                continue
+            elif isinstance(entity, Column):
+                stale.update((entity.ref, entity.table_ref))
+            elif isinstance(entity, Table):
+                stale.add(entity.ref)
+        refreshes = []
+        for node in self.new.iter_topological(deterministic=True):
+            view = node.entity
+            if (
+                isinstance(view, MaterializedView)
+                and self.mutations.get(view.ref) == NodeMutationType.UNCHANGED
+                and not stale.isdisjoint(view.dependency_refs)
+            ):
+                stale.add(view.ref)
+                refreshes.append(
+                    MigrationOperation(
+                        mutation=NodeMutationType.ALTER,
+                        entity=view,
+                        statements=view.refresh_sql(),
+                    )
+                )
+        return refreshes
+
+    def _merge_alters(
+        self, operations: list[MigrationOperation]
+    ) -> dict[int, list[int]]:
+        """
+        Merges the actions of ALTER TABLE statements on the same table
+            into the first of them, e.g. the changes of several columns,
+            or a column added and then altered.
+        The operations merged into another one are left without statements.
+
+        An operation is only merged into an earlier one
+            if no operation in between depends on it or is depended on by it,
+            and no statement in between touches the table.
+        Validations are only merged with each other, so they still don't block writes.
+
+        Returns:
+            The index of each operation others were merged into -> their indexes
+        """
+        # ALTER TABLE prefix -> the operation its actions are merged into
+        groups: dict[str, _AlterGroup] = {}
+        merged: list[_AlterGroup] = []
+        # ref -> position of the last operation of the entity
+        positions: dict[str, int] = {}
+        # ref -> position of the last operation of an entity depending on it
+        dependant_positions: dict[str, int] = {}
+        for index, operation in enumerate(operations):
+            entity = operation.entity
+            dependency_refs = entity.dependency_refs
+            position = index
+            actions = _alter_table_actions(operation.statements)
+            if actions is None:
+                for statement in operation.statements:
+                    if (split := _split_alter_table(statement)) is not None:
+                        groups.pop(split[0], None)
+            else:
+                prefix, validates, table_actions = actions
+                group = groups.get(prefix)
+                if (
+                    group is not None
+                    and group.validates == validates
+                    and positions.get(entity.ref, -1) <= group.position
+                    and dependant_positions.get(entity.ref, -1) <= group.position
+                    and all(
+                        positions.get(ref, -1) <= group.position
+                        for ref in dependency_refs
+                    )
+                ):
+                    group.actions.extend(table_actions)
+                    group.members.append(index)
+                    operation.statements = []
+                    position = group.position
+                else:
+                    group = groups[prefix] = _AlterGroup(
+                        operation=operation,
+                        prefix=prefix,
+                        position=index,
+                        validates=validates,
+                        actions=list(table_actions),
+                    )
+                    merged.append(group)
+            positions[entity.ref] = max(positions.get(entity.ref, -1), position)
+            for ref in dependency_refs:
+                dependant_positions[ref] = max(
+                    dependant_positions.get(ref, -1), position
+                )
+        for group in merged:
+            group.operation.statements = [f"{group.prefix} {', '.join(group.actions)}"]
+        return {group.position: group.members for group in merged if group.members}
+
+    def _add_to_report(
+        self,
+        operation: MigrationOperation,
+        levels: dict[tuple[bool, str], int],
+        after: str | None = None,
+        merged: Iterable[tuple[MigrationOperation, str | None]] = (),
+    ):
+        """
+        Computes the step of the dependency chain the operation runs at
+            and adds the operation to the report.
+
+        Args:
+            operation: The operation, with its statements
+            levels: The steps of the operations added so far
+            after: Ref of another created entity the operation must follow
+            merged: The operations merged into this one, with their `after`,
+                which run at the same step
+        """
+        members = [(operation, after), *merged]
+        level = max(
+            (
+                levels.get(key, 0)
+                for member, member_after in members
+                for key in self._previous_levels(member, member_after)
+            ),
+            default=0,
+        )
+        if operation.statements:
+            level += 1
+        for member, _ in members:
+            levels[member.mutation == NodeMutationType.DROP, member.entity.ref] = level
+            self._count_operation(member)
+        self.report.add_statements(operation.statements, level)
+
+    def _previous_levels(
+        self, operation: MigrationOperation, after: str | None
+    ) -> list[tuple[bool, str]]:
+        """
+        Returns the keys of the operations this one must follow.
+        """
+        entity = operation.entity
+        if operation.mutation == NodeMutationType.DROP:
+            # dependants are dropped first
+            return [
+                (True, dependant.entity.ref)
+                for dependant in self.old.get_dependants(entity.ref)
+            ]
+        previous = [
+            (False, dependency.entity.ref)
+            for dependency in cast(
+                EntityNode, self.new.get_node(entity.ref)
+            ).dependencies
+        ]
+        previous.append((True, self._source_ref(entity.ref)))
+        if after is not None:
+            previous.append((False, after))
+        return previous
+
+    def _count_operation(self, operation: MigrationOperation):
+        entity_type = type(operation.entity).__name__
+        if operation.reason is None:
+            self.report.add_operation(operation.mutation, entity_type)
+        elif operation.mutation != NodeMutationType.DROP:
+            # both halves of a RECREATE count as one operation
+            self.report.add_operation(
+                NodeMutationType.RECREATE,
+                entity_type,
+                forced=operation.reason.forced_by is not None,
+            )
+
+    def render(
+        self,
+        operations: list[MigrationOperation],
+        rebinder: SchemaRebinder | None = None,
+    ) -> str:
+        """
+        Renders the operations into the migration text.
+
+        Args:
+            operations: The operations returned by `plan`
+            rebinder: Renders a plan computed for a `SchemaTemplate`
+                for one of its copies, so the diff is computed only once.
+                The search path is set to the copy, so unqualified names
+                (e.g. in view queries and checks) resolve in it.
+        """
+        migration = ""
+        for operation in operations:
+            for statement in operation.statements:
+                if rebinder is not None:
+                    statement = rebinder.sql(statement)
+                migration += f"{statement};\n"
+        if rebinder is not None and migration:
+            migration = (
+                f"SET search_path TO {rebinder.search_path};\n"
+                f"{migration}RESET search_path;\n"
+            )
+        return migration
+
+    @property
+    def planner_options(self) -> dict:
+        """
+        Everything besides the two snapshots that affects the rendered plan.
+        """
+        return {
+            "format": PLAN_FORMAT_VERSION,
+            "comparators": {
+                entity_type.__name__: comparator_type.__name__
+                for entity_type, comparator_type in self.comparator_types.items()
+            },
+            "targets": sorted(self.targets) if self.targets is not None else None,
+            "renames": self.rename_overrides,
+            "detect_renames": self.detect_renames,
+            "online_rewrite": sorted(self.online_rewrite),
+            "online_chunk_size": self.online_chunk_size,
+            "defer_validation": self.defer_validation,
+            "merge_alters": self.merge_alters,
+            "refresh_views": self.refresh_views,
+        }
+
+    def render_plan(
+        self,
+        cache: PlanCache | None = None,
+        cache_mode: PlanCacheMode = PlanCacheMode.USE,
+        rebinder: SchemaRebinder | None = None,
+    ) -> str:
+        """
+        Plans and renders the migration, going through the plan cache if provided.
+
+        A cache hit returns the rendered plan without building any comparator.
+
+        Raises:
+            PlanCacheMismatchError: In VERIFY mode, if the cached plan differs.
+        """
+        if cache is None or cache_mode == PlanCacheMode.BYPASS:
+            return self.render(self.plan(), rebinder)
+
+        options = self.planner_options
+        if rebinder is not None:
+            options["rebind"] = [rebinder.template_schema.ref, rebinder.schema.ref]
+        key = cache.key(self.old.content_hash(), self.new.content_hash(), options)
+        cached = cache.get(key)
+        if cached is not None and cache_mode == PlanCacheMode.USE:
+            return cached
+
+        migration = self.render(self.plan(), rebinder)
+        if cached is not None and cached != migration:
+            raise PlanCacheMismatchError(key)
+        if cached is None:
+            cache.put(key, migration)
+        return migration
+
+    def test(self):
+        print(self.render_plan())
 
 
 """
@@ -95,6 +1078,7 @@ for node in dependency_order:
     node.intrinsic = compute_change(old, new)  # what changed in THIS node
     
     # propagate: if any is DROP/RECREATE, must RECREATE
+    # (only dependencies the node is bound to, see Comparator.binds)
     if any(dep.final in (DROP, RECREATE) for dep in node.dependencies):
         if node.intrinsic in (IDLE, ALTER):
             node.final = RECREATE  # forced by parent
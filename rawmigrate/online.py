@@ -0,0 +1,217 @@
+from dataclasses import dataclass, field
+
+from rawmigrate.chunks import ChunkedLoop
+from rawmigrate.entities.function import Function
+from rawmigrate.entities.index import Index
+from rawmigrate.entities.table import Column, ColumnConstraint, Table
+from rawmigrate.entities.trigger import Trigger
+
+INTEGER_TYPES = frozenset(
+    {"smallint", "integer", "int", "bigint", "int2", "int4", "int8"}
+)
+SERIAL_TYPES = frozenset(
+    {"smallserial", "serial", "bigserial", "serial2", "serial4", "serial8"}
+)
+
+
+def is_integer_key(column: Column) -> bool:
+    return column.parsed_definition.type.lower() in INTEGER_TYPES
+
+
+def generates_values(column: Column) -> bool:
+    """
+    Whether the column takes its values from a sequence or an expression,
+        which a copy of the table can't carry over.
+    """
+    definition = column.parsed_definition
+    return (
+        definition.type.lower() in SERIAL_TYPES
+        or "nextval" in (definition.default or "").lower()
+        or any(constraint.kind == "generated" for constraint in definition.constraints)
+    )
+
+
+@dataclass(slots=True, kw_only=True)
+class OnlineRewrite:
+    """
+    Rewrites a table without locking it for the whole rewrite.
+
+    A shadow table with the new definition is kept in sync with the old one
+        by a trigger while the existing rows are copied in key-range chunks,
+        then the indexes are built on it and the two are swapped under a short lock.
+    """
+
+    old: Table
+    new: Table
+    # the integer primary key the copy is chunked by
+    key: Column
+    old_key: Column
+    # (new column, old column) of the copied values
+    copied: list[tuple[Column, Column]]
+    indexes: list[Index] = field(default_factory=list)
+    triggers: list[Trigger] = field(default_factory=list)
+    # (new function, old function) of functions mentioning the table in their body,
+    # rebuilt once the shadow takes the name of the table
+    functions: list[tuple[Function, Function]] = field(default_factory=list)
+    # unchanged foreign keys of other tables referencing the table
+    references: list[tuple[Column, ColumnConstraint]] = field(default_factory=list)
+    chunk_size: int = 10_000
+    throttle: float = 0.0
+
+    def _identifier(self, name: str) -> str:
+        return self.new.syntax.format_sql_identifier([name])
+
+    def _qualified(self, name: str) -> str:
+        return self.new.qualify(self._identifier(name))
+
+    @property
+    def shadow_sql(self) -> str:
+        return self._qualified(f"{self.new._name}__shadow")
+
+    @property
+    def sync_function_sql(self) -> str:
+        return self._qualified(f"{self.new._name}__sync")
+
+    def _shadow_index_name(self, index: Index) -> str:
+        return f"{index.name}__shadow"
+
+    @property
+    def loop(self) -> ChunkedLoop:
+        new_columns = ", ".join(new.sql for new, _ in self.copied)
+        old_columns = ", ".join(old.sql for _, old in self.copied)
+        old_key = self.old_key.sql
+
+        def chunk_sql(start: str, end: str) -> str:
+            return (
+                f"INSERT INTO {self.shadow_sql} ({new_columns})"
+                f" SELECT {old_columns} FROM {self.old.qualified_sql}"
+                f" WHERE {old_key} >= {start} AND {old_key} < {end}"
+                " FOR SHARE ON CONFLICT DO NOTHING"
+            )
+
+        return ChunkedLoop(
+            name=f"{self.new.ref}|rewrite.{self.new.content_fingerprint()[:12]}",
+            bounds_sql=f"SELECT min({old_key}), max({old_key}) FROM {self.old.qualified_sql}",
+            chunk_sql=chunk_sql,
+            chunk_size=self.chunk_size,
+            throttle=self.throttle,
+        )
+
+    def sync_sql(self) -> list[str]:
+        """
+        Mirrors every change of the old table onto the shadow,
+            the copy skips the rows the trigger already wrote.
+        """
+        new_columns = ", ".join(new.sql for new, _ in self.copied)
+        values = ", ".join(f"NEW.{old.sql}" for _, old in self.copied)
+        body = f"""
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {self.shadow_sql} WHERE {self.key.sql} = OLD.{self.old_key.sql};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {self.shadow_sql} ({new_columns}) VALUES ({values});
+    END IF;
+    RETURN NULL;
+END;
+"""
+        return [
+            (
+                f"CREATE FUNCTION {self.sync_function_sql}() RETURNS trigger"
+                f" LANGUAGE plpgsql AS {self.new.syntax.format_dollar_quoted(body)}"
+            ),
+            (
+                f"CREATE TRIGGER {self._identifier(f'{self.new._name}__sync')}"
+                f" AFTER INSERT OR UPDATE OR DELETE ON {self.old.qualified_sql}"
+                f" FOR EACH ROW EXECUTE FUNCTION {self.sync_function_sql}()"
+            ),
+        ]
+
+    def _renamed_constraints(self) -> list[tuple[str, str]]:
+        """
+        Returns (shadow name, final name) of the constraints
+            Postgres names after the table.
+        """
+        syntax = self.new.syntax
+        return [
+            (
+                constraint.name_sql(syntax, f"{self.new._name}__shadow", column.name),
+                constraint.name_sql(syntax, self.new._name, column.name),
+            )
+            for _, column in self.new.c
+            for constraint in column.parsed_definition.constraints
+            if constraint.table_sql(column.sql) is not None
+        ]
+
+    def swap_sql(self) -> list[str]:
+        """
+        Swaps the tables in one short transaction.
+        The old table is renamed away first, so functions bound to it
+            can be rebuilt before it's dropped.
+        """
+        statements = [
+            "BEGIN",
+            f"LOCK TABLE {self.old.qualified_sql} IN ACCESS EXCLUSIVE MODE",
+        ]
+        syntax = self.new.syntax
+        for column, constraint in self.references:
+            name = constraint.name_sql(syntax, column.table._name, column.name)
+            statements.append(column.alter_table_sql(f"DROP CONSTRAINT {name}"))
+        for trigger in self.triggers:
+            statements.extend(trigger.create_sql(on=self.shadow_sql))
+        statements += [
+            (
+                f"ALTER TABLE {self.old.qualified_sql}"
+                f" RENAME TO {self._identifier(f'{self.old._name}__old')}"
+            ),
+            f"ALTER TABLE {self.shadow_sql} RENAME TO {self.new.sql}",
+        ]
+        for function, old_function in self.functions:
+            if old_function.name != function.name:
+                statements.extend(function.rename_sql(old_function))
+            statements.extend(function.create_sql(replace=True))
+        statements += [
+            f"DROP TABLE {self.old.qualify(self._identifier(f'{self.old._name}__old'))}",
+            f"DROP FUNCTION {self.sync_function_sql}()",
+        ]
+        statements.extend(
+            f"ALTER INDEX {self._qualified(self._shadow_index_name(index))}"
+            f" RENAME TO {index.sql}"
+            for index in self.indexes
+        )
+        statements.extend(
+            f"ALTER TABLE {self.new.qualified_sql} RENAME CONSTRAINT {shadow_name} TO {name}"
+            for shadow_name, name in self._renamed_constraints()
+        )
+        statements.extend(
+            column.alter_table_sql(f"{column.add_constraint_sql(constraint)} NOT VALID")
+            for column, constraint in self.references
+        )
+        statements.append("COMMIT")
+        statements.extend(
+            column.alter_table_sql(
+                "VALIDATE CONSTRAINT "
+                + constraint.name_sql(syntax, column.table._name, column.name)
+            )
+            for column, constraint in self.references
+        )
+        return statements
+
+    def sql(self) -> list[str]:
+        """
+        Returns the statements of the whole rewrite,
+            which must run outside of a transaction block.
+        """
+        statements = self.new.create_sql(name=self.shadow_sql)
+        statements.extend(self.sync_sql())
+        statements.append(self.loop.do_sql(self.new.syntax))
+        for index in self.indexes:
+            statements.extend(
+                index.create_sql(
+                    name=self._identifier(self._shadow_index_name(index)),
+                    on=self.shadow_sql,
+                    concurrently=True,
+                )
+            )
+        statements.extend(self.swap_sql())
+        return statements
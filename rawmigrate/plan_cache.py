@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import tempfile
+from enum import StrEnum
+from pathlib import Path
+
+
+class PlanCacheMode(StrEnum):
+    """
+    Specifies how the plan cache is used.
+    """
+
+    USE = "use"  # return the cached plan if present, store it otherwise
+    BYPASS = "bypass"  # neither read nor write the cache
+    VERIFY = "verify"  # plan anyway and fail if the cached plan differs
+
+
+class PlanCacheMismatchError(Exception):
+    def __init__(self, key: str):
+        super().__init__(f"Cached plan {key} differs from the freshly computed one")
+        self.key = key
+
+
+class PlanCache:
+    """
+    Content-addressed on-disk cache of rendered plans.
+
+    Plans are keyed by the content hashes of both snapshots and the planner options,
+        so a cached plan is valid for as long as the file exists.
+    The least recently used plans are evicted once the cache grows over `max_bytes`.
+    """
+
+    suffix = ".plan"
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int = 64 * 1024**2):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(old_hash: str, new_hash: str, options: dict) -> str:
+        digest = hashlib.sha256()
+        digest.update(old_hash.encode())
+        digest.update(b"\0")
+        digest.update(new_hash.encode())
+        digest.update(b"\0")
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            plan = path.read_text()
+        except FileNotFoundError:
+            return None
+        # the modification time is the LRU clock
+        os.utime(path)
+        return plan
+
+    def put(self, key: str, plan: str):
+        # write-then-rename, so concurrent readers never see a partial plan
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(plan)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
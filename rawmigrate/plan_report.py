@@ -0,0 +1,98 @@
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+
+from rawmigrate.comparator import NodeMutationType
+
+
+@dataclass(slots=True, kw_only=True)
+class PlanReport:
+    """
+    Summary of a planned migration, collected while the plan is built.
+
+    Both halves of a RECREATE count as one RECREATE operation.
+    """
+
+    # (mutation, entity type) -> number of operations
+    operations: Counter[tuple[NodeMutationType, str]] = field(default_factory=Counter)
+    # the longest chain of statements that must run one after another
+    depth: int = 0
+    # the most statements that could run side by side at one step of that chain
+    parallel_width: int = 0
+    direct_recreates: int = 0
+    forced_recreates: int = 0
+    # size of the rendered migration
+    sql_bytes: int = 0
+    _level_widths: Counter[int] = field(default_factory=Counter, repr=False)
+
+    def add_operation(
+        self, mutation: NodeMutationType, entity_type: str, forced: bool = False
+    ):
+        """
+        Counts one operation of the plan.
+
+        Args:
+            mutation: The mutation, RECREATE for the CREATE half of a RECREATE
+            entity_type: The entity type name
+            forced: For a RECREATE, whether it was forced by a dependency
+        """
+        self.operations[mutation, entity_type] += 1
+        if mutation == NodeMutationType.RECREATE:
+            if forced:
+                self.forced_recreates += 1
+            else:
+                self.direct_recreates += 1
+
+    def add_statements(self, statements: list[str], level: int):
+        """
+        Records the rendered statements of one operation.
+
+        Args:
+            statements: The statements
+            level: The step of the dependency chain the statements run at
+        """
+        if not statements:
+            return
+        self.sql_bytes += sum(
+            len(f"{statement};\n".encode()) for statement in statements
+        )
+        self._level_widths[level] += 1
+        self.depth = max(self.depth, level)
+        self.parallel_width = max(self.parallel_width, self._level_widths[level])
+
+    def to_dict(self) -> dict:
+        return {
+            "operations": [
+                {"mutation": mutation, "entity": entity_type, "count": count}
+                for (mutation, entity_type), count in sorted(self.operations.items())
+            ],
+            "depth": self.depth,
+            "parallel_width": self.parallel_width,
+            "recreates": {
+                "direct": self.direct_recreates,
+                "forced": self.forced_recreates,
+            },
+            "sql_bytes": self.sql_bytes,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_table(self) -> str:
+        rows = [("MUTATION", "ENTITY", "COUNT")] + [
+            (mutation, entity_type, str(count))
+            for (mutation, entity_type), count in sorted(self.operations.items())
+        ]
+        widths = [max(len(row[column]) for row in rows) for column in range(2)]
+        lines = [
+            f"{mutation:<{widths[0]}}  {entity_type:<{widths[1]}}  {count:>5}"
+            for mutation, entity_type, count in rows
+        ]
+        lines += [
+            "",
+            f"recreates: {self.direct_recreates} direct, {self.forced_recreates} forced",
+            f"longest dependency chain: {self.depth}",
+            f"widest parallel step: {self.parallel_width}",
+            f"SQL bytes: {self.sql_bytes}",
+        ]
+        return "\n".join(lines)
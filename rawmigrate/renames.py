@@ -0,0 +1,327 @@
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+
+from rawmigrate.core import SqlFormatOption, SqlIdentifier, SqlText
+from rawmigrate.entity import DBEntity
+from rawmigrate.entity_manager import EntityRegistry
+
+
+class Renames:
+    """
+    Pairs of old and new entities that are the same database object under another name.
+    """
+
+    def __init__(self, registry: EntityRegistry | None = None):
+        """
+        Args:
+            registry: The old registry, to tell apart entities sharing an identifier
+                in texts that carry no positions, e.g. imported ones
+        """
+        self._registry = registry
+        self._new_refs: dict[str, str] = {}
+        self._old_refs: dict[str, str] = {}
+        self._identifiers: dict[str, tuple[str, str]] = {}
+
+    def add(self, old: DBEntity, new: DBEntity):
+        self._new_refs[old.ref] = new.ref
+        self._old_refs[new.ref] = old.ref
+        # entities nested under a renamed one aren't always named in SQL,
+        # e.g. backfills and partition sets
+        if isinstance(old, SqlIdentifier):
+            self._identifiers[old.ref] = (
+                format(old, SqlFormatOption.SQL_TEXT),
+                format(new, SqlFormatOption.SQL_TEXT),
+            )
+
+    def new_ref(self, old_ref: str) -> str | None:
+        return self._new_refs.get(old_ref)
+
+    def old_ref(self, new_ref: str) -> str | None:
+        return self._old_refs.get(new_ref)
+
+    def text(self, text: SqlText, scope: Iterable[str] = ()) -> SqlText:
+        """
+        Returns the old text as it reads after the renames.
+
+        Args:
+            text: The text of an old entity
+            scope: Refs the text may mention, used when the text carries no references,
+                e.g. the dependencies of an imported entity
+        """
+        return self._rewrite(
+            text,
+            [ref for ref in text.references or scope if ref in self._identifiers],
+            self._identifiers,
+            self._new_refs,
+            scope,
+        )
+
+    def original(self, text: SqlText) -> SqlText:
+        """
+        Returns the new text as it read before the renames.
+        Only the identifiers whose positions are known are swapped back,
+            so that an old text without positions (e.g. imported) can be compared.
+
+        Args:
+            text: The text of a new entity
+        """
+        identifiers = {
+            new_ref: (new_sql, old_sql)
+            for old_ref, (old_sql, new_sql) in self._identifiers.items()
+            if (new_ref := self._new_refs[old_ref]) in text.references
+        }
+        return self._rewrite(
+            text, list(identifiers), identifiers, self._old_refs, positioned=True
+        )
+
+    def _rewrite(
+        self,
+        text: SqlText,
+        renamed: list[str],
+        identifiers: Mapping[str, tuple[str, str]],
+        refs: Mapping[str, str],
+        scope: Iterable[str] = (),
+        positioned: bool = False,
+    ) -> SqlText:
+        """
+        Swaps the identifiers of the renamed refs, only where they are tagged.
+
+        Args:
+            renamed: The refs to swap
+            identifiers: Ref -> (identifier SQL in the text, identifier SQL to write)
+            refs: Ref -> ref of the swapped identifier
+            positioned: Whether to leave texts without positions alone
+        """
+        if not renamed:
+            return text
+        if text.template is not None and text.template.slot_refs.issuperset(renamed):
+            return text.with_identifiers(
+                {ref: identifiers[ref][1] for ref in renamed},
+                {ref: refs[ref] for ref in renamed},
+            )
+        sql = text.sql
+        tag_positions = text.tag_positions
+        if tag_positions:
+            spans = self._tagged_spans(sql, tag_positions, renamed, identifiers)
+        elif positioned:
+            return text
+        else:
+            spans = self._plain_spans(text, renamed, identifiers, scope)
+        parts = []
+        positions = []
+        tags = iter(tag_positions)
+        tag = next(tags, None)
+        start = 0
+        shift = 0
+        for span_start, span_end, new_sql in spans:
+            # the tag of a swapped identifier ends the span, so it moves along
+            while tag is not None and tag[1] < span_end:
+                positions.append((tag[0], tag[1] + shift))
+                tag = next(tags, None)
+            parts.append(sql[start:span_start])
+            parts.append(new_sql)
+            start = span_end
+            shift += len(new_sql) - (span_end - span_start)
+        while tag is not None:
+            positions.append((tag[0], tag[1] + shift))
+            tag = next(tags, None)
+        parts.append(sql[start:])
+        return SqlText.from_parts(
+            text.syntax,
+            "".join(parts),
+            {refs.get(ref, ref) for ref in text.references},
+            tuple((refs.get(ref, ref), end) for ref, end in positions),
+        )
+
+    @staticmethod
+    def _tagged_spans(
+        sql: str,
+        tag_positions: tuple[tuple[str, int], ...],
+        renamed: list[str],
+        identifiers: Mapping[str, tuple[str, str]],
+    ) -> list[tuple[int, int, str]]:
+        """
+        Returns (start, end, new identifier) of the renamed identifiers,
+            found where their meta tags are.
+        """
+        spans = {}
+        for ref, end in tag_positions:
+            if ref not in renamed or end in spans:
+                continue
+            old_sql, new_sql = identifiers[ref]
+            # tags formatted after a whole text rather than an identifier
+            # don't pin one and are left alone
+            if sql.endswith(old_sql, 0, end):
+                spans[end] = (end - len(old_sql), end, new_sql)
+        return sorted(spans.values())
+
+    def _plain_spans(
+        self,
+        text: SqlText,
+        renamed: list[str],
+        identifiers: Mapping[str, tuple[str, str]],
+        scope: Iterable[str],
+    ) -> list[tuple[int, int, str]]:
+        """
+        Returns (start, end, new identifier) of the renamed identifiers
+            in an old text without positions, by their SQL.
+        Identifiers shared with another entity the text mentions
+            can't be told apart, so they're left alone.
+        """
+        sql = text.sql
+        mentioned = text.references or set(scope)
+        spans = []
+        for ref in renamed:
+            old_sql, new_sql = identifiers[ref]
+            if any(
+                self._identifier_sql(other) == old_sql
+                for other in mentioned
+                if other != ref
+            ):
+                continue
+            start = sql.find(old_sql)
+            while start != -1:
+                spans.append((start, start + len(old_sql), new_sql))
+                start = sql.find(old_sql, start + len(old_sql))
+        # identifiers overlapping an earlier one are left to it,
+        # e.g. a column named like a table
+        spans.sort()
+        kept: list[tuple[int, int, str]] = []
+        for span in spans:
+            if not kept or span[0] >= kept[-1][1]:
+                kept.append(span)
+        return kept
+
+    def _identifier_sql(self, ref: str) -> str | None:
+        """
+        Returns the identifier SQL of an old entity, None if it has none.
+        """
+        if ref in self._identifiers:
+            return self._identifiers[ref][0]
+        entity = (
+            self._registry.get_entity(ref, allow_none=True) if self._registry else None
+        )
+        if isinstance(entity, SqlIdentifier):
+            return format(entity, SqlFormatOption.SQL_TEXT)
+        return None
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return iter(self._new_refs.items())
+
+    def __len__(self) -> int:
+        return len(self._new_refs)
+
+
+def match_renames(
+    old: EntityRegistry,
+    new: EntityRegistry,
+    dropped: Iterable[str],
+    created: Iterable[str],
+    overrides: Mapping[str, str | None] | None = None,
+    detect: bool = True,
+) -> Renames:
+    """
+    Pairs dropped entities with created entities of the same type and content.
+
+    Only unambiguous matches are paired. Entities nested under a renamed one
+        (e.g. columns of a renamed table) are paired by their ref.
+
+    Args:
+        old: The old registry
+        new: The new registry
+        dropped: Refs of the old registry missing in the new one
+        created: Refs of the new registry missing in the old one
+        overrides: Old ref -> new ref to confirm a pairing,
+            or old ref -> None to never pair the old entity
+        detect: Whether to look for renames by content fingerprint,
+            besides the confirmed ones
+    """
+    overrides = overrides or {}
+    renames = Renames(old)
+    created = set(created)
+    dropped = {ref for ref in dropped if ref not in overrides}
+
+    confirmed: list[tuple[str, str]] = []
+    for old_ref, new_ref in overrides.items():
+        if new_ref is None:
+            continue
+        if old_ref in new or new_ref in old:
+            raise ValueError(
+                f"Can't rename {old_ref} to {new_ref}, one of them exists in both registries"
+            )
+        confirmed.append((old_ref, new_ref))
+    _add_renames(old, new, renames, confirmed, overrides)
+
+    while detect:
+        # entities mentioning renamed ones only match once the renames are applied,
+        # so repeat until nothing new is paired
+        created -= set(renames._old_refs)
+        dropped -= set(renames._new_refs)
+        detected = _detect_renames(old, new, renames, dropped, created)
+        if not detected:
+            break
+        _add_renames(old, new, renames, detected, overrides)
+
+    return renames
+
+
+def _detect_renames(
+    old: EntityRegistry,
+    new: EntityRegistry,
+    renames: Renames,
+    dropped: set[str],
+    created: set[str],
+) -> list[tuple[str, str]]:
+    created_by_fingerprint: dict[tuple[type, str], list[str]] = {}
+    for ref in created:
+        entity = new.get_entity(ref)
+        if (fingerprint := entity.content_fingerprint()) is not None:
+            created_by_fingerprint.setdefault((type(entity), fingerprint), []).append(
+                ref
+            )
+
+    dropped_by_fingerprint: dict[tuple[type, str], list[str]] = {}
+    for ref in dropped:
+        entity = old.get_entity(ref)
+        if (fingerprint := entity.content_fingerprint(renames)) is not None:
+            dropped_by_fingerprint.setdefault((type(entity), fingerprint), []).append(
+                ref
+            )
+
+    return [
+        (old_refs[0], new_refs[0])
+        for key, old_refs in dropped_by_fingerprint.items()
+        if len(old_refs) == 1
+        and len(new_refs := created_by_fingerprint.get(key, [])) == 1
+    ]
+
+
+def _add_renames(
+    old: EntityRegistry,
+    new: EntityRegistry,
+    renames: Renames,
+    pairs: list[tuple[str, str]],
+    overrides: Mapping[str, str | None],
+):
+    # shortest refs first, so the nested ones are paired after their parents
+    queue = deque(sorted(pairs, key=lambda pair: len(pair[0])))
+    while queue:
+        old_ref, new_ref = queue.popleft()
+        if renames.new_ref(old_ref) is not None:
+            continue
+        old_entity = old.get_entity(old_ref)
+        new_entity = new.get_entity(new_ref)
+        if type(old_entity) is not type(new_entity):
+            raise ValueError(
+                f"Can't rename {old_ref} to {new_ref}, the entity types differ"
+            )
+        renames.add(old_entity, new_entity)
+
+        prefix = f"{old_ref}|"
+        for dependant in old.get_dependants(old_ref):
+            nested_ref = dependant.entity.ref
+            if not nested_ref.startswith(prefix) or nested_ref in overrides:
+                continue
+            nested_new_ref = f"{new_ref}|{nested_ref[len(prefix) :]}"
+            if nested_new_ref in new and nested_new_ref not in old:
+                queue.append((nested_ref, nested_new_ref))
@@ -0,0 +1,135 @@
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from rawmigrate.core import DB, SqlText
+from rawmigrate.entities.schema import Schema
+from rawmigrate.entity_manager import EntityManager, EntityRegistry
+
+if TYPE_CHECKING:
+    from rawmigrate.entity import DBEntity
+
+
+def _search_path(schema: Schema) -> str:
+    return f"{schema.sql}, public"
+
+
+class SchemaRebinder:
+    """
+    Maps refs and SQL of entities declared under a template schema onto
+    another schema.
+
+    Refs nested under the template schema ref get the prefix swapped.
+    Schema-less refs (indexes, triggers) are nested under the target schema ref,
+    so several copies of the template can live in one registry.
+    Refs of other schemas are left untouched.
+    """
+
+    def __init__(self, template_schema: Schema, schema: Schema):
+        self.template_schema = template_schema
+        self.schema = schema
+        self._template_prefix = f"{template_schema.ref}|"
+        self._schema_prefix = Schema.create_ref("")
+
+    def ref(self, ref: str) -> str:
+        if ref == self.template_schema.ref:
+            return self.schema.ref
+        if ref.startswith(self._template_prefix):
+            return f"{self.schema.ref}|{ref[len(self._template_prefix) :]}"
+        if not ref.startswith(self._schema_prefix):
+            return f"{self.schema.ref}|{ref}"
+        return ref
+
+    def refs(self, refs: Iterable[str]) -> set[str]:
+        return {self.ref(ref) for ref in refs}
+
+    @property
+    def search_path(self) -> str:
+        """
+        The search path unqualified names resolve through in the copy.
+        """
+        return _search_path(self.schema)
+
+    def sql(self, sql: str) -> str:
+        """
+        Rewrites the schema-qualified identifiers in already rendered SQL.
+        """
+        return sql.replace(self.template_schema.sql, self.schema.sql)
+
+    def text(self, text: SqlText) -> SqlText:
+        """
+        Rebinds the text, sharing the parsed SQL whenever possible.
+
+        Only the references are rewritten, unless the text mentions
+            the template schema itself. Texts keeping their template
+            only swap the schema slots.
+        """
+        references = text.references
+        if not references:
+            return text
+        rebound = self.refs(references)
+        if rebound == references:
+            return text
+        if text.template is not None and (
+            self.template_schema.ref not in references
+            or self.template_schema.ref in text.template.slot_refs
+        ):
+            return text.with_identifiers(
+                {self.template_schema.ref: self.schema.sql},
+                {ref: self.ref(ref) for ref in references},
+            )
+        sql = self.sql(text.sql) if self.template_schema.ref in references else text.sql
+        return SqlText.from_parts(self.schema.manager.db.syntax, sql, rebound)
+
+
+class SchemaTemplate:
+    """
+    A schema declared once and stamped out for many schemas, e.g. one per tenant.
+
+    Usage::
+
+        template = SchemaTemplate(db)
+        user = template.manager.Table("user", id="uuid primary key")
+
+        for name in tenants:
+            copies = template.instantiate(root, root.Schema(name))
+            copies[user.ref].c.id  # the tenant's column
+
+    Plans for the template are computed once and rendered for every schema
+        with `Migrator.render(operations, template.rebinder(schema))`.
+
+    Functions of the template run with the search path of their copy,
+        so their bodies resolve unqualified names in it.
+    """
+
+    def __init__(self, db: DB, name: str = "__template__"):
+        self.registry = EntityRegistry()
+        root = EntityManager.create_root(db, self.registry)
+        self.schema = root.Schema(name)
+        self.manager = EntityManager(
+            root,
+            schema=self.schema,
+            function_config={"search_path": _search_path(self.schema)},
+        )
+
+    def rebinder(self, schema: Schema) -> SchemaRebinder:
+        return SchemaRebinder(self.schema, schema)
+
+    def instantiate(
+        self, manager: EntityManager, schema: Schema
+    ) -> dict[str, "DBEntity"]:
+        """
+        Copies every template entity into the registry of the given manager,
+            bound to the given schema.
+
+        Returns:
+            The copies, keyed by the template entity refs.
+        """
+        rebinder = self.rebinder(schema)
+        target = manager.with_schema(schema)
+        copies: dict[str, DBEntity] = {self.schema.ref: schema}
+        for node in self.registry.iter_topological():
+            entity = node.entity
+            if entity is self.schema or not entity.manage_export:
+                continue
+            copies[entity.ref] = target.register(entity.rebind(target, rebinder))
+        return copies
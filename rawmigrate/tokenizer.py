@@ -0,0 +1,149 @@
+import hashlib
+from collections.abc import Iterator
+
+OPERATOR_CHARS = frozenset("+-*/<>=~!@#%^&|`?")
+
+
+def _is_word_start(char: str) -> bool:
+    return char.isalpha() or char == "_"
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char in "_$"
+
+
+def _skip_quoted(sql: str, start: int, quote: str, backslash_escapes: bool) -> int:
+    """
+    Returns the index right after the closing quote, doubled quotes are escapes.
+    """
+    i = start + 1
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if backslash_escapes and char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            if i + 1 < length and sql[i + 1] == quote:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return length
+
+
+def _dollar_tag_end(sql: str, start: int) -> int:
+    """
+    Returns the index right after the opening `$tag$`, or -1 if there is none at `start`.
+    """
+    i = start + 1
+    length = len(sql)
+    if i < length and sql[i].isdigit():
+        return -1
+    while i < length and (sql[i].isalnum() or sql[i] == "_"):
+        i += 1
+    if i < length and sql[i] == "$":
+        return i + 1
+    return -1
+
+
+def iter_token_spans(sql: str) -> Iterator[tuple[int, int, str]]:
+    """
+    Splits SQL into tokens, dropping whitespace and comments.
+    Yields the start and end offsets of each token along with the token.
+
+    Quoted literals, quoted identifiers and dollar-quoted bodies are kept verbatim,
+        unquoted words are lower-cased, since Postgres folds them anyway.
+    """
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char.isspace():
+            i += 1
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = length if end == -1 else end + 1
+        elif sql.startswith("/*", i):
+            # block comments nest in Postgres
+            depth = 1
+            i += 2
+            while i < length and depth:
+                if sql.startswith("/*", i):
+                    depth += 1
+                    i += 2
+                elif sql.startswith("*/", i):
+                    depth -= 1
+                    i += 2
+                else:
+                    i += 1
+        elif char in "'\"":
+            end = _skip_quoted(sql, i, char, backslash_escapes=False)
+            yield i, end, sql[i:end]
+            i = end
+        elif char in "eE" and sql.startswith("'", i + 1):
+            end = _skip_quoted(sql, i + 1, "'", backslash_escapes=True)
+            yield i, end, f"E{sql[i + 1 : end]}"
+            i = end
+        elif char == "$":
+            tag_end = _dollar_tag_end(sql, i)
+            if tag_end == -1:
+                # positional parameter, e.g. $1
+                end = i + 1
+                while end < length and sql[end].isdigit():
+                    end += 1
+                yield i, end, sql[i:end]
+                i = end
+            else:
+                tag = sql[i:tag_end]
+                close = sql.find(tag, tag_end)
+                end = length if close == -1 else close + len(tag)
+                yield i, end, sql[i:end]
+                i = end
+        elif _is_word_start(char):
+            end = i + 1
+            while end < length and _is_word_char(sql[end]):
+                end += 1
+            yield i, end, sql[i:end].lower()
+            i = end
+        elif char.isdigit():
+            end = i + 1
+            while end < length and (sql[end].isalnum() or sql[end] == "."):
+                end += 1
+            yield i, end, sql[i:end].lower()
+            i = end
+        elif char in OPERATOR_CHARS:
+            end = i + 1
+            while (
+                end < length
+                and sql[end] in OPERATOR_CHARS
+                and not sql.startswith("--", end)
+                and not sql.startswith("/*", end)
+            ):
+                end += 1
+            yield i, end, sql[i:end]
+            i = end
+        elif sql.startswith("::", i):
+            yield i, i + 2, "::"
+            i += 2
+        else:
+            yield i, i + 1, char
+            i += 1
+
+
+def iter_tokens(sql: str) -> Iterator[str]:
+    """
+    Same as `iter_token_spans`, without the offsets.
+    """
+    return (token for _, _, token in iter_token_spans(sql))
+
+
+def canonicalize(sql: str) -> str:
+    """
+    Returns the canonical form of SQL, ignoring whitespace, comments and keyword case.
+    """
+    return " ".join(iter_tokens(sql))
+
+
+def canonical_digest(sql: str) -> str:
+    return hashlib.sha256(canonicalize(sql).encode()).hexdigest()
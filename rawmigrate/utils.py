@@ -6,3 +6,14 @@ def hash_str(s: str) -> int:
     Hashes a string deterministically.
     """
     return int(hashlib.sha256(s.encode()).hexdigest()[:15], 16)
+
+
+def fingerprint(*parts: str) -> str:
+    """
+    Digests the parts, keeping their boundaries.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
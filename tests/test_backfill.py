@@ -0,0 +1,81 @@
+import sqlite3
+
+from rawmigrate.backfill import BackfillRunner
+from rawmigrate.core import DB
+from rawmigrate.entities import Backfill
+from rawmigrate.entity_manager import EntityManager
+
+
+def backfill() -> Backfill:
+    root = EntityManager.create_root(DB())
+    item = root.Table(
+        "item", id="integer primary key", price="integer", total="integer"
+    )
+    return root.Backfill(
+        "fill_total",
+        on=item.c.total,
+        set=f"{item.c.price} * 2",
+        key=item.c.id,
+        chunk_size=3,
+    )
+
+
+def connection() -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute('CREATE TABLE "item" (id integer primary key, price integer)')
+    connection.executemany(
+        "INSERT INTO item VALUES (?, ?)", [(id, id) for id in range(1, 11)]
+    )
+    connection.execute('ALTER TABLE "item" ADD COLUMN "total" integer')
+    connection.commit()
+    return connection
+
+
+def totals(connection: sqlite3.Connection) -> list[tuple]:
+    return connection.execute("SELECT id, total FROM item ORDER BY id").fetchall()
+
+
+def progress_rows(connection: sqlite3.Connection) -> list[tuple]:
+    return connection.execute("SELECT * FROM rawmigrate_backfill").fetchall()
+
+
+def test_runs_in_chunks():
+    db = connection()
+    sleeps: list[float] = []
+    progress = BackfillRunner(db, sleep=sleeps.append).run(backfill())
+
+    assert progress.chunks == 4
+    assert progress.rows == 10
+    assert progress.start_key == 1
+    assert progress.next_key is None
+    assert not progress.resumed
+    # throttled between chunks only
+    assert len(sleeps) == 3
+    assert totals(db) == [(id, id * 2) for id in range(1, 11)]
+    # the progress row is deleted once done
+    assert progress_rows(db) == []
+
+
+def test_resumes_after_interruption():
+    db = connection()
+    runner = BackfillRunner(db, sleep=lambda seconds: None)
+
+    progress = runner.run(backfill(), max_chunks=2)
+    assert progress.chunks == 2
+    assert progress.rows == 6
+    assert progress.next_key == 7
+    assert totals(db) == [
+        *((id, id * 2) for id in range(1, 7)),
+        *((id, None) for id in range(7, 11)),
+    ]
+    [(_, next_key)] = progress_rows(db)
+    assert next_key == 7
+
+    progress = runner.run(backfill())
+    assert progress.resumed
+    assert progress.start_key == 7
+    assert progress.chunks == 2
+    assert progress.rows == 4
+    assert progress.next_key is None
+    assert totals(db) == [(id, id * 2) for id in range(1, 11)]
+    assert progress_rows(db) == []
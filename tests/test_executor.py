@@ -0,0 +1,137 @@
+from rawmigrate.comparator import NodeMutationType
+from rawmigrate.core import DB
+from rawmigrate.entity_manager import EntityManager
+from rawmigrate.executor import ExecutionPolicy, PlanExecutor
+from rawmigrate.migrator import MigrationOperation
+
+
+class LockNotAvailable(Exception):
+    sqlstate = "55P03"
+
+
+class FakeConnection:
+    """
+    Records the statements executed, the statements starting with `fail_on`
+        raise a lock timeout the first `failures` times.
+    """
+
+    def __init__(self, fail_on: str, failures: int):
+        self.fail_on = fail_on
+        self.failures = failures
+        self.executed: list[str] = []
+
+    def cursor(self) -> "FakeCursor":
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+
+    def execute(self, statement: str):
+        self.connection.executed.append(statement)
+        if statement.startswith(self.connection.fail_on) and self.connection.failures:
+            self.connection.failures -= 1
+            raise LockNotAvailable(statement)
+
+    def close(self):
+        pass
+
+
+def operations() -> list[MigrationOperation]:
+    root = EntityManager.create_root(DB())
+    users = root.Table("users", id="bigint primary key", email="text")
+    index = root.Index("users_email", on=users, using="btree", expressions=["email"])
+    return [
+        MigrationOperation(
+            mutation=NodeMutationType.ALTER,
+            entity=users,
+            statements=["ALTER TABLE users ADD name text"],
+        ),
+        MigrationOperation(
+            mutation=NodeMutationType.CREATE,
+            entity=index,
+            statements=["CREATE INDEX CONCURRENTLY users_email ON users (email)"],
+        ),
+    ]
+
+
+def executor(connection: FakeConnection, retries: int = 5) -> PlanExecutor:
+    return PlanExecutor(
+        connection,
+        default=ExecutionPolicy(lock_timeout=1, retries=retries),
+        sleep=lambda seconds: None,
+        jitter=lambda: 0.0,
+    )
+
+
+def test_retries_transactional_step():
+    connection = FakeConnection("ALTER TABLE", failures=2)
+    report = executor(connection).run(operations()[:1])
+
+    assert report.completed
+    assert report.stopped_at is None
+    [step] = report.steps
+    assert step.done
+    assert step.attempts == 3
+    assert step.lock_waits == 2
+    attempt = [
+        "BEGIN",
+        "SET LOCAL lock_timeout = 1000",
+        "SET LOCAL statement_timeout = 0",
+        "ALTER TABLE users ADD name text",
+    ]
+    assert connection.executed == [
+        *attempt,
+        "ROLLBACK",
+        *attempt,
+        "ROLLBACK",
+        *attempt,
+        "COMMIT",
+    ]
+
+
+def test_gives_up_and_resumes():
+    connection = FakeConnection("ALTER TABLE", failures=3)
+    report = executor(connection, retries=2).run(operations())
+
+    assert not report.completed
+    assert report.stopped_at == 0
+    [step] = report.steps
+    assert not step.done
+    assert step.attempts == 3
+    assert step.lock_waits == 3
+    assert connection.executed.count("ROLLBACK") == 3
+    assert "COMMIT" not in connection.executed
+
+    connection.executed.clear()
+    resumed = executor(connection).run(operations(), start=report.stopped_at)
+    assert resumed.completed
+    assert [step.attempts for step in resumed.steps] == [1, 1]
+    assert resumed.to_table().splitlines()[1].startswith("0 ")
+
+
+def test_drops_invalid_index_before_retrying():
+    connection = FakeConnection("CREATE INDEX", failures=1)
+    report = executor(connection).run(operations(), start=1)
+
+    assert report.completed
+    [step] = report.steps
+    assert step.attempts == 2
+    assert step.lock_waits == 1
+    assert connection.executed == [
+        # resumed, the run that gave up on it may have left an invalid index
+        "SET lock_timeout = 1000",
+        "SET statement_timeout = 0",
+        "DROP INDEX CONCURRENTLY IF EXISTS users_email",
+        "CREATE INDEX CONCURRENTLY users_email ON users (email)",
+        "RESET lock_timeout",
+        "RESET statement_timeout",
+        "SET lock_timeout = 1000",
+        "SET statement_timeout = 0",
+        "DROP INDEX CONCURRENTLY IF EXISTS users_email",
+        "CREATE INDEX CONCURRENTLY users_email ON users (email)",
+        "RESET lock_timeout",
+        "RESET statement_timeout",
+    ]
+    assert report.to_table().splitlines()[1].startswith("1 ")